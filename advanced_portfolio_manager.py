@@ -1,10 +1,22 @@
-import os, json, time, math, requests, schedule
+import os, json, time, math, schedule
 from decimal import Decimal, ROUND_DOWN
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 import asyncio
-import aiohttp
+import threading
+import numpy as np
+
+import http_client
+import market_cache
+from asset_registry import AssetRegistry
+from cost_basis import CostBasisLedger, open_ledger
+from execution_engine import ExecutionEngine
+from order_queue import open_order_queue
+from rebalance_engine import RebalanceEngine, align
+from trade_journal import open_journal
+from trailing_stop import TrailingStopTracker, open_tracker
+from http_client import COINGECKO_API, HTTP_CONFIG
 
 load_dotenv()
 
@@ -13,7 +25,8 @@ load_dotenv()
 # ------------------------------------------------------------
 RECALL_KEY = os.getenv("RECALL_API_KEY")
 COINGECKO_KEY = os.getenv("PRODUCTION_API_KEY") or os.getenv("SANDBOX_API_KEY")
-SANDBOX_API = "https://api.sandbox.competitions.recall.network"
+# Point at mock_recall_server.py with RECALL_API_URL=http://127.0.0.1:8765
+SANDBOX_API = os.getenv("RECALL_API_URL") or "https://api.sandbox.competitions.recall.network"
 
 # Enhanced token mapping with more assets
 TOKEN_MAP = {
@@ -112,6 +125,9 @@ COINGECKO_IDS = {
     "RNDR": "render-token",
 }
 
+# Forward/reverse indexes over the tables above
+ASSETS = AssetRegistry(TOKEN_MAP, DECIMALS, COINGECKO_IDS)
+
 # Enhanced drift thresholds based on asset volatility
 DRIFT_THRESHOLDS = {
     "CONSERVATIVE": 0.02,    # 2% for stable assets
@@ -152,6 +168,11 @@ ASSET_DRIFT_THRESHOLDS = {
     "YFI": DRIFT_THRESHOLDS["MODERATE"],
 }
 
+# Persisted stop-loss cooldowns and daily loss totals
+RISK_STATE_FILE = "risk_state.json"
+# Per-symbol entry prices built from executed trades
+COST_BASIS_FILE = "cost_basis.json"
+
 # Stop-loss configuration
 STOP_LOSS_CONFIG = {
     "ENABLED": True,
@@ -160,6 +181,7 @@ STOP_LOSS_CONFIG = {
     "TRAILING_PERCENTAGE": 0.05,  # 5% trailing stop
     "MAX_DAILY_LOSS": 0.25,  # 25% max daily loss
     "COOLDOWN_HOURS": 24,  # Hours to wait after stop-loss
+    "ENTRY_PRICE_METHOD": "average",  # "average" or "fifo" cost basis
 }
 
 # Enhanced slippage protection
@@ -170,10 +192,20 @@ SLIPPAGE_CONFIG = {
     "HIGH_VOLATILITY": 0.15,  # 15% for high volatility
 }
 
+# Per-source deadlines (seconds) for the multi-source price oracle
+PRICE_SOURCE_DEADLINES = {
+    "twap": 1.0,
+    "dex_aggregator": 2.0,
+    "coingecko": 5.0,
+}
+
 # Trading cadence
 TRADING_CADENCE = "4h"  # Every 4 hours
 REB_TIME = "09:00"  # Daily rebalance time
 
+# Append-only trade journal (see trade_journal.py)
+TRADE_JOURNAL_FILE = "advanced_trade_log.jsonl"
+
 print("Advanced Portfolio Manager Configuration Loaded")
 
 # ------------------------------------------------------------
@@ -211,181 +243,29 @@ def get_drift_threshold(symbol: str) -> float:
     """Get asset-specific drift threshold."""
     return ASSET_DRIFT_THRESHOLDS.get(symbol, DRIFT_THRESHOLDS["MODERATE"])
 
+MEME_SLIPPAGE_SYMBOLS = {"WIF", "BONK", "BOME", "POPCAT", "MYRO", "CATWIF", "PEPE", "DOGE", "SHIB"}
+MAJOR_SLIPPAGE_SYMBOLS = {"WETH", "WBTC", "USDC", "USDT"}
+
 def get_slippage_tolerance(symbol: str, volume_24h: float) -> float:
     """Get slippage tolerance based on asset and volume."""
-    if symbol in ["WIF", "BONK", "BOME", "POPCAT", "MYRO", "CATWIF", "PEPE", "DOGE", "SHIB"]:
+    if symbol in MEME_SLIPPAGE_SYMBOLS:
         return SLIPPAGE_CONFIG["MEME_COINS"]
     elif volume_24h < 1000000:  # Less than $1M volume
         return SLIPPAGE_CONFIG["LOW_LIQUIDITY"]
-    elif symbol in ["WETH", "WBTC", "USDC", "USDT"]:
+    elif symbol in MAJOR_SLIPPAGE_SYMBOLS:
         return SLIPPAGE_CONFIG["DEFAULT"]
     else:
         return SLIPPAGE_CONFIG["HIGH_VOLATILITY"]
 
-def to_base_units(amount_float: float, decimals: int) -> str:
-    """Convert human units → integer string that Recall expects."""
-    scaled = Decimal(str(amount_float)) * (10 ** decimals)
-    return str(int(scaled.quantize(Decimal("1"), rounding=ROUND_DOWN)))
-
-def log_trade(symbol: str, side: str, amount: float, price: float, status: str, reason: str = ""):
-    """Enhanced trade logging with more details."""
-    trade_log = {
-        "timestamp": datetime.now().isoformat(),
-        "symbol": symbol,
-        "side": side,
-        "amount": amount,
-        "price": price,
-        "status": status,
-        "reason": reason,
-        "total_value": amount * price
-    }
-    
-    try:
-        with open("advanced_trade_log.json", "r") as f:
-            logs = json.load(f)
-    except FileNotFoundError:
-        logs = []
-    
-    logs.append(trade_log)
-    
-    with open("advanced_trade_log.json", "w") as f:
-        json.dump(logs, f, indent=2)
-
-# ------------------------------------------------------------
-#  Enhanced Market Data
-# ------------------------------------------------------------
-def fetch_prices(symbols: List[str]) -> Dict[str, float]:
-    """Fetch current prices from CoinGecko with enhanced error handling."""
-    ids = ",".join(COINGECKO_IDS[sym] for sym in symbols if sym in COINGECKO_IDS)
-    
-    params = {"ids": ids, "vs_currencies": "usd"}
-    if COINGECKO_KEY:
-        params['x_cg_demo_api_key'] = COINGECKO_KEY
-    
-    try:
-        r = requests.get(
-            "https://api.coingecko.com/api/v3/simple/price",
-            params=params,
-            timeout=10,
-        )
-        r.raise_for_status()
-        data = r.json()
-        
-        prices = {}
-        for sym in symbols:
-            if sym in COINGECKO_IDS and COINGECKO_IDS[sym] in data:
-                prices[sym] = data[COINGECKO_IDS[sym]]["usd"]
-            else:
-                print(f"⚠️  Warning: No price data for {sym}")
-                prices[sym] = 0.0
-        
-        return prices
-    except Exception as e:
-        print(f"Error fetching prices: {e}")
-        return {sym: 0.0 for sym in symbols}
-
-def fetch_holdings() -> Dict[str, float]:
-    """Return whole‑token balances from Recall's sandbox."""
-    r = requests.get(
-        f"{SANDBOX_API}/api/balance",
-        headers={"Authorization": f"Bearer {RECALL_KEY}"},
-        timeout=10,
+def slippage_tolerances(symbols: List[str], volumes_24h: np.ndarray) -> np.ndarray:
+    """``get_slippage_tolerance`` over aligned symbol and volume vectors."""
+    meme = np.fromiter((s in MEME_SLIPPAGE_SYMBOLS for s in symbols), dtype=bool, count=len(symbols))
+    major = np.fromiter((s in MAJOR_SLIPPAGE_SYMBOLS for s in symbols), dtype=bool, count=len(symbols))
+    return np.select(
+        [meme, volumes_24h < 1000000, major],
+        [SLIPPAGE_CONFIG["MEME_COINS"], SLIPPAGE_CONFIG["LOW_LIQUIDITY"], SLIPPAGE_CONFIG["DEFAULT"]],
+        default=SLIPPAGE_CONFIG["HIGH_VOLATILITY"],
     )
-    r.raise_for_status()
-    return r.json()
-
-def get_market_metrics(symbols: List[str]) -> Dict[str, Dict]:
-    """Get comprehensive market metrics."""
-    ids = ",".join(COINGECKO_IDS[sym] for sym in symbols if sym in COINGECKO_IDS)
-    
-    params = {
-        "ids": ids,
-        "vs_currency": "usd",
-        "order": "market_cap_desc",
-        "per_page": 100,
-        "page": 1,
-        "sparkline": False
-    }
-    
-    if COINGECKO_KEY:
-        params['x_cg_demo_api_key'] = COINGECKO_KEY
-    
-    try:
-        r = requests.get(
-            "https://api.coingecko.com/api/v3/coins/markets",
-            params=params,
-            timeout=10,
-        )
-        r.raise_for_status()
-        data = r.json()
-        
-        metrics = {}
-        for coin in data:
-            symbol = next((sym for sym, cg_id in COINGECKO_IDS.items() if cg_id == coin['id']), None)
-            if symbol:
-                metrics[symbol] = {
-                    "market_cap": coin['market_cap'],
-                    "volume_24h": coin['total_volume'],
-                    "price_change_24h": coin['price_change_percentage_24h'],
-                    "price_change_7d": coin['price_change_percentage_7d'],
-                    "market_cap_rank": coin['market_cap_rank'],
-                    "circulating_supply": coin['circulating_supply'],
-                    "total_supply": coin['total_supply'],
-                    "ath": coin['ath'],
-                    "ath_change_percentage": coin['ath_change_percentage'],
-                    "atl": coin['atl'],
-                    "atl_change_percentage": coin['atl_change_percentage']
-                }
-        return metrics
-    except Exception as e:
-        print(f"Error fetching market metrics: {e}")
-        return {}
-
-# ------------------------------------------------------------
-#  Enhanced Helper Utilities
-# ------------------------------------------------------------
-def load_targets() -> Dict[str, float]:
-    """Load target portfolio weights from config file."""
-    try:
-        with open("advanced_portfolio_config.json") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        # Enhanced default portfolio with more assets
-        default_targets = {
-            # Meme coins (30%)
-            "WIF": 0.10, "BONK": 0.08, "BOME": 0.06, "POPCAT": 0.03, "MYRO": 0.03,
-            
-            # Major cryptocurrencies (40%)
-            "WETH": 0.15, "WBTC": 0.10, "USDC": 0.10, "LINK": 0.05,
-            
-            # DeFi tokens (20%)
-            "UNI": 0.08, "AAVE": 0.06, "COMP": 0.06,
-            
-            # Layer 2 & Gaming (10%)
-            "MATIC": 0.05, "AXS": 0.03, "SAND": 0.02,
-        }
-        save_targets(default_targets)
-        return default_targets
-
-def save_targets(targets: Dict[str, float]):
-    """Save target portfolio weights to config file."""
-    with open("advanced_portfolio_config.json", "w") as f:
-        json.dump(targets, f, indent=2)
-
-def get_drift_threshold(symbol: str) -> float:
-    """Get asset-specific drift threshold."""
-    return ASSET_DRIFT_THRESHOLDS.get(symbol, DRIFT_THRESHOLDS["MODERATE"])
-
-def get_slippage_tolerance(symbol: str, volume_24h: float) -> float:
-    """Get slippage tolerance based on asset and volume."""
-    if symbol in ["WIF", "BONK", "BOME", "POPCAT", "MYRO", "CATWIF", "PEPE", "DOGE", "SHIB"]:
-        return SLIPPAGE_CONFIG["MEME_COINS"]
-    elif volume_24h < 1000000:  # Less than $1M volume
-        return SLIPPAGE_CONFIG["LOW_LIQUIDITY"]
-    elif symbol in ["WETH", "WBTC", "USDC", "USDT"]:
-        return SLIPPAGE_CONFIG["DEFAULT"]
-    else:
-        return SLIPPAGE_CONFIG["HIGH_VOLATILITY"]
 
 def to_base_units(amount_float: float, decimals: int) -> str:
     """Convert human units → integer string that Recall expects."""
@@ -405,128 +285,128 @@ def log_trade(symbol: str, side: str, amount: float, price: float, status: str,
         "total_value": amount * price
     }
     
-    try:
-        with open("advanced_trade_log.json", "r") as f:
-            logs = json.load(f)
-    except FileNotFoundError:
-        logs = []
-    
-    logs.append(trade_log)
-    
-    with open("advanced_trade_log.json", "w") as f:
-        json.dump(logs, f, indent=2)
+    open_journal(TRADE_JOURNAL_FILE).append(trade_log)
 
 # ------------------------------------------------------------
 #  Enhanced Market Data with Real-time Feeds
 # ------------------------------------------------------------
 class PriceOracle:
-    """Enhanced price oracle with multiple data sources."""
-    
-    def __init__(self):
-        self.cache = {}
-        self.cache_timeout = 30  # 30 seconds cache
-        self.last_update = {}
-    
-    async def get_price_from_coingecko(self, symbol: str) -> Optional[float]:
-        """Get price from CoinGecko with caching."""
-        cache_key = f"coingecko_{symbol}"
-        current_time = time.time()
+    """Enhanced price oracle with multiple data sources.
+    
+    All sources are queried for the whole batch at once and raced; each
+    symbol takes the first valid price any source returns within its deadline.
+    """
+    
+    def __init__(self, cache: Optional[market_cache.MarketCache] = None,
+                 deadlines: Optional[Dict[str, float]] = None):
+        # Shared with every other CoinGecko consumer, so it outlives the call
+        self.cache = cache or market_cache.MARKET_CACHE
+        self.deadlines = dict(PRICE_SOURCE_DEADLINES, **(deadlines or {}))
+    
+    async def get_prices_from_coingecko(self, symbols: List[str], session) -> Dict[str, float]:
+        """Get prices for a batch of symbols from one /simple/price call."""
+        ids = sorted(set(ASSETS.ids_for(symbols)))
+        if not ids:
+            return {}
         
-        # Check cache
-        if cache_key in self.cache and current_time - self.last_update.get(cache_key, 0) < self.cache_timeout:
-            return self.cache[cache_key]
+        url = f"{COINGECKO_API}/simple/price"
+        params = {"ids": ",".join(ids), "vs_currencies": "usd"}
+        if COINGECKO_KEY:
+            params['x_cg_demo_api_key'] = COINGECKO_KEY
+        key = market_cache.cache_key(url, params)
         
-        try:
-            if symbol not in COINGECKO_IDS:
-                return None
-                
-            params = {"ids": COINGECKO_IDS[symbol], "vs_currencies": "usd"}
-            if COINGECKO_KEY:
-                params['x_cg_demo_api_key'] = COINGECKO_KEY
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    "https://api.coingecko.com/api/v3/simple/price",
-                    params=params,
-                    timeout=aiohttp.ClientTimeout(total=10)
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        price = data[COINGECKO_IDS[symbol]]["usd"]
-                        
-                        # Update cache
-                        self.cache[cache_key] = price
-                        self.last_update[cache_key] = current_time
-                        
-                        return price
-        except Exception as e:
-            print(f"Error fetching price for {symbol}: {e}")
-            return None
-    
-    async def get_price_from_dex_aggregator(self, symbol: str) -> Optional[float]:
-        """Get price from DEX aggregator (1inch, 0x, etc.)."""
+        # Check cache; stale entries are served while a refresh runs
+        data, state = self.cache.lookup("simple/price", key)
+        if state == market_cache.STALE:
+            self.cache.revalidate(key, lambda: market_cache.fetch_json(url, params))
+        if state == market_cache.MISS:
+            try:
+                fetched = await http_client.get_json_async(session, url, params)
+                self.cache.store(key, fetched)
+                data = fetched
+            except Exception as e:
+                if data is None:
+                    raise
+                print(f"⚠️  Serving last known good CoinGecko prices: {e}")
+        
+        return {
+            sym: data[COINGECKO_IDS[sym]]["usd"]
+            for sym in symbols
+            if sym in COINGECKO_IDS and "usd" in data.get(COINGECKO_IDS[sym], {})
+        }
+    
+    async def get_prices_from_dex_aggregator(self, symbols: List[str], session) -> Dict[str, float]:
+        """Get prices from DEX aggregator (1inch, 0x, etc.)."""
         # This would integrate with actual DEX aggregators
-        # For now, return None to fall back to CoinGecko
-        return None
+        # For now, return nothing so CoinGecko answers
+        return {}
     
-    async def get_twap_price(self, symbol: str) -> Optional[float]:
-        """Get Time-Weighted Average Price from on-chain sources."""
+    async def get_twap_prices(self, symbols: List[str], session) -> Dict[str, float]:
+        """Get Time-Weighted Average Prices from on-chain sources."""
         # This would integrate with Uniswap V3 TWAP oracles
-        # For now, return None to fall back to CoinGecko
-        return None
+        # For now, return nothing so CoinGecko answers
+        return {}
     
-    async def get_price(self, symbol: str) -> Optional[float]:
-        """Get best available price from multiple sources."""
-        # Try TWAP first (most reliable)
-        price = await self.get_twap_price(symbol)
-        if price:
-            return price
+    async def get_prices(self, symbols: List[str], session=None) -> Dict[str, float]:
+        """Race every source over one shared session; first valid price wins.
         
-        # Try DEX aggregator
-        price = await self.get_dex_aggregator(symbol)
-        if price:
-            return price
+        Pass ``session`` to reuse a long-lived one (e.g. a polling loop's).
+        """
+        if session is None:
+            async with http_client.async_session() as session:
+                return await self.get_prices(symbols, session)
         
-        # Fall back to CoinGecko
-        return await self.get_price_from_coingecko(symbol)
-
-async def fetch_prices_async(symbols: List[str]) -> Dict[str, float]:
-    """Fetch prices asynchronously from multiple sources."""
-    oracle = PriceOracle()
-    prices = {}
-    
-    tasks = [oracle.get_price(symbol) for symbol in symbols]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    
-    for symbol, result in zip(symbols, results):
-        if isinstance(result, Exception):
-            print(f"Error fetching price for {symbol}: {result}")
-            prices[symbol] = 0.0
-        elif result is not None:
-            prices[symbol] = result
-        else:
-            print(f"⚠️  Warning: No price data for {symbol}")
-            prices[symbol] = 0.0
+        sources = {
+            "twap": self.get_twap_prices,
+            "dex_aggregator": self.get_prices_from_dex_aggregator,
+            "coingecko": self.get_prices_from_coingecko,
+        }
+        prices = {}
+        tasks = {
+            asyncio.ensure_future(asyncio.wait_for(fetch(symbols, session), self.deadlines[name])): name
+            for name, fetch in sources.items()
+        }
+        pending = set(tasks)
+        try:
+            while pending and len(prices) < len(symbols):
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        result = task.result()
+                    except asyncio.TimeoutError:
+                        print(f"⚠️  Price source {tasks[task]} missed its deadline")
+                        continue
+                    except Exception as e:
+                        print(f"Error fetching prices from {tasks[task]}: {e}")
+                        continue
+                    for sym, price in result.items():
+                        if sym not in prices and price and price > 0:
+                            prices[sym] = price
+        finally:
+            # Stop slower sources once every symbol has a price
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        observe_prices(prices)
+        return prices
     
-    return prices
-
-def fetch_prices(symbols: List[str]) -> Dict[str, float]:
-    """Synchronous wrapper for async price fetching."""
-    return asyncio.run(fetch_prices_async(symbols))
+    async def get_price(self, symbol: str) -> Optional[float]:
+        """Get best available price for a single symbol."""
+        return (await self.get_prices([symbol])).get(symbol)
 
 def fetch_holdings() -> Dict[str, float]:
     """Return whole‑token balances from Recall's sandbox."""
-    r = requests.get(
+    r = http_client.get(
         f"{SANDBOX_API}/api/balance",
         headers={"Authorization": f"Bearer {RECALL_KEY}"},
-        timeout=10,
     )
     r.raise_for_status()
     return r.json()
 
-async def get_market_metrics_async(symbols: List[str]) -> Dict[str, Dict]:
-    """Get comprehensive market metrics asynchronously."""
-    ids = ",".join(COINGECKO_IDS[sym] for sym in symbols if sym in COINGECKO_IDS)
+def _market_metrics_params(symbols: List[str]) -> Dict:
+    """Build the /coins/markets query for the given symbols."""
+    ids = ",".join(ASSETS.ids_for(symbols))
     
     params = {
         "ids": ids,
@@ -534,79 +414,178 @@ async def get_market_metrics_async(symbols: List[str]) -> Dict[str, Dict]:
         "order": "market_cap_desc",
         "per_page": 100,
         "page": 1,
-        "sparkline": False
+        "sparkline": False,
+        "price_change_percentage": "7d",
     }
     
     if COINGECKO_KEY:
         params['x_cg_demo_api_key'] = COINGECKO_KEY
-    
+    return params
+
+def _parse_market_metrics(data: List[Dict]) -> Dict[str, Dict]:
+    """Map a /coins/markets response onto combined per-symbol price+metrics records."""
+    metrics = {}
+    for coin in data:
+        symbol = ASSETS.symbol_for_id(coin['id'])
+        if symbol:
+            metrics[symbol] = {
+                "price": coin['current_price'],
+                "market_cap": coin['market_cap'],
+                "volume_24h": coin['total_volume'],
+                "price_change_24h": coin['price_change_percentage_24h'],
+                "price_change_7d": coin.get('price_change_percentage_7d_in_currency'),
+                "market_cap_rank": coin['market_cap_rank'],
+                "circulating_supply": coin['circulating_supply'],
+                "total_supply": coin['total_supply'],
+                "ath": coin['ath'],
+                "ath_change_percentage": coin['ath_change_percentage'],
+                "atl": coin['atl'],
+                "atl_change_percentage": coin['atl_change_percentage']
+            }
+    return metrics
+
+async def get_market_metrics_async(symbols: List[str]) -> Dict[str, Dict]:
+    """Get comprehensive market metrics asynchronously."""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                "https://api.coingecko.com/api/v3/coins/markets",
-                params=params,
-                timeout=aiohttp.ClientTimeout(total=10)
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    
-                    metrics = {}
-                    for coin in data:
-                        symbol = next((sym for sym, cg_id in COINGECKO_IDS.items() if cg_id == coin['id']), None)
-                        if symbol:
-                            metrics[symbol] = {
-                                "market_cap": coin['market_cap'],
-                                "volume_24h": coin['total_volume'],
-                                "price_change_24h": coin['price_change_percentage_24h'],
-                                "price_change_7d": coin['price_change_percentage_7d'],
-                                "market_cap_rank": coin['market_cap_rank'],
-                                "circulating_supply": coin['circulating_supply'],
-                                "total_supply": coin['total_supply'],
-                                "ath": coin['ath'],
-                                "ath_change_percentage": coin['ath_change_percentage'],
-                                "atl": coin['atl'],
-                                "atl_change_percentage": coin['atl_change_percentage']
-                            }
-                    return metrics
+        async with http_client.async_session() as session:
+            data = await http_client.get_json_async(
+                session, f"{COINGECKO_API}/coins/markets", _market_metrics_params(symbols)
+            )
+            return _parse_market_metrics(data)
     except Exception as e:
         print(f"Error fetching market metrics: {e}")
         return {}
 
 def get_market_metrics(symbols: List[str]) -> Dict[str, Dict]:
-    """Synchronous wrapper for async market metrics."""
-    return asyncio.run(get_market_metrics_async(symbols))
+    """Get comprehensive market metrics over the pooled HTTP session."""
+    try:
+        data = market_cache.get_json(
+            "coins/markets", f"{COINGECKO_API}/coins/markets", _market_metrics_params(symbols)
+        )
+        return _parse_market_metrics(data)
+    except Exception as e:
+        print(f"Error fetching market metrics: {e}")
+        return {}
+
+def prices_from_metrics(metrics: Dict[str, Dict], symbols: List[str]) -> Dict[str, float]:
+    """Read prices off combined price+metrics records."""
+    prices = {}
+    for sym in symbols:
+        price = metrics.get(sym, {}).get("price")
+        if price:
+            prices[sym] = price
+        else:
+            print(f"⚠️  Warning: No price data for {sym}")
+            prices[sym] = 0.0
+    observe_prices(prices)
+    return prices
+
+def fetch_prices(symbols: List[str]) -> Dict[str, float]:
+    """Fetch current prices as a view over the /coins/markets metrics."""
+    return prices_from_metrics(get_market_metrics(symbols), symbols)
 
 # ------------------------------------------------------------
 #  Enhanced Risk Management with Stop-Loss
 # ------------------------------------------------------------
 class RiskManager:
-    """Advanced risk management with stop-loss and volatility monitoring."""
-    
-    def __init__(self):
+    """Advanced risk management with stop-loss and volatility monitoring.
+    
+    Meant to live for the whole process: cooldowns and daily loss totals are
+    persisted to ``state_file`` so they also survive restarts. ``clock`` lets
+    the backtester run cooldowns on simulated time. Cooldowns start when a
+    stop-loss or risk-reduction sell fills (``record_fill``), not when it is
+    computed, so a blocked or failed sell is retried on the next check.
+    """
+    
+    def __init__(self, state_file: Optional[str] = RISK_STATE_FILE,
+                 trailing: Optional[TrailingStopTracker] = None,
+                 clock: Callable[[], float] = time.time):
+        self.state_file = state_file
+        self.clock = clock
+        # Shared with the price feeds unless running without persisted state
+        self.trailing = trailing or (
+            open_tracker(STOP_LOSS_CONFIG["TRAILING_PERCENTAGE"]) if state_file
+            else TrailingStopTracker(STOP_LOSS_CONFIG["TRAILING_PERCENTAGE"])
+        )
         self.stop_loss_history = {}
         self.daily_losses = {}
         self.volatility_alerts = {}
+        self.risk_reductions = {}
+        self.pending_stops = {}  # symbol -> loss of a triggered stop awaiting its fill
+        self._lock = threading.RLock()
+        self._assessed_metrics = None
+        self._assessment = {}
+        self.load()
+    
+    def load(self):
+        """Restore cooldowns and daily losses from the state file."""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️  Ignoring unreadable risk state {self.state_file}: {e}")
+            return
+        self.stop_loss_history = state.get("stop_loss_history", {})
+        self.daily_losses = state.get("daily_losses", {})
+        self.volatility_alerts = state.get("volatility_alerts", {})
+        self.risk_reductions = state.get("risk_reductions", {})
+    
+    def save(self):
+        """Atomically persist state, dropping daily totals older than a week."""
+        if not self.state_file:
+            return
+        with self._lock:
+            self._save()
+    
+    def _save(self):
+        cutoff = (self.today() - timedelta(days=7)).isoformat()
+        self.daily_losses = {day: v for day, v in self.daily_losses.items() if day >= cutoff}
+        state = {
+            "stop_loss_history": self.stop_loss_history,
+            "daily_losses": self.daily_losses,
+            "volatility_alerts": self.volatility_alerts,
+            "risk_reductions": self.risk_reductions,
+        }
+        tmp_path = f"{self.state_file}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_file)
+    
+    def today(self):
+        return datetime.fromtimestamp(self.clock()).date()
     
     def check_stop_loss(self, symbol: str, current_price: float, entry_price: float, 
                        holdings: Dict[str, float]) -> Tuple[bool, str]:
         """Check if stop-loss should be triggered."""
+        # The stop-loss watcher checks from its own thread
+        with self._lock:
+            return self._check_stop_loss(symbol, current_price, entry_price, holdings)
+    
+    def _check_stop_loss(self, symbol: str, current_price: float, entry_price: float,
+                         holdings: Dict[str, float]) -> Tuple[bool, str]:
         if not STOP_LOSS_CONFIG["ENABLED"]:
             return False, ""
         
         if symbol not in holdings or holdings[symbol] == 0:
+            self.trailing.untrack(symbol)
             return False, ""
         
+        # Keep the high-water mark moving even while in cooldown
+        self.trailing.track(symbol, entry_price, current_price)
+        
         # Calculate loss percentage
         loss_pct = (entry_price - current_price) / entry_price
         
         # Check if we're in cooldown period
         last_stop_loss = self.stop_loss_history.get(symbol, 0)
         cooldown_seconds = STOP_LOSS_CONFIG["COOLDOWN_HOURS"] * 3600
-        if time.time() - last_stop_loss < cooldown_seconds:
+        if self.clock() - last_stop_loss < cooldown_seconds:
             return False, ""
         
         # Check daily loss limit
-        today = datetime.now().date().isoformat()
+        today = self.today().isoformat()
         daily_loss = self.daily_losses.get(today, {}).get(symbol, 0)
         if daily_loss >= STOP_LOSS_CONFIG["MAX_DAILY_LOSS"]:
             return False, "Daily loss limit reached"
@@ -614,15 +593,38 @@ class RiskManager:
         # Check stop-loss threshold
         threshold = STOP_LOSS_CONFIG["DEFAULT_THRESHOLD"]
         if loss_pct >= threshold:
-            self.stop_loss_history[symbol] = time.time()
-            if today not in self.daily_losses:
-                self.daily_losses[today] = {}
-            self.daily_losses[today][symbol] = daily_loss + loss_pct
-            
+            self.pending_stops[symbol] = loss_pct
             return True, f"Stop-loss triggered: {loss_pct:.2%} loss"
         
+        # Check trailing stop against the position's high-water mark
+        if STOP_LOSS_CONFIG["TRAILING_STOP"]:
+            triggered, msg = self.trailing.check(symbol, current_price)
+            if triggered:
+                self.pending_stops[symbol] = max(loss_pct, 0)
+                return True, msg
+        
         return False, ""
     
+    def record_fill(self, order: Dict):
+        """Start the cooldown of a filled stop-loss or risk-reduction sell."""
+        if order['side'] != 'sell':
+            return
+        reason = order.get('reason', '')
+        with self._lock:
+            if reason.startswith("Stop-loss"):
+                self._record_stop(order['symbol'], self.pending_stops.pop(order['symbol'], 0.0))
+            elif reason.startswith("Risk reduction"):
+                self.record_reduction(order['symbol'])
+    
+    def _record_stop(self, symbol: str, loss_pct: float):
+        today = self.today().isoformat()
+        self.stop_loss_history[symbol] = self.clock()
+        if today not in self.daily_losses:
+            self.daily_losses[today] = {}
+        self.daily_losses[today][symbol] = self.daily_losses[today].get(symbol, 0) + loss_pct
+        self.trailing.untrack(symbol)
+        self.save()
+    
     def check_volatility_risk(self, symbol: str, metrics: Dict) -> Tuple[bool, str]:
         """Check for volatility-based risks."""
         if symbol not in metrics:
@@ -657,125 +659,166 @@ class RiskManager:
         if symbol in metrics:
             data = metrics[symbol]
             
-            # Check if near all-time low
-            if data['atl_change_percentage'] > -10:  # Within 10% of ATL
+            # Check if near all-time low (ATL change is % above the ATL)
+            if data['atl_change_percentage'] < 10:  # Within 10% of ATL
                 return True, f"Near all-time low: {data['atl_change_percentage']:.1f}% from ATL"
             
             # Check for declining market cap rank
             # (This would require historical data tracking)
         
         return False, ""
+    
+    def assess(self, metrics: Dict[str, Dict]) -> Dict[str, Dict]:
+        """Risk flags for every symbol in ``metrics``, computed once per snapshot.
+        
+        Consumers sharing the same metrics dict (analysis, order computation,
+        risk reports) reuse the first assessment.
+        """
+        with self._lock:
+            if metrics is self._assessed_metrics:
+                return self._assessment
+            
+            assessment = {}
+            for sym, data in metrics.items():
+                volatile, volatility_msg = self.check_volatility_risk(sym, metrics)
+                reduce, reduce_msg = self.should_reduce_position(sym, metrics)
+                if reduce:
+                    status = "🔴 HIGH"
+                elif abs(data['price_change_24h']) > 20:
+                    status = "🟡 MED"
+                else:
+                    status = "🟢 LOW"
+                assessment[sym] = {
+                    "volatile": volatile,
+                    "volatility_reason": volatility_msg,
+                    "reduce": reduce,
+                    "reason": reduce_msg,
+                    "status": status,
+                    "low_volume": data['volume_24h'] < 1000000,
+                }
+                if volatile:
+                    self.volatility_alerts[sym] = self.clock()
+            
+            self._assessed_metrics = metrics
+            self._assessment = assessment
+            return assessment
+    
+    def can_reduce(self, symbol: str) -> bool:
+        """Risk reductions share the stop-loss cooldown, so a flagged position
+        isn't halved again every cycle."""
+        cooldown_seconds = STOP_LOSS_CONFIG["COOLDOWN_HOURS"] * 3600
+        return self.clock() - self.risk_reductions.get(symbol, 0) >= cooldown_seconds
+    
+    def record_reduction(self, symbol: str):
+        self.risk_reductions[symbol] = self.clock()
+        self.save()
+
+_risk_manager: Optional[RiskManager] = None
+
+def default_risk_manager() -> RiskManager:
+    """Process-wide risk manager for callers that don't own one."""
+    global _risk_manager
+    if _risk_manager is None:
+        _risk_manager = RiskManager()
+    return _risk_manager
+
+def observe_prices(prices: Dict[str, float]) -> Dict[str, float]:
+    """Feed price ticks to the trailing stops; returns symbols whose stop was hit."""
+    return open_tracker(STOP_LOSS_CONFIG["TRAILING_PERCENTAGE"]).observe(prices)
 
 # ------------------------------------------------------------
 #  Enhanced Trading Logic with Risk Management
 # ------------------------------------------------------------
 def compute_orders_with_risk_management(targets: Dict[str, float], prices: Dict[str, float], 
-                                       holdings: Dict[str, float], metrics: Dict[str, Dict]) -> List[Dict]:
+                                       holdings: Dict[str, float], metrics: Dict[str, Dict],
+                                       risk_manager: Optional[RiskManager] = None,
+                                       ledger: Optional[CostBasisLedger] = None) -> List[Dict]:
     """Enhanced order computation with risk management."""
-    risk_manager = RiskManager()
-    total_value = sum(holdings.get(s, 0) * prices[s] for s in targets)
-    
-    if total_value == 0:
-        raise ValueError("No balances found; fund your sandbox wallet first.")
-
-    overweight, underweight = [], []
-    
-    for sym, weight in targets.items():
-        if sym not in prices or prices[sym] == 0:
-            continue
-            
-        current_val = holdings.get(sym, 0) * prices[sym]
-        target_val = total_value * weight
-        drift_pct = (current_val - target_val) / total_value
-        drift_threshold = get_drift_threshold(sym)
-        
-        # Check stop-loss first
-        if holdings.get(sym, 0) > 0:
-            # For simplicity, assume entry price is current price * 1.1 (10% profit assumption)
-            # In practice, you'd track actual entry prices
-            assumed_entry_price = prices[sym] * 1.1
-            stop_loss_triggered, stop_loss_msg = risk_manager.check_stop_loss(
-                sym, prices[sym], assumed_entry_price, holdings
-            )
-            
-            if stop_loss_triggered:
-                # Force sell entire position
-                overweight.append({
-                    "symbol": sym,
-                    "side": "sell",
-                    "amount": holdings[sym],
-                    "reason": f"Stop-loss: {stop_loss_msg}"
-                })
-                continue
-        
-        # Check if position should be reduced due to risk
-        should_reduce, risk_msg = risk_manager.should_reduce_position(sym, metrics.get(sym, {}))
-        if should_reduce and holdings.get(sym, 0) > 0:
-            # Reduce position by 50%
-            reduce_amount = holdings[sym] * 0.5
-            overweight.append({
-                "symbol": sym,
-                "side": "sell",
-                "amount": reduce_amount,
-                "reason": f"Risk reduction: {risk_msg}"
-            })
+    risk_manager = risk_manager or default_risk_manager()
+    ledger = ledger or open_ledger(COST_BASIS_FILE)
+    engine = RebalanceEngine(targets, [get_drift_threshold(s) for s in targets])
+    p, h = engine.vectors(prices, holdings)
+    
+    # Risk checks only apply to positions we hold
+    risk = risk_manager.assess(metrics)
+    stop_loss, reduce = {}, {}
+    for sym in engine.held(p, h):
+        # Positions held from before the ledger existed start at today's price
+        ledger.seed(sym, holdings[sym], prices[sym])
+        entry_price = ledger.entry_price(sym, STOP_LOSS_CONFIG["ENTRY_PRICE_METHOD"])
+        stop_loss_triggered, stop_loss_msg = risk_manager.check_stop_loss(
+            sym, prices[sym], entry_price, holdings
+        )
+        if stop_loss_triggered:
+            # Force sell entire position
+            stop_loss[sym] = stop_loss_msg
             continue
         
-        # Normal rebalancing logic
-        if abs(drift_pct) >= drift_threshold:
-            delta_val = abs(target_val - current_val)
-            token_amt = delta_val / prices[sym]
-            side = "sell" if drift_pct > 0 else "buy"
-            
-            # Apply slippage protection
-            slippage = get_slippage_tolerance(sym, metrics.get(sym, {}).get('volume_24h', 0))
-            if side == "buy":
-                token_amt *= (1 + slippage)
-            
-            (overweight if side == "sell" else underweight).append({
-                "symbol": sym,
-                "side": side,
-                "amount": token_amt,
-                "reason": f"Rebalancing: {drift_pct:.2%} drift"
-            })
-
-    # Execute sells first so we have USDC to fund buys
-    return overweight + underweight
-
-def execute_trade(symbol: str, side: str, amount_float: float, reason: str = ""):
-    """Execute a trade through Recall API with enhanced logging."""
+        # Check if position should be reduced due to risk (sells 50%)
+        if sym in risk and risk[sym]['reduce'] and risk_manager.can_reduce(sym):
+            reduce[sym] = risk[sym]['reason']
+    
+    # Slippage protection on buys, sells first so we have USDC to fund buys
+    volumes = align(engine.symbols, {s: m.get('volume_24h', 0) for s, m in metrics.items()})
+    return engine.orders_from_vectors(p, h, slippage_tolerances(engine.symbols, volumes), stop_loss, reduce)
+
+def execute_trade(symbol: str, side: str, amount_float: float, reason: str = "",
+                  client_order_id: Optional[str] = None):
+    """Execute a trade through Recall API with enhanced logging.
+
+    ``client_order_id`` is sent as the idempotency key so a retried request
+    cannot execute twice.
+    """
     if symbol not in TOKEN_MAP:
         raise ValueError(f"Unknown token symbol: {symbol}")
     
-    from_token, to_token = (
-        (TOKEN_MAP[symbol], TOKEN_MAP["USDC"]) if side == "sell"
-        else (TOKEN_MAP["USDC"], TOKEN_MAP[symbol])
-    )
-
     payload = {
-        "fromToken": from_token,
-        "toToken": to_token,
+        **ASSETS.trade_tokens(symbol, side),
         "amount": to_base_units(amount_float, DECIMALS[symbol]),
         "reason": f"Advanced portfolio management - {reason}",
     }
+    headers = {
+        "Authorization": f"Bearer {RECALL_KEY}",
+        "Content-Type": "application/json",
+    }
+    if client_order_id:
+        headers["Idempotency-Key"] = client_order_id
     
-    r = requests.post(
+    r = http_client.post(
         f"{SANDBOX_API}/api/trade/execute",
         json=payload,
-        headers={
-            "Authorization": f"Bearer {RECALL_KEY}",
-            "Content-Type": "application/json",
-        },
-        timeout=20,
+        headers=headers,
+        timeout=HTTP_CONFIG["TRADE_TIMEOUT"],
     )
     r.raise_for_status()
     return r.json()
 
+def execute_order(order: Dict) -> Dict:
+    """Submit one queued order dict through the durable order queue.
+
+    Fills are applied to the cost-basis ledger that stop-loss reads from,
+    and start the cooldown of the stop-loss or risk reduction behind them.
+    """
+    result = open_order_queue().submit(order, lambda o: execute_trade(
+        o['symbol'], o['side'], o['amount'], o.get('reason', ''), o['client_order_id']
+    ))
+    ledger = open_ledger(COST_BASIS_FILE)
+    if ledger.record_fill(order, result):
+        default_risk_manager().record_fill(order)
+        if order['side'] == 'sell' and ledger.quantity(order['symbol']) <= 0:
+            # Position closed; a later buy starts a fresh high-water mark
+            open_tracker(STOP_LOSS_CONFIG["TRAILING_PERCENTAGE"]).untrack(order['symbol'])
+    return result
+
+# Sells run concurrently, then buys sized to the USDC they released
+EXECUTION_ENGINE = ExecutionEngine(execute_order)
+
 # ------------------------------------------------------------
 #  Enhanced Portfolio Analysis
 # ------------------------------------------------------------
 def analyze_portfolio_performance(holdings: Dict[str, float], prices: Dict[str, float], 
-                                targets: Dict[str, float], metrics: Dict[str, Dict]):
+                                targets: Dict[str, float], metrics: Dict[str, Dict],
+                                risk_manager: Optional[RiskManager] = None):
     """Enhanced portfolio analysis with risk metrics."""
     total_value = sum(holdings.get(s, 0) * prices[s] for s in targets)
     
@@ -785,7 +828,7 @@ def analyze_portfolio_performance(holdings: Dict[str, float], prices: Dict[str,
     print(f"Total Portfolio Value: ${total_value:,.2f}")
     
     # Risk metrics
-    risk_manager = RiskManager()
+    risk = (risk_manager or default_risk_manager()).assess(metrics)
     high_risk_assets = []
     low_volume_assets = []
     
@@ -804,16 +847,12 @@ def analyze_portfolio_performance(holdings: Dict[str, float], prices: Dict[str,
         
         # Risk assessment
         risk_status = "🟢 LOW"
-        if sym in metrics:
-            should_reduce, risk_msg = risk_manager.should_reduce_position(sym, metrics[sym])
-            if should_reduce:
-                risk_status = "🔴 HIGH"
+        if sym in risk:
+            risk_status = risk[sym]['status']
+            if risk[sym]['reduce']:
                 high_risk_assets.append(sym)
-            elif abs(metrics[sym]['price_change_24h']) > 20:
-                risk_status = "🟡 MED"
-        
-        if sym in metrics and metrics[sym]['volume_24h'] < 1000000:
-            low_volume_assets.append(sym)
+            if risk[sym]['low_volume']:
+                low_volume_assets.append(sym)
         
         print(f"{sym:<8} {current_weight*100:>8.2f}% {target_weight*100:>10.2f}% {drift_pct:>10.2f}% ${current_val:>12,.2f} {risk_status}")
         total_drift += abs(drift_pct)
@@ -837,43 +876,40 @@ def rebalance():
     
     try:
         targets = load_targets()
-        prices = fetch_prices(list(targets.keys()))
-        holdings = fetch_holdings()
         metrics = get_market_metrics(list(targets.keys()))
+        prices = prices_from_metrics(metrics, list(targets.keys()))
+        holdings = fetch_holdings()
         
         # Analyze current portfolio
         analyze_portfolio_performance(holdings, prices, targets, metrics)
         
         # Compute orders with risk management
         orders = compute_orders_with_risk_management(targets, prices, holdings, metrics)
+        orders = open_order_queue().enqueue_orders(orders, holdings)
 
         if not orders:
             print("✅ Portfolio already within drift thresholds.")
             return
 
         print(f"\n📈 Executing {len(orders)} trades...")
-        for order in orders:
-            try:
-                res = execute_trade(
-                    order['symbol'], 
-                    order['side'], 
-                    order['amount'], 
-                    order.get('reason', '')
-                )
-                price = prices.get(order['symbol'], 0)
-                log_trade(
-                    order['symbol'], 
-                    order['side'], 
-                    order['amount'], 
-                    price, 
-                    res.get('status', 'unknown'),
-                    order.get('reason', '')
-                )
-                print(f"✅ Executed {order['side']} {order['amount']:.6f} {order['symbol']} → {res.get('status', 'unknown')}")
-                if order.get('reason'):
-                    print(f"   Reason: {order['reason']}")
-            except Exception as e:
-                print(f"❌ Failed to execute {order}: {e}")
+        for trade in EXECUTION_ENGINE.execute_orders(orders, prices, holdings):
+            order = trade['order']
+            if trade['status'] != 'success':
+                print(f"❌ Failed to execute {order}: {trade['error']}")
+                continue
+            res = trade['result']
+            price = prices.get(order['symbol'], 0)
+            log_trade(
+                order['symbol'], 
+                order['side'], 
+                order['amount'], 
+                price, 
+                res.get('status', 'unknown'),
+                order.get('reason', '')
+            )
+            print(f"✅ Executed {order['side']} {order['amount']:.6f} {order['symbol']} → {res.get('status', 'unknown')}")
+            if order.get('reason'):
+                print(f"   Reason: {order['reason']}")
 
         print("🎯 Advanced portfolio rebalance complete.")
         
@@ -905,11 +941,17 @@ if __name__ == "__main__":
     # Run initial rebalance
     rebalance()
     
+    # Stop-losses are checked on a fast loop between rebalances
+    from stop_loss_watcher import StopLossWatcher
+    watcher = StopLossWatcher(default_risk_manager())
+    watcher.start()
+    
     # Main loop with enhanced scheduling
     while True:
         try:
             schedule.run_pending()
             time.sleep(60)
         except KeyboardInterrupt:
+            watcher.stop()
             print("\n👋 Advanced portfolio manager stopped.")
             break 
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""
+Asset registry shared by the portfolio modules.
+
+Builds forward (symbol -> address / decimals / CoinGecko id) and reverse
+(CoinGecko id -> symbol, address -> symbol) indexes once from a module's
+``TOKEN_MAP``, ``DECIMALS`` and ``COINGECKO_IDS``, so mapping API responses
+back to symbols is a dict lookup instead of a scan over every asset.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+class AssetRegistry:
+    """Forward and reverse indexes over a portfolio module's asset tables."""
+
+    def __init__(self, token_map: Dict[str, str], decimals: Dict[str, int],
+                 coingecko_ids: Dict[str, str]):
+        self.token_map = token_map
+        self.decimals = decimals
+        self.coingecko_ids = coingecko_ids
+
+        self._symbol_by_id = {cg_id: sym for sym, cg_id in coingecko_ids.items()}
+
+        # Placeholder addresses ("0x...") are shared, so only index unique ones
+        seen: Dict[str, int] = {}
+        for address in token_map.values():
+            seen[address.lower()] = seen.get(address.lower(), 0) + 1
+        self._symbol_by_address = {
+            address.lower(): sym for sym, address in token_map.items()
+            if seen[address.lower()] == 1
+        }
+
+    def symbol_for_id(self, coingecko_id: str) -> Optional[str]:
+        """Symbol for a CoinGecko id, or None if we don't track it."""
+        return self._symbol_by_id.get(coingecko_id)
+
+    def symbol_for_address(self, address: str) -> Optional[str]:
+        """Symbol for a token address, or None if unknown or ambiguous."""
+        return self._symbol_by_address.get(address.lower())
+
+    def resolve(self, address: str, symbol_hint: Optional[str] = None) -> Optional[str]:
+        """Symbol for an address, taking ``symbol_hint`` for a shared placeholder."""
+        symbol = self.symbol_for_address(address)
+        if symbol is None and symbol_hint in self.token_map \
+                and self.token_map[symbol_hint].lower() == address.lower():
+            return symbol_hint
+        return symbol
+
+    def trade_tokens(self, symbol: str, side: str, quote: str = "USDC") -> Dict[str, str]:
+        """``fromToken``/``toToken`` of a trade payload for ``symbol`` against ``quote``.
+
+        When either address is a shared placeholder the symbols go along as
+        ``fromSymbol``/``toSymbol``, so a stand-in API can tell them apart.
+        """
+        from_symbol, to_symbol = (symbol, quote) if side == "sell" else (quote, symbol)
+        tokens = {"fromToken": self.token_map[from_symbol], "toToken": self.token_map[to_symbol]}
+        if self.symbol_for_address(tokens["fromToken"]) is None \
+                or self.symbol_for_address(tokens["toToken"]) is None:
+            tokens.update(fromSymbol=from_symbol, toSymbol=to_symbol)
+        return tokens
+
+    def coingecko_id(self, symbol: str) -> Optional[str]:
+        return self.coingecko_ids.get(symbol)
+
+    def ids_for(self, symbols: Iterable[str]) -> List[str]:
+        """CoinGecko ids for the symbols that have one, in input order."""
+        return [self.coingecko_ids[sym] for sym in symbols if sym in self.coingecko_ids]
+
+    def address(self, symbol: str) -> str:
+        return self.token_map[symbol]
+
+    def decimals_for(self, symbol: str) -> int:
+        return self.decimals[symbol]
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.token_map
@@ -0,0 +1,309 @@
+"""
+Event-driven backtester for the advanced portfolio manager.
+
+Replays stored price history (see ``price_history_store.py``) as a series of
+4h cycles. Each cycle builds the same per-symbol metrics record that
+``get_market_metrics`` returns, feeds the ticks to the trailing stops and runs
+the live ``compute_orders_with_risk_management`` with a ``RiskManager`` on
+simulated time and an in-memory cost-basis ledger. Orders are filled by
+``SimulatedExchange`` instead of ``execute_trade``: sells first, then buys
+scaled to the USDC available, with each fill paying part of the asset's
+slippage tolerance plus a fee.
+
+    python backtester.py [days] [--offline]
+"""
+
+import os
+import sys
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import requests
+from dotenv import load_dotenv
+
+from advanced_portfolio_manager import (
+    COINGECKO_IDS, RiskManager, compute_orders_with_risk_management, get_slippage_tolerance,
+    load_targets,
+)
+from cost_basis import CostBasisLedger
+from price_history_store import DAY_MS, PRICE_HISTORY, PriceHistoryStore, now_ms
+from trailing_stop import TrailingStopTracker
+
+load_dotenv()
+
+# ------------------------------------------------------------
+#  Configuration
+# ------------------------------------------------------------
+BACKTEST_CONFIG = {
+    "INITIAL_CASH": float(os.getenv("BACKTEST_INITIAL_CASH", "10000")),     # USDC
+    "CYCLE_HOURS": float(os.getenv("BACKTEST_CYCLE_HOURS", "4")),
+    "WARMUP_DAYS": float(os.getenv("BACKTEST_WARMUP_DAYS", "30")),          # history before the first cycle
+    # Share of the slippage tolerance a fill actually pays
+    "SLIPPAGE_FILL_FRACTION": float(os.getenv("BACKTEST_SLIPPAGE_FILL_FRACTION", "0.25")),
+    "FEE": float(os.getenv("BACKTEST_FEE", "0.001")),
+}
+
+QUOTE_SYMBOL = "USDC"
+
+# ------------------------------------------------------------
+#  Market history
+# ------------------------------------------------------------
+class MarketHistory:
+    """Per-cycle market data as ``(cycles, symbols)`` arrays.
+
+    A symbol without a price yet (not listed, or no stored history) has a
+    price of 0 for that cycle and is left out of the metrics.
+    """
+
+    def __init__(self, times: np.ndarray, symbols: Sequence[str], price: np.ndarray,
+                 volume: np.ndarray, market_cap: np.ndarray, change_24h: np.ndarray,
+                 atl: np.ndarray, ath: np.ndarray):
+        self.times = times          # cycle timestamps, ms
+        self.symbols = list(symbols)
+        self.price = price
+        self.volume = volume
+        self.market_cap = market_cap
+        self.change_24h = change_24h
+        self.atl = atl
+        self.ath = ath
+
+    @classmethod
+    def from_rows(cls, rows: Dict[str, np.ndarray], times: np.ndarray) -> "MarketHistory":
+        """Sample stored rows at each cycle time (last row at or before it)."""
+        symbols = list(rows)
+        shape = (len(times), len(symbols))
+        price, volume, market_cap, change_24h, atl, ath = (np.zeros(shape) for _ in range(6))
+        for j, sym in enumerate(symbols):
+            r = rows[sym]
+            if not len(r):
+                continue
+            t = r["t"]
+            idx = np.searchsorted(t, times, "right") - 1
+            seen = idx >= 0
+            idx = np.maximum(idx, 0)
+            prev = np.searchsorted(t, times - DAY_MS, "right") - 1
+            has_prev = seen & (prev >= 0)
+            prev = np.maximum(prev, 0)
+
+            price[:, j] = np.where(seen, r["price"][idx], 0.0)
+            volume[:, j] = np.where(seen, np.nan_to_num(r["volume"][idx]), 0.0)
+            market_cap[:, j] = np.where(seen, np.nan_to_num(r["market_cap"][idx]), 0.0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                change_24h[:, j] = np.where(has_prev, (r["price"][idx] / r["price"][prev] - 1) * 100, 0.0)
+            # All-time low/high as of each cycle, over the stored history
+            atl[:, j] = np.where(seen, np.minimum.accumulate(r["price"])[idx], 0.0)
+            ath[:, j] = np.where(seen, np.maximum.accumulate(r["price"])[idx], 0.0)
+        return cls(times, symbols, price, volume, market_cap, change_24h, atl, ath)
+
+    def prices(self, i: int) -> Dict[str, float]:
+        return dict(zip(self.symbols, self.price[i].tolist()))
+
+    def metrics(self, i: int) -> Dict[str, Dict]:
+        """The ``get_market_metrics`` record for every priced symbol at cycle ``i``."""
+        metrics = {}
+        for j, sym in enumerate(self.symbols):
+            price = self.price[i, j]
+            if price <= 0:
+                continue
+            atl, ath = self.atl[i, j], self.ath[i, j]
+            metrics[sym] = {
+                "price": price,
+                "market_cap": self.market_cap[i, j],
+                "volume_24h": self.volume[i, j],
+                "price_change_24h": self.change_24h[i, j],
+                "ath": ath,
+                "ath_change_percentage": (price / ath - 1) * 100,
+                "atl": atl,
+                "atl_change_percentage": (price / atl - 1) * 100,
+            }
+        return metrics
+
+def cycle_times(days: float, end_ms: Optional[int] = None,
+                cycle_hours: float = BACKTEST_CONFIG["CYCLE_HOURS"]) -> np.ndarray:
+    """Cycle timestamps (ms) covering the last ``days``, on cycle boundaries."""
+    cycle_ms = int(cycle_hours * 3_600_000)
+    end_ms = end_ms or now_ms()
+    start_ms = end_ms - int(days * DAY_MS)
+    return np.arange(start_ms - start_ms % cycle_ms + cycle_ms, end_ms + 1, cycle_ms, dtype=np.int64)
+
+def load_market_history(symbols: Sequence[str], days: float, end_ms: Optional[int] = None,
+                        store: PriceHistoryStore = PRICE_HISTORY, sync: bool = True) -> MarketHistory:
+    """Market history for ``symbols`` from the price-history store.
+
+    With ``sync`` the store first fetches whatever part of the window (plus
+    ``WARMUP_DAYS``) it doesn't have yet. USDC is always included.
+    """
+    rows = {}
+    for sym in dict.fromkeys([*symbols, QUOTE_SYMBOL]):
+        coin_id = COINGECKO_IDS.get(sym)
+        if coin_id is None:
+            continue
+        if sync:
+            try:
+                store.sync(coin_id, days + BACKTEST_CONFIG["WARMUP_DAYS"])
+            except requests.exceptions.RequestException as e:
+                print(f"⚠️  No price history for {sym}: {e}")
+        rows[sym] = store.read(coin_id, None, end_ms)
+
+    history = MarketHistory.from_rows(rows, cycle_times(days, end_ms))
+    # A missing stablecoin print shouldn't make cash unpriceable
+    j = history.symbols.index(QUOTE_SYMBOL)
+    history.price[history.price[:, j] <= 0, j] = 1.0
+    return history
+
+# ------------------------------------------------------------
+#  Simulated execution
+# ------------------------------------------------------------
+class SimulatedExchange:
+    """Fills orders against the cycle's prices in place of ``execute_trade``.
+
+    Orders for the quote currency are no-ops: USDC is whatever the other
+    fills leave behind.
+    """
+
+    def __init__(self, ledger: CostBasisLedger, trailing: TrailingStopTracker,
+                 risk_manager: Optional[RiskManager] = None,
+                 slippage_fill_fraction: float = BACKTEST_CONFIG["SLIPPAGE_FILL_FRACTION"],
+                 fee: float = BACKTEST_CONFIG["FEE"]):
+        self.ledger = ledger
+        self.trailing = trailing
+        self.risk_manager = risk_manager
+        self.slippage_fill_fraction = slippage_fill_fraction
+        self.fee = fee
+        self.fills: List[Dict] = []
+        self.traded_value = 0.0
+
+    def cost(self, symbol: str, metrics: Dict[str, Dict]) -> float:
+        """Fractional price penalty of one fill."""
+        volume = metrics.get(symbol, {}).get("volume_24h", 0)
+        return get_slippage_tolerance(symbol, volume) * self.slippage_fill_fraction + self.fee
+
+    def execute(self, orders: List[Dict], prices: Dict[str, float], metrics: Dict[str, Dict],
+                holdings: Dict[str, float], timestamp: float) -> List[Dict]:
+        """Apply sells, then buys scaled to the USDC available; updates ``holdings``."""
+        fills = []
+        for order in orders:
+            sym = order['symbol']
+            if order['side'] != 'sell' or sym == QUOTE_SYMBOL:
+                continue
+            amount = min(order['amount'], holdings.get(sym, 0))
+            if amount <= 0:
+                continue
+            price = prices[sym] * (1 - self.cost(sym, metrics))
+            holdings[sym] -= amount
+            holdings[QUOTE_SYMBOL] = holdings.get(QUOTE_SYMBOL, 0) + amount * price
+            fills.append(self._fill(order, amount, price, timestamp))
+
+        buys = [o for o in orders if o['side'] == 'buy' and o['symbol'] != QUOTE_SYMBOL]
+        fill_prices = {o['symbol']: prices[o['symbol']] * (1 + self.cost(o['symbol'], metrics)) for o in buys}
+        needed = sum(o['amount'] * fill_prices[o['symbol']] for o in buys)
+        budget = holdings.get(QUOTE_SYMBOL, 0)
+        scale = min(1.0, budget / needed) if needed > 0 else 1.0
+        for order in buys:
+            sym = order['symbol']
+            amount = order['amount'] * scale
+            if amount <= 0:
+                continue
+            holdings[sym] = holdings.get(sym, 0) + amount
+            holdings[QUOTE_SYMBOL] -= amount * fill_prices[sym]
+            fills.append(self._fill(order, amount, fill_prices[sym], timestamp))
+        holdings[QUOTE_SYMBOL] = max(holdings[QUOTE_SYMBOL], 0.0)
+        return fills
+
+    def _fill(self, order: Dict, amount: float, price: float, timestamp: float) -> Dict:
+        sym, side = order['symbol'], order['side']
+        self.ledger.record(sym, side, amount, price)
+        if self.risk_manager:
+            self.risk_manager.record_fill(order)
+        if side == 'sell' and self.ledger.quantity(sym) <= 0:
+            # Position closed; a later buy starts a fresh high-water mark
+            self.trailing.untrack(sym)
+        self.traded_value += amount * price
+        fill = {"timestamp": timestamp, "symbol": sym, "side": side, "amount": amount,
+                "price": price, "reason": order.get('reason', '')}
+        self.fills.append(fill)
+        return fill
+
+# ------------------------------------------------------------
+#  Replay
+# ------------------------------------------------------------
+def summarize(equity: np.ndarray, traded_value: float) -> Dict[str, float]:
+    """Total return, max drawdown and turnover (traded value / mean equity)."""
+    if not len(equity) or equity[0] <= 0:
+        return {"total_return": 0.0, "max_drawdown": 0.0, "turnover": 0.0}
+    peaks = np.maximum.accumulate(equity)
+    return {
+        "total_return": float(equity[-1] / equity[0] - 1),
+        "max_drawdown": float(np.max(1 - equity / peaks)),
+        "turnover": float(traded_value / equity.mean()),
+    }
+
+def run_backtest(targets: Dict[str, float], history: MarketHistory,
+                 initial_cash: float = BACKTEST_CONFIG["INITIAL_CASH"]) -> Dict:
+    """Replay every cycle of ``history`` starting from ``initial_cash`` USDC.
+
+    USDC is added to the targets at 0% when missing, so the starting cash is
+    part of the portfolio value and gets deployed.
+    """
+    targets = dict(targets)
+    targets.setdefault(QUOTE_SYMBOL, 0.0)
+    clock = [0.0]
+    risk_manager = RiskManager(state_file=None, clock=lambda: clock[0])
+    ledger = CostBasisLedger()
+    exchange = SimulatedExchange(ledger, risk_manager.trailing, risk_manager)
+
+    holdings = {QUOTE_SYMBOL: initial_cash}
+    equity = np.zeros(len(history.times))
+    skipped = 0
+    for i, timestamp in enumerate(history.times):
+        clock[0] = int(timestamp) / 1000
+        prices = history.prices(i)
+        metrics = history.metrics(i)
+        risk_manager.trailing.observe(prices)
+        try:
+            orders = compute_orders_with_risk_management(
+                targets, prices, holdings, metrics, risk_manager, ledger
+            )
+        except ValueError:
+            # Same as a live cycle: a held asset without a price skips the rebalance
+            orders = []
+            skipped += 1
+        exchange.execute(orders, prices, metrics, holdings, clock[0])
+        equity[i] = sum(amount * prices.get(sym, 0) for sym, amount in holdings.items())
+
+    reasons = [fill['reason'] for fill in exchange.fills]
+    return dict(
+        summarize(equity, exchange.traded_value),
+        times=history.times,
+        equity=equity,
+        holdings=holdings,
+        fills=exchange.fills,
+        trades=len(exchange.fills),
+        stop_losses=sum(r.startswith("Stop-loss") for r in reasons),
+        risk_reductions=sum(r.startswith("Risk reduction") for r in reasons),
+        skipped_cycles=skipped,
+    )
+
+def print_report(result: Dict):
+    print(f"\n{'='*60}")
+    print(f"BACKTEST - {len(result['times'])} cycles")
+    print(f"{'='*60}")
+    print(f"Final Equity:     ${result['equity'][-1]:,.2f}")
+    print(f"Total Return:     {result['total_return']:.2%}")
+    print(f"Max Drawdown:     {result['max_drawdown']:.2%}")
+    print(f"Turnover:         {result['turnover']:.2f}x")
+    print(f"Trades:           {result['trades']} ({result['stop_losses']} stop-loss, "
+          f"{result['risk_reductions']} risk reduction)")
+    if result['skipped_cycles']:
+        print(f"⚠️  Skipped cycles: {result['skipped_cycles']}")
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    days = float(args[0]) if args else 365
+    targets = load_targets()
+    print(f"📼 Backtesting {len(targets)} assets over {days:.0f} days...")
+    history = load_market_history(list(targets), days, sync="--offline" not in sys.argv)
+    print_report(run_backtest(targets, history))
+
+if __name__ == "__main__":
+    main()
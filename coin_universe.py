@@ -0,0 +1,150 @@
+"""
+Tracked-coin universe registry.
+
+Loads the CoinGecko ids we track from config, canonicalizes and dedups them,
+and validates them once against a cached ``/coins/list`` snapshot. Ids that
+CoinGecko does not know are kept in a negative cache so the hot loop never
+requests them again.
+"""
+
+import json
+import os
+import time
+from typing import List, Optional, Set
+
+import requests
+from dotenv import load_dotenv
+
+import http_client
+from http_client import COINGECKO_API
+
+load_dotenv()
+
+# ------------------------------------------------------------
+#  Configuration
+# ------------------------------------------------------------
+UNIVERSE_CONFIG_FILE = "tracked_coins_config.json"
+COINS_LIST_SNAPSHOT_FILE = "coingecko_coins_list.json"
+INVALID_IDS_FILE = "invalid_coin_ids.json"
+COINS_LIST_TTL = 24 * 3600  # refresh the /coins/list snapshot daily
+
+# Popular Solana meme coins to track
+DEFAULT_TRACKED_COINS = [
+    'dogwifhat', 'bonk', 'book-of-meme', 'popcat', 'myro', 'catwifhat',
+    'jupiter', 'raydium', 'orca', 'serum', 'samoyedcoin', 'solana',
+    'pepe', 'wojak', 'floki', 'shiba-inu', 'dogecoin',
+]
+
+def canonical_id(coin_id: str) -> str:
+    """CoinGecko ids are lowercase slugs."""
+    return coin_id.strip().lower()
+
+def _read_json(path: str):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def _write_json(path: str, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+# ------------------------------------------------------------
+#  Universe registry
+# ------------------------------------------------------------
+class CoinUniverse:
+    """Deduplicated, validated set of CoinGecko ids to track."""
+
+    def __init__(self, config_file: str = UNIVERSE_CONFIG_FILE,
+                 snapshot_file: str = COINS_LIST_SNAPSHOT_FILE,
+                 invalid_file: str = INVALID_IDS_FILE):
+        self.config_file = config_file
+        self.snapshot_file = snapshot_file
+        self.invalid_file = invalid_file
+        self.api_key = os.getenv('PRODUCTION_API_KEY') or os.getenv('SANDBOX_API_KEY')
+
+        self.invalid_ids: Set[str] = set(_read_json(invalid_file) or [])
+        self._known_ids: Optional[Set[str]] = None
+        self._tracked: Optional[List[str]] = None
+
+    def load_config(self) -> List[str]:
+        """Load tracked ids from config, writing the defaults if missing."""
+        coin_ids = _read_json(self.config_file)
+        if coin_ids is None:
+            coin_ids = list(DEFAULT_TRACKED_COINS)
+            with open(self.config_file, "w") as f:
+                json.dump(coin_ids, f, indent=2)
+        return coin_ids
+
+    def known_ids(self) -> Optional[Set[str]]:
+        """All ids CoinGecko lists, from the cached snapshot when fresh."""
+        if self._known_ids is not None:
+            return self._known_ids
+
+        snapshot = _read_json(self.snapshot_file)
+        if snapshot and time.time() - snapshot.get("fetched_at", 0) < COINS_LIST_TTL:
+            self._known_ids = set(snapshot["ids"])
+            return self._known_ids
+
+        try:
+            params = {}
+            if self.api_key:
+                params['x_cg_demo_api_key'] = self.api_key
+            response = http_client.get(f"{COINGECKO_API}/coins/list", params=params)
+            response.raise_for_status()
+            ids = [coin['id'] for coin in response.json()]
+            _write_json(self.snapshot_file, {"fetched_at": time.time(), "ids": ids})
+            self._known_ids = set(ids)
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️  Could not refresh /coins/list snapshot: {e}")
+            # A stale snapshot still beats skipping validation entirely
+            if snapshot:
+                self._known_ids = set(snapshot["ids"])
+
+        return self._known_ids
+
+    def tracked_ids(self) -> List[str]:
+        """Canonical, deduplicated and validated ids, in config order."""
+        if self._tracked is not None:
+            return self._tracked
+
+        known = self.known_ids()
+        tracked, seen = [], set()
+        newly_invalid = []
+
+        for coin_id in map(canonical_id, self.load_config()):
+            if coin_id in seen or coin_id in self.invalid_ids:
+                continue
+            seen.add(coin_id)
+            if known is not None and coin_id not in known:
+                newly_invalid.append(coin_id)
+                continue
+            tracked.append(coin_id)
+
+        if newly_invalid:
+            print(f"⚠️  Skipping unknown CoinGecko ids: {', '.join(newly_invalid)}")
+            self.invalid_ids.update(newly_invalid)
+            self._save_invalid()
+
+        self._tracked = tracked
+        return tracked
+
+    def mark_invalid(self, coin_id: str):
+        """Record an id CoinGecko rejected so it is never requested again."""
+        coin_id = canonical_id(coin_id)
+        if coin_id in self.invalid_ids:
+            return
+        self.invalid_ids.add(coin_id)
+        self._save_invalid()
+        if self._tracked is not None and coin_id in self._tracked:
+            self._tracked.remove(coin_id)
+
+    def is_valid(self, coin_id: str) -> bool:
+        """Whether an id may be requested."""
+        return canonical_id(coin_id) not in self.invalid_ids
+
+    def _save_invalid(self):
+        _write_json(self.invalid_file, sorted(self.invalid_ids))
@@ -0,0 +1,256 @@
+"""
+Record and replay CoinGecko responses.
+
+``Recorder`` hooks into ``http_client`` and captures every successful GET to
+``/coins/markets``, ``/coins/{id}`` (including ``/coins/list``),
+``/simple/price`` and ``/coins/{id}/market_chart[/range]`` into a gzipped JSON
+archive. Responses are keyed by path and query (API keys left out, and the
+moving ``from``/``to`` of range requests too); repeated requests keep their
+sequence, with consecutive duplicates stored once.
+
+The replay server serves an archive back with configurable latency: each key
+returns its recorded responses in order and then repeats the last one, so a
+recorded run of several cycles replays the same way every time. Combined with
+``mock_recall_server.py`` a full ``run_full_cycle`` runs with no network:
+
+    python coingecko_replay.py record analyze     # trading_agent.py analyze, recorded
+    python coingecko_replay.py serve              # then, in another shell:
+    COINGECKO_API_URL=http://127.0.0.1:8766/api/v3 python trading_agent.py analyze
+"""
+
+import gzip
+import json
+import os
+import random
+import re
+import runpy
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from dotenv import load_dotenv
+
+import http_client
+from http_client import COINGECKO_API
+
+load_dotenv()
+
+# ------------------------------------------------------------
+#  Configuration
+# ------------------------------------------------------------
+REPLAY_CONFIG = {
+    "ARCHIVE": os.getenv("COINGECKO_REPLAY_ARCHIVE", "coingecko_archive.json.gz"),
+    "HOST": os.getenv("COINGECKO_REPLAY_HOST", "127.0.0.1"),
+    "PORT": int(os.getenv("COINGECKO_REPLAY_PORT", "8766")),
+    "LATENCY_MS": float(os.getenv("COINGECKO_REPLAY_LATENCY_MS", "0")),
+    "LATENCY_JITTER_MS": float(os.getenv("COINGECKO_REPLAY_LATENCY_JITTER_MS", "0")),
+    "SEED": int(os.getenv("COINGECKO_REPLAY_SEED", "42")),
+}
+
+# Paths (relative to the API base) worth recording
+RECORDED_PATHS = re.compile(
+    r"^/(coins/markets|coins/[^/]+|simple/price|coins/[^/]+/market_chart(/range)?)$"
+)
+
+# Never part of a replay key: credentials, and range bounds that move with the clock
+UNKEYED_PARAMS = {"x_cg_demo_api_key", "x_cg_pro_api_key", "from", "to"}
+
+API_PREFIX = urlsplit(COINGECKO_API).path  # e.g. /api/v3
+
+def replay_key(path: str, params: Optional[Dict] = None) -> str:
+    """Stable key for a GET, with params as they appear on the wire."""
+    params = sorted((k, str(v)) for k, v in (params or {}).items() if k not in UNKEYED_PARAMS)
+    return f"{path}?{urlencode(params)}"
+
+# ------------------------------------------------------------
+#  Archive
+# ------------------------------------------------------------
+def load_archive(path: str) -> Dict[str, List[Any]]:
+    with gzip.open(path, "rt") as f:
+        return json.load(f)["responses"]
+
+def save_archive(path: str, responses: Dict[str, List[Any]]):
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt") as f:
+        json.dump({
+            "base": COINGECKO_API,
+            "recorded_at": datetime.now().isoformat(),
+            "responses": responses,
+        }, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+class Recorder:
+    """Captures CoinGecko GETs from ``http_client`` while started."""
+
+    def __init__(self, base: str = COINGECKO_API):
+        self.base = urlsplit(base)
+        self.responses: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def hook(self, url: str, params: Optional[Dict], data: Any):
+        parts = urlsplit(url)
+        if parts.netloc != self.base.netloc or not parts.path.startswith(self.base.path):
+            return
+        path = parts.path[len(self.base.path):]
+        if not RECORDED_PATHS.match(path):
+            return
+        key = replay_key(path, params)
+        with self._lock:
+            sequence = self.responses.setdefault(key, [])
+            if not sequence or sequence[-1] != data:
+                sequence.append(data)
+
+    def start(self):
+        http_client.add_response_hook(self.hook)
+
+    def stop(self):
+        http_client.remove_response_hook(self.hook)
+
+    def save(self, path: str = REPLAY_CONFIG["ARCHIVE"]):
+        with self._lock:
+            save_archive(path, self.responses)
+        count = sum(len(v) for v in self.responses.values())
+        print(f"💾 Recorded {count} responses for {len(self.responses)} requests to {path}")
+
+    def __enter__(self) -> "Recorder":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+# ------------------------------------------------------------
+#  Replay server
+# ------------------------------------------------------------
+class ReplayArchive:
+    """Recorded responses with a replay cursor per key."""
+
+    def __init__(self, responses: Dict[str, List[Any]], config: Dict = REPLAY_CONFIG):
+        self.responses = responses
+        self.config = dict(config)
+        self.rng = random.Random(self.config["SEED"])
+        self.cursors: Dict[str, int] = {}
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    def next(self, key: str) -> Optional[Any]:
+        """The next recorded response for ``key``, repeating the last one."""
+        with self._lock:
+            sequence = self.responses.get(key)
+            if not sequence:
+                self.stats["misses"] += 1
+                return None
+            cursor = self.cursors.get(key, 0)
+            self.cursors[key] = cursor + 1
+            self.stats["hits"] += 1
+            return sequence[min(cursor, len(sequence) - 1)]
+
+    def rewind(self):
+        with self._lock:
+            self.cursors.clear()
+            self.stats = {"hits": 0, "misses": 0}
+            self.rng = random.Random(self.config["SEED"])
+
+    def latency(self) -> float:
+        with self._lock:
+            jitter = self.rng.uniform(-1, 1) * self.config["LATENCY_JITTER_MS"]
+        return max(0.0, self.config["LATENCY_MS"] + jitter) / 1000
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """Serves the server's ``ReplayArchive`` under the API prefix."""
+
+    @property
+    def archive(self) -> ReplayArchive:
+        return self.server.archive
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, body: Any):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path == "/replay/stats":
+            self.send_json(200, self.archive.stats)
+            return
+        path = parts.path[len(API_PREFIX):] if parts.path.startswith(API_PREFIX) else parts.path
+        time.sleep(self.archive.latency())
+        data = self.archive.next(replay_key(path, dict(parse_qsl(parts.query))))
+        if data is None:
+            self.send_json(404, {"error": f"Not recorded: {path}"})
+        else:
+            self.send_json(200, data)
+
+    def do_POST(self):
+        if urlsplit(self.path).path == "/replay/rewind":
+            self.archive.rewind()
+            self.send_json(200, {"success": True})
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+def create_server(archive: ReplayArchive, host: str = REPLAY_CONFIG["HOST"],
+                  port: int = REPLAY_CONFIG["PORT"]) -> ThreadingHTTPServer:
+    """Bind the replay server; ``port=0`` picks a free port."""
+    server = ThreadingHTTPServer((host, port), ReplayHandler)
+    server.daemon_threads = True
+    server.archive = archive
+    return server
+
+def start_replay_server(archive: ReplayArchive, host: str = REPLAY_CONFIG["HOST"],
+                        port: int = REPLAY_CONFIG["PORT"]) -> ThreadingHTTPServer:
+    """Serve on a daemon thread; call ``shutdown()`` on the result to stop."""
+    server = create_server(archive, host, port)
+    threading.Thread(target=server.serve_forever, name="coingecko-replay", daemon=True).start()
+    return server
+
+# ------------------------------------------------------------
+#  Command line
+# ------------------------------------------------------------
+def record(args: List[str], path: str = REPLAY_CONFIG["ARCHIVE"]):
+    """Run ``trading_agent.py <args>`` and record its CoinGecko traffic."""
+    with Recorder() as recorder:
+        sys.argv = ["trading_agent.py", *args]
+        try:
+            runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "trading_agent.py"),
+                           run_name="__main__")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            recorder.save(path)
+
+def serve(path: str = REPLAY_CONFIG["ARCHIVE"]):
+    archive = ReplayArchive(load_archive(path))
+    server = create_server(archive)
+    host, port = server.server_address[:2]
+    print(f"📼 Replaying {len(archive.responses)} recorded requests from {path}")
+    print(f"   COINGECKO_API_URL=http://{host}:{port}{API_PREFIX} "
+          f"(latency {REPLAY_CONFIG['LATENCY_MS']:.0f}ms)")
+    print("Press Ctrl-C to quit")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 CoinGecko replay stopped.")
+    finally:
+        server.server_close()
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "record":
+        record(sys.argv[2:] or ["analyze"])
+    elif command == "serve":
+        serve()
+    else:
+        print("Usage: python coingecko_replay.py record [trading_agent command] | serve")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Cost-basis ledger fed from executed trades.
+
+Each symbol keeps its open FIFO lots plus running totals, so the FIFO and
+average entry prices are O(1) reads for the stop-loss hot path and each fill
+is an O(1) amortized update instead of a rescan of the trade log. The ledger
+is persisted to a small JSON file after every fill.
+"""
+
+import json
+import os
+import threading
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+# Entry-price methods
+FIFO, AVERAGE = "fifo", "average"
+
+# Lots smaller than this are float residue from partial sells
+DUST = 1e-12
+
+def fill_from_result(order: Dict, result: Dict) -> Optional[Tuple[float, float]]:
+    """``(token_quantity, unit_price_usd)`` from a Recall trade result.
+
+    Buys spend USDC (``fromAmount``) for tokens (``toAmount``); sells the
+    reverse. Returns None when the result doesn't describe a fill.
+    """
+    transaction = (result or {}).get('transaction') or {}
+    try:
+        from_amount = float(transaction['fromAmount'])
+        to_amount = float(transaction['toAmount'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if order['side'] == 'buy':
+        quantity, usd = to_amount, from_amount
+    else:
+        quantity, usd = from_amount, to_amount
+    if quantity <= 0:
+        return None
+    return quantity, usd / quantity
+
+class Position:
+    """Open lots and running totals for one symbol."""
+
+    __slots__ = ("lots", "quantity", "fifo_cost", "average_cost", "realized_pnl")
+
+    def __init__(self):
+        self.lots = deque()          # [quantity, unit_price], oldest first
+        self.quantity = 0.0
+        self.fifo_cost = 0.0         # cost of the lots still open
+        self.average_cost = 0.0      # average-cost method total
+        self.realized_pnl = 0.0      # FIFO realized P&L
+
+    def buy(self, quantity: float, price: float):
+        self.lots.append([quantity, price])
+        self.quantity += quantity
+        self.fifo_cost += quantity * price
+        self.average_cost += quantity * price
+
+    def sell(self, quantity: float, price: float):
+        quantity = min(quantity, self.quantity)
+        if quantity <= 0:
+            return
+        self.average_cost -= self.average_cost * (quantity / self.quantity)
+        self.quantity -= quantity
+
+        remaining = quantity
+        while remaining > 0 and self.lots:
+            lot = self.lots[0]
+            used = min(lot[0], remaining)
+            self.fifo_cost -= used * lot[1]
+            self.realized_pnl += used * (price - lot[1])
+            lot[0] -= used
+            remaining -= used
+            if lot[0] <= DUST:
+                self.lots.popleft()
+
+        if not self.lots or self.quantity <= DUST:
+            self.lots.clear()
+            self.quantity = self.fifo_cost = self.average_cost = 0.0
+
+    def entry_price(self, method: str = AVERAGE) -> Optional[float]:
+        if self.quantity <= 0:
+            return None
+        cost = self.fifo_cost if method == FIFO else self.average_cost
+        return cost / self.quantity
+
+    def to_dict(self) -> Dict:
+        return {
+            "lots": list(self.lots),
+            "average_cost": self.average_cost,
+            "realized_pnl": self.realized_pnl,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Position":
+        position = cls()
+        for quantity, price in data.get("lots", []):
+            position.buy(quantity, price)
+        position.average_cost = data.get("average_cost", position.average_cost)
+        position.realized_pnl = data.get("realized_pnl", 0.0)
+        return position
+
+class CostBasisLedger:
+    """Per-symbol cost basis persisted to ``path``."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.positions: Dict[str, Position] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️  Ignoring unreadable cost basis {self.path}: {e}")
+            return
+        self.positions = {sym: Position.from_dict(p) for sym, p in data.items()}
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({sym: p.to_dict() for sym, p in self.positions.items()}, f)
+        os.replace(tmp_path, self.path)
+
+    def record(self, symbol: str, side: str, quantity: float, price: float):
+        """Apply one fill."""
+        with self._lock:
+            position = self.positions.setdefault(symbol, Position())
+            if side == 'buy':
+                position.buy(quantity, price)
+            else:
+                position.sell(quantity, price)
+            self.save()
+
+    def record_fill(self, order: Dict, result: Dict) -> bool:
+        """Apply a fill from an executed order's API result."""
+        fill = fill_from_result(order, result)
+        if fill is None:
+            return False
+        self.record(order['symbol'], order['side'], *fill)
+        return True
+
+    def seed(self, symbol: str, quantity: float, price: float):
+        """Open a position we hold but never saw bought (e.g. a pre-ledger
+        balance) at ``price``, so later moves are measured from today."""
+        with self._lock:
+            if self.quantity(symbol) > 0 or quantity <= 0:
+                return
+            self.positions[symbol] = Position()
+            self.positions[symbol].buy(quantity, price)
+            self.save()
+
+    def quantity(self, symbol: str) -> float:
+        position = self.positions.get(symbol)
+        return position.quantity if position else 0.0
+
+    def entry_price(self, symbol: str, method: str = AVERAGE) -> Optional[float]:
+        """FIFO or average entry price of the open position, or None."""
+        position = self.positions.get(symbol)
+        return position.entry_price(method) if position else None
+
+    def realized_pnl(self, symbol: str) -> float:
+        position = self.positions.get(symbol)
+        return position.realized_pnl if position else 0.0
+
+_ledgers: Dict[str, CostBasisLedger] = {}
+_ledgers_lock = threading.Lock()
+
+def open_ledger(path: str) -> CostBasisLedger:
+    """Process-wide ledger for a path."""
+    with _ledgers_lock:
+        ledger = _ledgers.get(path)
+        if ledger is None:
+            ledger = CostBasisLedger(path)
+            _ledgers[path] = ledger
+        return ledger
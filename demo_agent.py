@@ -24,7 +24,7 @@ from dotenv import load_dotenv
 from solana_meme_fetcher import SolanaMemeFetcher
 from solana_meme_loss_tracker import SolanaMemeLossTracker
 from advanced_portfolio_manager import (
-    load_targets, fetch_prices, fetch_holdings, get_market_metrics,
+    load_targets, fetch_prices, fetch_holdings, get_market_metrics, prices_from_metrics,
     analyze_portfolio_performance, compute_orders_with_risk_management,
     RiskManager, DRIFT_THRESHOLDS, STOP_LOSS_CONFIG
 )
@@ -130,8 +130,8 @@ class SolanaMemeAgentDemo:
             
             # Fetch market data
             symbols = list(targets.keys())
-            prices = fetch_prices(symbols)
             metrics = get_market_metrics(symbols)
+            prices = prices_from_metrics(metrics, symbols)
             
             # Simulate holdings (for demo purposes)
             holdings = {symbol: 1000.0 for symbol in symbols}  # Demo holdings
@@ -0,0 +1,110 @@
+"""
+Concurrent order execution.
+
+Orders from ``compute_orders_with_risk_management`` are sells first, then
+buys funded by those sells. The engine submits every sell concurrently, waits
+for them to settle, then sizes the buys to the USDC actually available and
+submits those concurrently. Submissions are paced by a token bucket rather
+than fixed sleeps.
+"""
+
+import asyncio
+import os
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from rate_limiter import TokenBucket
+
+load_dotenv()
+
+# ------------------------------------------------------------
+#  Configuration
+# ------------------------------------------------------------
+EXECUTION_CONFIG = {
+    "MAX_CONCURRENCY": int(os.getenv("EXECUTION_MAX_CONCURRENCY", "8")),
+    "ORDERS_PER_SECOND": float(os.getenv("EXECUTION_ORDERS_PER_SECOND", "5")),
+    "BURST": float(os.getenv("EXECUTION_BURST", "5")),
+}
+
+QUOTE_SYMBOL = "USDC"
+
+def usdc_released(trade: Dict, price: float) -> float:
+    """USDC a settled sell put back in the wallet."""
+    transaction = (trade.get('result') or {}).get('transaction') or {}
+    if transaction.get('toAmount') is not None:
+        return float(transaction['toAmount'])
+    return trade['order']['amount'] * price
+
+class ExecutionEngine:
+    """Sells-before-buys order executor with bounded concurrency."""
+
+    def __init__(self, execute: Callable[[Dict], Dict],
+                 rate_limiter: Optional[TokenBucket] = None,
+                 max_concurrency: int = EXECUTION_CONFIG["MAX_CONCURRENCY"]):
+        # `execute` takes one order dict and returns the API result
+        self.execute = execute
+        self.rate_limiter = rate_limiter or TokenBucket(
+            EXECUTION_CONFIG["ORDERS_PER_SECOND"], EXECUTION_CONFIG["BURST"]
+        )
+        self.max_concurrency = max_concurrency
+
+    async def submit(self, order: Dict, semaphore: asyncio.Semaphore) -> Dict:
+        """Submit one order and wrap the outcome in a trade log entry."""
+        async with semaphore:
+            await self.rate_limiter.acquire_async()
+            try:
+                result = await asyncio.to_thread(self.execute, order)
+                return {
+                    'timestamp': datetime.now().isoformat(),
+                    'order': order,
+                    'result': result,
+                    'status': 'success'
+                }
+            except Exception as e:
+                return {
+                    'timestamp': datetime.now().isoformat(),
+                    'order': order,
+                    'error': str(e),
+                    'status': 'failed'
+                }
+
+    def size_buys(self, buys: List[Dict], budget: float, prices: Dict[str, float]) -> List[Dict]:
+        """Scale buys down pro rata when they cost more USDC than is available."""
+        cost = sum(o['amount'] * prices.get(o['symbol'], 0) for o in buys if o['symbol'] != QUOTE_SYMBOL)
+        if cost <= budget or cost == 0:
+            return buys
+
+        scale = max(budget, 0) / cost
+        print(f"⚠️  Buys need ${cost:,.2f} but only ${budget:,.2f} USDC is available; scaling to {scale:.1%}")
+        sized = []
+        for order in buys:
+            if order['symbol'] != QUOTE_SYMBOL:
+                order = dict(order, amount=order['amount'] * scale)
+            sized.append(order)
+        return sized
+
+    async def run(self, orders: List[Dict], prices: Dict[str, float],
+                  holdings: Dict[str, float]) -> List[Dict]:
+        """Execute sells concurrently, then buys sized to the USDC released."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        sells = [o for o in orders if o['side'] == 'sell']
+        buys = [o for o in orders if o['side'] == 'buy']
+
+        sell_trades = list(await asyncio.gather(*(self.submit(o, semaphore) for o in sells)))
+
+        budget = holdings.get(QUOTE_SYMBOL, 0) + sum(
+            usdc_released(t, prices.get(t['order']['symbol'], 0))
+            for t in sell_trades
+            if t['status'] == 'success' and t['order']['symbol'] != QUOTE_SYMBOL
+        )
+        buys = self.size_buys(buys, budget, prices)
+
+        buy_trades = list(await asyncio.gather(*(self.submit(o, semaphore) for o in buys)))
+        return sell_trades + buy_trades
+
+    def execute_orders(self, orders: List[Dict], prices: Dict[str, float],
+                       holdings: Dict[str, float]) -> List[Dict]:
+        """Synchronous entry point for the scheduler-driven code paths."""
+        return asyncio.run(self.run(orders, prices, holdings))
@@ -0,0 +1,194 @@
+"""
+Shared HTTP client for CoinGecko and Recall calls.
+
+Every module goes through one pooled ``requests.Session`` so repeated calls to
+the same host reuse keep-alive connections instead of paying a fresh TCP+TLS
+handshake per request. Pool sizes and timeouts come from the environment.
+
+Requests are paced by the shared per-host ``RATE_LIMITER``, and a 429 is
+retried after the server's ``Retry-After`` instead of failing the caller; that
+happens in ``_send`` only, so a 429 is never retried again by the outer
+layer. Connection errors, timeouts and 5xx responses on GETs are retried with
+jittered backoff behind a per-endpoint circuit breaker (see ``resilience``).
+POSTs are only retried when the request provably never reached the server.
+
+Successful GETs are passed to any registered response hooks, which is how
+``coingecko_replay`` records sessions.
+"""
+
+import asyncio
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import aiohttp
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import RATE_LIMITER
+from resilience import (
+    RetryableHTTPError, breaker_for, call_with_retries, call_with_retries_async, endpoint_name
+)
+
+load_dotenv()
+
+# ------------------------------------------------------------
+#  Configuration
+# ------------------------------------------------------------
+# Point at coingecko_replay.py with COINGECKO_API_URL=http://127.0.0.1:8766/api/v3
+COINGECKO_API = os.getenv("COINGECKO_API_URL") or "https://api.coingecko.com/api/v3"
+
+HTTP_CONFIG = {
+    "CONNECT_TIMEOUT": float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")),   # seconds
+    "READ_TIMEOUT": float(os.getenv("HTTP_READ_TIMEOUT", "10")),        # seconds
+    "TRADE_TIMEOUT": float(os.getenv("HTTP_TRADE_TIMEOUT", "20")),      # seconds
+    "POOL_HOSTS": int(os.getenv("HTTP_POOL_HOSTS", "4")),               # hosts kept pooled
+    "MAX_CONNECTIONS_PER_HOST": int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "8")),
+    "KEEPALIVE_SECONDS": float(os.getenv("HTTP_KEEPALIVE_SECONDS", "30")),
+    "MAX_429_RETRIES": int(os.getenv("HTTP_MAX_429_RETRIES", "2")),
+}
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+# Called as hook(url, params, data) after every successful GET
+_response_hooks: List[Callable[[str, Optional[Dict], Any], None]] = []
+
+def add_response_hook(hook: Callable[[str, Optional[Dict], Any], None]):
+    _response_hooks.append(hook)
+
+def remove_response_hook(hook: Callable[[str, Optional[Dict], Any], None]):
+    if hook in _response_hooks:
+        _response_hooks.remove(hook)
+
+def _notify(url: str, params: Optional[Dict], data: Any):
+    for hook in list(_response_hooks):
+        hook(url, params, data)
+
+# ------------------------------------------------------------
+#  Sync client
+# ------------------------------------------------------------
+def get_session() -> requests.Session:
+    """Return the process-wide pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_CONFIG["POOL_HOSTS"],
+                    pool_maxsize=HTTP_CONFIG["MAX_CONNECTIONS_PER_HOST"],
+                    pool_block=True,  # cap concurrent connections per host
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+def close_session():
+    """Close pooled connections (e.g. on shutdown)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def _timeout(read_timeout: Optional[float]) -> tuple:
+    return (HTTP_CONFIG["CONNECT_TIMEOUT"], read_timeout or HTTP_CONFIG["READ_TIMEOUT"])
+
+def _send(method: str, url: str, params: Optional[Dict], headers: Optional[Dict],
+          **kwargs) -> requests.Response:
+    """Rate-limited request; a 429 waits out the pause and is retried."""
+    for attempt in range(HTTP_CONFIG["MAX_429_RETRIES"] + 1):
+        RATE_LIMITER.acquire(url, params, headers)
+        response = get_session().request(method, url, params=params, headers=headers, **kwargs)
+        RATE_LIMITER.observe(url, params, headers, response.status_code, response.headers)
+        if response.status_code != 429 or attempt == HTTP_CONFIG["MAX_429_RETRIES"]:
+            break
+        # A 429 means the request was rejected outright, so retrying is safe
+        print(f"⏳ Rate limited by {url}, retrying ({attempt + 1}/{HTTP_CONFIG['MAX_429_RETRIES']})")
+    if _response_hooks and method == "GET" and response.ok:
+        try:
+            _notify(url, params, response.json())
+        except ValueError:
+            pass  # not JSON
+    return response
+
+# Errors after which a GET is safe to repeat
+_GET_RETRY_ON = (requests.ConnectionError, requests.Timeout)
+# A POST that timed out reading may already have executed; only retry when
+# the connection was never established
+_POST_RETRY_ON = (requests.exceptions.ConnectTimeout,)
+
+def _server_failed(response: requests.Response) -> bool:
+    # 429s were already retried by _send
+    return response.status_code >= 500
+
+def _request(method: str, url: str, params: Optional[Dict], headers: Optional[Dict],
+             **kwargs) -> requests.Response:
+    """Send with retries and the endpoint's circuit breaker."""
+    if method == "GET":
+        retry_on, retry_result = _GET_RETRY_ON, _server_failed
+    else:
+        retry_on, retry_result = _POST_RETRY_ON, None
+    return call_with_retries(
+        lambda: _send(method, url, params, headers, **kwargs),
+        breaker_for(endpoint_name(method, url)),
+        retry_on,
+        retry_result,
+    )
+
+def get(url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None,
+        timeout: Optional[float] = None) -> requests.Response:
+    """GET through the pooled session."""
+    return _request("GET", url, params, headers, timeout=_timeout(timeout))
+
+def post(url: str, json: Optional[Dict] = None, headers: Optional[Dict] = None,
+         timeout: Optional[float] = None) -> requests.Response:
+    """POST through the pooled session."""
+    return _request("POST", url, None, headers, json=json, timeout=_timeout(timeout))
+
+# ------------------------------------------------------------
+#  Async client
+# ------------------------------------------------------------
+def async_session() -> aiohttp.ClientSession:
+    """Create an aiohttp session with the same pool limits and timeouts.
+
+    aiohttp sessions are bound to an event loop, so callers open one per batch
+    (``async with async_session() as session``) and share it across requests.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_CONFIG["POOL_HOSTS"] * HTTP_CONFIG["MAX_CONNECTIONS_PER_HOST"],
+        limit_per_host=HTTP_CONFIG["MAX_CONNECTIONS_PER_HOST"],
+        keepalive_timeout=HTTP_CONFIG["KEEPALIVE_SECONDS"],
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=HTTP_CONFIG["CONNECT_TIMEOUT"] + HTTP_CONFIG["READ_TIMEOUT"],
+        connect=HTTP_CONFIG["CONNECT_TIMEOUT"],
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+async def get_json_async(session: aiohttp.ClientSession, url: str,
+                         params: Optional[Dict] = None, headers: Optional[Dict] = None):
+    """Rate-limited GET on an aiohttp session, returning the decoded JSON."""
+    async def send():
+        for attempt in range(HTTP_CONFIG["MAX_429_RETRIES"] + 1):
+            await RATE_LIMITER.acquire_async(url, params, headers)
+            async with session.get(url, params=params, headers=headers) as response:
+                RATE_LIMITER.observe(url, params, headers, response.status, response.headers)
+                if response.status == 429 and attempt < HTTP_CONFIG["MAX_429_RETRIES"]:
+                    continue
+                if response.status >= 500:
+                    raise RetryableHTTPError(response.status, url)
+                response.raise_for_status()
+                data = await response.json()
+                if _response_hooks:
+                    _notify(url, params, data)
+                return data
+
+    return await call_with_retries_async(
+        send,
+        breaker_for(endpoint_name("GET", url)),
+        (aiohttp.ClientConnectionError, asyncio.TimeoutError, RetryableHTTPError),
+    )
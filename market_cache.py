@@ -0,0 +1,230 @@
+"""
+Shared market-data cache.
+
+One process-wide cache sits in front of every CoinGecko GET so the fetcher,
+loss tracker, price oracle and portfolio modules share a single fetch per TTL
+window. Entries live in an in-memory LRU and, when ``MARKET_CACHE_PATH`` is
+set, are written through to SQLite so they also survive restarts.
+
+Once an entry passes its TTL it is still served for ``STALE_SECONDS`` while a
+background thread revalidates it (stale-while-revalidate). Expired entries are
+kept as the last known good value and served when a refetch fails.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+import http_client
+
+load_dotenv()
+
+# ------------------------------------------------------------
+#  Configuration
+# ------------------------------------------------------------
+MARKET_CACHE_CONFIG = {
+    "PATH": os.getenv("MARKET_CACHE_PATH", ""),  # empty = in-process only
+    "MAX_ENTRIES": int(os.getenv("MARKET_CACHE_MAX_ENTRIES", "512")),
+    "STALE_SECONDS": float(os.getenv("MARKET_CACHE_STALE_SECONDS", "120")),
+}
+
+# Freshness window per endpoint, in seconds
+ENDPOINT_TTLS = {
+    "simple/price": 30,
+    "coins/markets": 60,
+    "coins/detail": 300,
+    "market_chart": 3600,
+    "coins/list": 24 * 3600,
+}
+DEFAULT_TTL = 60
+
+# Lookup states
+FRESH, STALE, MISS = "fresh", "stale", "miss"
+
+# Never part of a cache key
+_UNKEYED_PARAMS = {"x_cg_demo_api_key", "x_cg_pro_api_key"}
+
+def cache_key(url: str, params: Optional[Dict] = None) -> str:
+    """Stable key for a GET, ignoring API credentials."""
+    params = {k: v for k, v in (params or {}).items() if k not in _UNKEYED_PARAMS}
+    return f"{url}?{json.dumps(params, sort_keys=True, default=str)}"
+
+# ------------------------------------------------------------
+#  Cache
+# ------------------------------------------------------------
+class MarketCache:
+    """LRU market-data cache with per-endpoint TTLs and optional SQLite backing."""
+
+    def __init__(self, path: str = "", max_entries: int = 512, stale_seconds: float = 120,
+                 ttls: Optional[Dict[str, float]] = None):
+        self.max_entries = max_entries
+        self.stale_seconds = stale_seconds
+        self.ttls = dict(ENDPOINT_TTLS if ttls is None else ttls)
+
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._inflight: Dict[str, threading.Event] = {}
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS market_cache ("
+                " key TEXT PRIMARY KEY, stored_at REAL, accessed_at REAL, value TEXT)"
+            )
+            self._db.commit()
+
+    def ttl(self, endpoint: str) -> float:
+        return self.ttls.get(endpoint, DEFAULT_TTL)
+
+    def lookup(self, endpoint: str, key: str) -> Tuple[Any, str]:
+        """Return ``(value, state)`` where state is FRESH, STALE or MISS."""
+        entry = self._load(key)
+        if entry is None:
+            return None, MISS
+        stored_at, value = entry
+        age = time.time() - stored_at
+        ttl = self.ttl(endpoint)
+        if age < ttl:
+            return value, FRESH
+        if age < ttl + self.stale_seconds:
+            return value, STALE
+        return value, MISS
+
+    def store(self, key: str, value: Any, stored_at: Optional[float] = None):
+        """Insert or replace an entry, evicting the least recently used."""
+        stored_at = time.time() if stored_at is None else stored_at
+        with self._lock:
+            self._entries[key] = (stored_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO market_cache VALUES (?, ?, ?, ?)",
+                    (key, stored_at, time.time(), json.dumps(value)),
+                )
+                self._db.execute(
+                    "DELETE FROM market_cache WHERE key NOT IN ("
+                    " SELECT key FROM market_cache ORDER BY accessed_at DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+                self._db.commit()
+
+    def get_or_fetch(self, endpoint: str, key: str, fetch: Callable[[], Any]) -> Any:
+        """Serve from cache, revalidating stale entries in the background.
+
+        Concurrent misses for the same key wait on a single fetch. If the
+        fetch fails, an expired entry is served as the last known good value.
+        Returned values are shared between callers and must not be mutated.
+        """
+        value, state = self.lookup(endpoint, key)
+        if state == FRESH:
+            return value
+        if state == STALE:
+            self.revalidate(key, fetch)
+            return value
+
+        with self._lock:
+            pending = self._inflight.get(key)
+            if pending is None:
+                self._inflight[key] = threading.Event()
+        if pending is not None:
+            pending.wait()
+            value, state = self.lookup(endpoint, key)
+            if value is not None:
+                return value
+            return self.get_or_fetch(endpoint, key, fetch)
+
+        try:
+            fetched = fetch()
+            self.store(key, fetched)
+            return fetched
+        except Exception as e:
+            if value is None:
+                raise
+            print(f"⚠️  Serving last known good data for {key}: {e}")
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    def revalidate(self, key: str, fetch: Callable[[], Any]):
+        """Refresh an entry on a background thread unless one is already running."""
+        with self._lock:
+            if key in self._inflight:
+                return
+            self._inflight[key] = threading.Event()
+
+        def refresh():
+            try:
+                self.store(key, fetch())
+            except Exception as e:
+                print(f"⚠️  Background refresh failed for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._inflight.pop(key).set()
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM market_cache")
+                self._db.commit()
+
+    def _load(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+            if self._db is None:
+                return None
+
+            row = self._db.execute(
+                "SELECT stored_at, value FROM market_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE market_cache SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+            self._db.commit()
+
+            entry = (row[0], json.loads(row[1]))
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry
+
+MARKET_CACHE = MarketCache(
+    path=MARKET_CACHE_CONFIG["PATH"],
+    max_entries=MARKET_CACHE_CONFIG["MAX_ENTRIES"],
+    stale_seconds=MARKET_CACHE_CONFIG["STALE_SECONDS"],
+)
+
+# ------------------------------------------------------------
+#  Cached GET
+# ------------------------------------------------------------
+def fetch_json(url: str, params: Optional[Dict] = None) -> Any:
+    """Uncached GET returning the decoded JSON body."""
+    response = http_client.get(url, params=params)
+    response.raise_for_status()
+    return response.json()
+
+def get_json(endpoint: str, url: str, params: Optional[Dict] = None) -> Any:
+    """GET through the shared cache; ``endpoint`` selects the TTL.
+
+    HTTP errors on a miss propagate as ``requests`` exceptions.
+    """
+    return MARKET_CACHE.get_or_fetch(endpoint, cache_key(url, params),
+                                     lambda: fetch_json(url, params))
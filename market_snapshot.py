@@ -0,0 +1,57 @@
+"""
+Cycle-scoped market snapshot.
+
+A trading cycle captures the market once at the start and hands the same
+``MarketSnapshot`` to discovery, loss analysis, risk assessment and
+rebalancing, so every stage works from one consistent set of prices and a
+cycle costs a fixed number of API calls.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from advanced_portfolio_manager import (
+    load_targets, fetch_holdings, get_market_metrics, prices_from_metrics
+)
+
+class MarketSnapshot:
+    """Market and account state captured once per trading cycle."""
+
+    def __init__(self, targets: Dict[str, float], prices: Dict[str, float],
+                 metrics: Dict[str, Dict], holdings: Optional[Dict[str, float]],
+                 market_coins: List[Dict], tracked_coins: List[Dict],
+                 captured_at: Optional[datetime] = None, holdings_error: str = ""):
+        self.targets = targets
+        self.prices = prices
+        self.metrics = metrics
+        self.holdings = holdings
+        self.market_coins = market_coins      # raw /coins/markets scan rows
+        self.tracked_coins = tracked_coins    # loss-tracker records for tracked ids
+        self.captured_at = captured_at or datetime.now()
+        self.holdings_error = holdings_error
+
+    @classmethod
+    def capture(cls, fetcher, loss_tracker, scan_limit: int = 50) -> "MarketSnapshot":
+        """Fetch everything a cycle needs in one pass."""
+        targets = load_targets()
+        symbols = list(targets.keys())
+
+        metrics = get_market_metrics(symbols)
+        prices = prices_from_metrics(metrics, symbols)
+        market_coins = fetcher.get_market_coins(limit=scan_limit)
+        tracked_coins = loss_tracker.track_specific_coins()
+
+        holdings, holdings_error = None, ""
+        try:
+            holdings = fetch_holdings()
+        except Exception as e:
+            holdings_error = str(e)
+
+        return cls(targets, prices, metrics, holdings, market_coins, tracked_coins,
+                   holdings_error=holdings_error)
+
+    @property
+    def total_value(self) -> float:
+        if not self.holdings:
+            return 0.0
+        return sum(self.holdings.get(s, 0) * self.prices.get(s, 0) for s in self.targets)
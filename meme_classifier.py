@@ -0,0 +1,55 @@
+"""
+Shared meme-coin classifier.
+
+The keyword set is compiled once into a single alternation regex, so each
+coin costs one scan of its name and symbol instead of one substring test per
+keyword. Results are cached by CoinGecko id, and ``classify_frame`` runs the
+same pattern vectorized over a pandas frame for large scans.
+"""
+
+import re
+from typing import Dict, Iterable
+
+import pandas as pd
+
+# Single source of truth for what counts as a meme coin
+MEME_KEYWORDS = [
+    'moon', 'doge', 'shib', 'inu', 'cat', 'dog', 'pepe', 'wojak',
+    'meme', 'floki', 'elon', 'wif', 'bonk', 'book', 'pop', 'myro',
+]
+
+class MemeClassifier:
+    """Keyword classifier compiled once and memoized by coin id."""
+
+    def __init__(self, keywords: Iterable[str] = MEME_KEYWORDS, cache_size: int = 100_000):
+        self.keywords = sorted({k.lower() for k in keywords}, key=len, reverse=True)
+        self.pattern = re.compile("|".join(map(re.escape, self.keywords)))
+        self.cache_size = cache_size
+        self._cache: Dict[str, bool] = {}
+
+    def matches(self, name: str, symbol: str) -> bool:
+        """Whether a name or symbol contains any meme keyword."""
+        # Keywords never contain a newline, so no match spans both fields
+        return self.pattern.search(f"{name}\n{symbol}".lower()) is not None
+
+    def is_meme(self, coin: Dict) -> bool:
+        """Classify a /coins/markets row, cached by its id."""
+        coin_id = coin['id']
+        result = self._cache.get(coin_id)
+        if result is None:
+            result = self.matches(coin['name'], coin['symbol'])
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[coin_id] = result
+        return result
+
+    def classify_series(self, values: pd.Series) -> pd.Series:
+        """Vectorized match over a string column."""
+        return values.fillna("").str.lower().str.contains(self.pattern, regex=True)
+
+    def classify_frame(self, df: pd.DataFrame, name_col: str = 'name',
+                       symbol_col: str = 'symbol') -> pd.Series:
+        """Boolean mask of meme rows in a frame of coins."""
+        return self.classify_series(df[name_col]) | self.classify_series(df[symbol_col])
+
+MEME_CLASSIFIER = MemeClassifier()
@@ -0,0 +1,287 @@
+"""
+Local stand-in for the Recall sandbox API.
+
+Implements ``GET /api/balance`` and ``POST /api/trade/execute`` against an
+in-memory wallet, with configurable latency, server errors, 429s and partial
+fills, so the execution path (executor, retries, breakers, rate limiter,
+order queue) can be load-tested and benchmarked on one machine. Point the
+agent at it with ``RECALL_API_URL=http://127.0.0.1:8765``.
+
+Tokens are resolved by address, or by the ``fromSymbol``/``toSymbol`` the
+portfolio modules add when an address is a shared placeholder ("0x...").
+
+Fault injection draws from a seeded RNG, so a run is reproducible for a given
+request order. Trades honour ``Idempotency-Key``: a repeated key gets the
+original response without executing again.
+
+Test-only endpoints:
+
+    GET  /mock/stats   request counts by outcome
+    POST /mock/state   {"balances": {...}, "prices": {...}} to reset the wallet
+
+    python mock_recall_server.py
+"""
+
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from advanced_portfolio_manager import ASSETS
+
+load_dotenv()
+
+# ------------------------------------------------------------
+#  Configuration
+# ------------------------------------------------------------
+MOCK_RECALL_CONFIG = {
+    "HOST": os.getenv("MOCK_RECALL_HOST", "127.0.0.1"),
+    "PORT": int(os.getenv("MOCK_RECALL_PORT", "8765")),
+    "LATENCY_MS": float(os.getenv("MOCK_RECALL_LATENCY_MS", "50")),
+    "LATENCY_JITTER_MS": float(os.getenv("MOCK_RECALL_LATENCY_JITTER_MS", "20")),
+    "ERROR_RATE": float(os.getenv("MOCK_RECALL_ERROR_RATE", "0")),          # share of 500s
+    "RATE_LIMIT_RATE": float(os.getenv("MOCK_RECALL_RATE_LIMIT_RATE", "0")),  # share of 429s
+    "RETRY_AFTER": float(os.getenv("MOCK_RECALL_RETRY_AFTER", "1")),        # seconds
+    "PARTIAL_FILL_RATE": float(os.getenv("MOCK_RECALL_PARTIAL_FILL_RATE", "0")),
+    "PARTIAL_FILL_MIN": float(os.getenv("MOCK_RECALL_PARTIAL_FILL_MIN", "0.5")),  # smallest fill fraction
+    "SEED": int(os.getenv("MOCK_RECALL_SEED", "42")),
+}
+
+QUOTE_SYMBOL = "USDC"
+DEFAULT_BALANCES = {QUOTE_SYMBOL: 10000.0}
+DEFAULT_PRICE = 1.0  # USD, for tokens without a configured price
+
+# ------------------------------------------------------------
+#  Exchange state
+# ------------------------------------------------------------
+class MockExchange:
+    """In-memory wallet, fault injection and idempotency cache."""
+
+    def __init__(self, config: Dict = MOCK_RECALL_CONFIG,
+                 balances: Optional[Dict[str, float]] = None,
+                 prices: Optional[Dict[str, float]] = None):
+        self.config = dict(config)
+        self.balances = dict(balances or DEFAULT_BALANCES)
+        self.prices = dict(prices or {})
+        self.rng = random.Random(self.config["SEED"])
+        self.stats: Dict[str, int] = {}
+        self.responses: Dict[str, Tuple[int, Dict]] = {}  # idempotency key -> response
+        self._lock = threading.Lock()
+
+    def count(self, outcome: str):
+        with self._lock:
+            self.stats[outcome] = self.stats.get(outcome, 0) + 1
+
+    def reset(self, balances: Optional[Dict[str, float]] = None,
+              prices: Optional[Dict[str, float]] = None):
+        with self._lock:
+            if balances is not None:
+                self.balances = dict(balances)
+            if prices is not None:
+                self.prices = dict(prices)
+            self.responses.clear()
+            self.stats.clear()
+            self.rng = random.Random(self.config["SEED"])
+
+    def latency(self) -> float:
+        """Seconds to hold the next response."""
+        with self._lock:
+            jitter = self.rng.uniform(-1, 1) * self.config["LATENCY_JITTER_MS"]
+        return max(0.0, self.config["LATENCY_MS"] + jitter) / 1000
+
+    def fault(self) -> Optional[str]:
+        """"rate_limited", "error" or None for the next request."""
+        with self._lock:
+            roll = self.rng.random()
+        if roll < self.config["RATE_LIMIT_RATE"]:
+            return "rate_limited"
+        if roll < self.config["RATE_LIMIT_RATE"] + self.config["ERROR_RATE"]:
+            return "error"
+        return None
+
+    def balance_snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.balances)
+
+    def price(self, symbol: str) -> float:
+        return self.prices.get(symbol, DEFAULT_PRICE)
+
+    def execute(self, payload: Dict, idempotency_key: Optional[str]) -> Tuple[int, Dict]:
+        """Apply one trade; replays the stored response for a known key."""
+        with self._lock:
+            if idempotency_key and idempotency_key in self.responses:
+                return self.responses[idempotency_key]
+            response = self._execute(payload)
+            if idempotency_key:
+                self.responses[idempotency_key] = response
+            return response
+
+    def _execute(self, payload: Dict) -> Tuple[int, Dict]:
+        # Placeholder addresses are shared; the client names those tokens
+        from_symbol = ASSETS.resolve(payload.get("fromToken", ""), payload.get("fromSymbol"))
+        to_symbol = ASSETS.resolve(payload.get("toToken", ""), payload.get("toSymbol"))
+        if from_symbol is None or to_symbol is None:
+            return 400, {"success": False, "error": "Unknown or ambiguous token address"}
+        # The portfolio modules size both sides in the traded token's base units
+        buying = from_symbol == QUOTE_SYMBOL and to_symbol != QUOTE_SYMBOL
+        token = to_symbol if buying else from_symbol
+        try:
+            amount = int(payload["amount"]) / 10 ** ASSETS.decimals_for(token)
+        except (KeyError, TypeError, ValueError):
+            return 400, {"success": False, "error": "Invalid amount"}
+        if amount <= 0:
+            return 400, {"success": False, "error": "Amount must be positive"}
+
+        fraction = 1.0
+        if self.rng.random() < self.config["PARTIAL_FILL_RATE"]:
+            fraction = self.rng.uniform(self.config["PARTIAL_FILL_MIN"], 1.0)
+        rate = self.price(from_symbol) / self.price(to_symbol)
+        if buying:
+            to_amount = amount * fraction
+            from_amount = to_amount / rate
+        else:
+            from_amount = amount * fraction
+            to_amount = from_amount * rate
+        if from_amount > self.balances.get(from_symbol, 0) + 1e-12:
+            return 400, {"success": False, "error": f"Insufficient {from_symbol} balance"}
+        self.balances[from_symbol] -= from_amount
+        self.balances[to_symbol] = self.balances.get(to_symbol, 0) + to_amount
+
+        return 200, {
+            "success": True,
+            "status": "filled" if fraction == 1.0 else "partially_filled",
+            "transaction": {
+                "id": uuid.uuid4().hex,
+                "timestamp": datetime.now().isoformat(),
+                "fromToken": payload["fromToken"],
+                "toToken": payload["toToken"],
+                "fromAmount": from_amount,
+                "toAmount": to_amount,
+                "price": to_amount / from_amount,
+                "reason": payload.get("reason", ""),
+            },
+        }
+
+# ------------------------------------------------------------
+#  HTTP server
+# ------------------------------------------------------------
+class MockRecallHandler(BaseHTTPRequestHandler):
+    """Routes requests to the server's ``MockExchange``."""
+
+    @property
+    def exchange(self) -> MockExchange:
+        return self.server.exchange
+
+    def log_message(self, format, *args):
+        pass  # one line per request would swamp a load test
+
+    def send_json(self, status: int, body: Dict, headers: Optional[Dict] = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_json(self) -> Optional[Dict]:
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError):
+            return None
+
+    def api_request(self) -> bool:
+        """Latency, auth and injected faults shared by the /api routes.
+
+        Returns False when a response has already been sent.
+        """
+        time.sleep(self.exchange.latency())
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            self.exchange.count("unauthorized")
+            self.send_json(401, {"success": False, "error": "Missing bearer token"})
+            return False
+        fault = self.exchange.fault()
+        if fault == "rate_limited":
+            self.exchange.count("rate_limited")
+            self.send_json(429, {"success": False, "error": "Too many requests"},
+                           {"Retry-After": f"{self.exchange.config['RETRY_AFTER']:g}"})
+            return False
+        if fault == "error":
+            self.exchange.count("error")
+            self.send_json(500, {"success": False, "error": "Injected server error"})
+            return False
+        return True
+
+    def do_GET(self):
+        if self.path == "/api/balance":
+            if self.api_request():
+                self.exchange.count("balance")
+                self.send_json(200, self.exchange.balance_snapshot())
+        elif self.path == "/mock/stats":
+            self.send_json(200, dict(self.exchange.stats))
+        else:
+            self.send_json(404, {"success": False, "error": "Not found"})
+
+    def do_POST(self):
+        if self.path == "/api/trade/execute":
+            if not self.api_request():
+                return
+            payload = self.read_json()
+            if payload is None:
+                self.exchange.count("rejected")
+                self.send_json(400, {"success": False, "error": "Invalid JSON"})
+                return
+            status, body = self.exchange.execute(payload, self.headers.get("Idempotency-Key"))
+            self.exchange.count(body.get("status", "rejected"))
+            self.send_json(status, body)
+        elif self.path == "/mock/state":
+            state = self.read_json() or {}
+            self.exchange.reset(state.get("balances"), state.get("prices"))
+            self.send_json(200, {"success": True})
+        else:
+            self.send_json(404, {"success": False, "error": "Not found"})
+
+def create_server(exchange: Optional[MockExchange] = None, host: str = MOCK_RECALL_CONFIG["HOST"],
+                  port: int = MOCK_RECALL_CONFIG["PORT"]) -> ThreadingHTTPServer:
+    """Bind the mock API; ``port=0`` picks a free port."""
+    server = ThreadingHTTPServer((host, port), MockRecallHandler)
+    server.daemon_threads = True
+    server.exchange = exchange or MockExchange()
+    return server
+
+def start_mock_server(exchange: Optional[MockExchange] = None, host: str = MOCK_RECALL_CONFIG["HOST"],
+                      port: int = MOCK_RECALL_CONFIG["PORT"]) -> ThreadingHTTPServer:
+    """Serve on a daemon thread, e.g. from a benchmark script.
+
+    Call ``shutdown()`` on the returned server to stop it.
+    """
+    server = create_server(exchange, host, port)
+    threading.Thread(target=server.serve_forever, name="mock-recall", daemon=True).start()
+    return server
+
+def main():
+    server = create_server()
+    host, port = server.server_address[:2]
+    print(f"🧰 Mock Recall API on http://{host}:{port} "
+          f"(latency {MOCK_RECALL_CONFIG['LATENCY_MS']:.0f}ms, "
+          f"errors {MOCK_RECALL_CONFIG['ERROR_RATE']:.0%}, 429s {MOCK_RECALL_CONFIG['RATE_LIMIT_RATE']:.0%}, "
+          f"partial fills {MOCK_RECALL_CONFIG['PARTIAL_FILL_RATE']:.0%})")
+    print("Press Ctrl-C to quit")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Mock Recall API stopped.")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Durable pending-order queue.
+
+Every order gets a client order id and a row in a SQLite (WAL) table before
+it is sent, and the id goes out as the ``Idempotency-Key`` header so a
+resubmitted order cannot fill twice. Orders move through
+
+    pending -> submitted -> filled | failed | unknown
+
+where ``unknown`` means the request may have reached Recall but we never saw
+the answer (e.g. a read timeout). Unresolved orders block new orders for the
+same symbol until ``reconcile`` settles them against fresh balances, which is
+also how orders left in flight by a crash are resolved after a restart.
+Pending orders are only given up on once they are ``PENDING_TIMEOUT`` old, so
+reconciling never fails orders another caller has queued but not sent yet.
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+import requests
+from dotenv import load_dotenv
+
+from resilience import CircuitOpenError
+
+load_dotenv()
+
+# ------------------------------------------------------------
+#  Configuration
+# ------------------------------------------------------------
+ORDER_QUEUE_CONFIG = {
+    "PATH": os.getenv("ORDER_QUEUE_PATH", "order_queue.db"),
+    # Balance move, as a fraction of the order size, that counts as a fill
+    "FILL_TOLERANCE": float(os.getenv("ORDER_QUEUE_FILL_TOLERANCE", "0.5")),
+    # Balance move below which an unresolved order is taken as never executed
+    "NOOP_TOLERANCE": float(os.getenv("ORDER_QUEUE_NOOP_TOLERANCE", "0.01")),
+    # Age after which a never-submitted order is taken as abandoned
+    "PENDING_TIMEOUT": float(os.getenv("ORDER_QUEUE_PENDING_TIMEOUT", "900")),  # seconds
+}
+
+# Order states
+PENDING, SUBMITTED, FILLED, FAILED, UNKNOWN = "pending", "submitted", "filled", "failed", "unknown"
+UNRESOLVED = (PENDING, SUBMITTED, UNKNOWN)
+
+class OrderBlockedError(Exception):
+    """Raised when a symbol still has an unresolved order."""
+
+def new_client_order_id() -> str:
+    return uuid.uuid4().hex
+
+def definitely_rejected(error: Exception) -> bool:
+    """Whether a failed submission provably never executed."""
+    if isinstance(error, (ValueError, CircuitOpenError, requests.exceptions.ConnectTimeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code < 500
+    return False
+
+# ------------------------------------------------------------
+#  Queue
+# ------------------------------------------------------------
+class OrderQueue:
+    """SQLite-backed order queue keyed by client order id."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        # Serializes reconcile-and-enqueue across threads (cycle vs. stop-loss watcher)
+        self._enqueue_lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS orders ("
+            " client_order_id TEXT PRIMARY KEY, symbol TEXT, side TEXT, amount REAL,"
+            " reason TEXT, state TEXT, holding_before REAL, created_at REAL,"
+            " updated_at REAL, result TEXT, error TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS orders_state ON orders (state)")
+        self._db.commit()
+
+    def enqueue_orders(self, orders: List[Dict], holdings: Dict[str, float],
+                       reconcile: bool = True) -> List[Dict]:
+        """Reconcile, then persist orders as pending with fresh client ids.
+
+        Orders for symbols that still have an unresolved order are dropped.
+        Pass ``reconcile=False`` for orders placed mid-cycle (stop-losses),
+        which should not settle the cycle's own orders. Returns the accepted
+        orders with ``client_order_id`` set.
+        """
+        with self._enqueue_lock:
+            if reconcile:
+                self.reconcile(holdings)
+            blocked = self.blocked_symbols()
+            accepted = []
+            for order in orders:
+                if order['symbol'] in blocked:
+                    print(f"⏸️  Skipping {order['side']} {order['symbol']}: an earlier order is still unresolved")
+                    continue
+                accepted.append(self.enqueue(order, holdings.get(order['symbol'], 0)))
+            return accepted
+
+    def enqueue(self, order: Dict, holding_before: Optional[float]) -> Dict:
+        """Persist one order as pending and return it with its client id."""
+        order = dict(order, client_order_id=order.get('client_order_id') or new_client_order_id())
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, NULL, NULL)",
+                (order['client_order_id'], order['symbol'], order['side'], order['amount'],
+                 order.get('reason', ''), PENDING, holding_before, now, now),
+            )
+            self._db.commit()
+        return order
+
+    def submit(self, order: Dict, send: Callable[[Dict], Dict]) -> Dict:
+        """Send a queued order once, recording the outcome durably.
+
+        ``send`` receives the order (with ``client_order_id``) and returns
+        the API result. The order is marked submitted before the request
+        goes out, so a crash mid-request leaves it for ``reconcile``.
+        """
+        if self.state(order.get('client_order_id', '')) is None:
+            if order['symbol'] in self.blocked_symbols():
+                raise OrderBlockedError(f"{order['symbol']} has an unresolved order")
+            order = self.enqueue(order, None)
+        client_order_id = order['client_order_id']
+        # Buys may have been resized by the executor since they were queued
+        if not self._claim(client_order_id, order['amount']):
+            raise OrderBlockedError(f"Order {client_order_id} was already submitted")
+        try:
+            result = send(order)
+        except Exception as e:
+            self._update(client_order_id, FAILED if definitely_rejected(e) else UNKNOWN, error=str(e))
+            raise
+
+        state = FAILED if result.get('success') is False else FILLED
+        self._update(client_order_id, state, result=result)
+        return result
+
+    def state(self, client_order_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT state FROM orders WHERE client_order_id = ?", (client_order_id,)
+            ).fetchone()
+        return row['state'] if row else None
+
+    def unresolved(self) -> List[Dict]:
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT * FROM orders WHERE state IN ({','.join('?' * len(UNRESOLVED))})",
+                UNRESOLVED,
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def blocked_symbols(self) -> set:
+        return {order['symbol'] for order in self.unresolved()}
+
+    def reconcile(self, holdings: Dict[str, float]) -> List[Dict]:
+        """Settle unresolved orders from the balance change since they were queued.
+
+        Orders still pending never reached the network; they are failed once
+        older than ``PENDING_TIMEOUT`` and otherwise left alone, since they
+        may belong to a cycle that is still executing. For submitted/unknown
+        orders a move of at least ``FILL_TOLERANCE`` of the
+        order size in the right direction is a fill, a negligible move is a
+        non-execution, and anything else stays unknown (and keeps the symbol
+        blocked) for manual review. Returns the orders it resolved.
+        """
+        resolved = []
+        with self._enqueue_lock:
+            now = time.time()
+            for order in self.unresolved():
+                state = self._settle(order, holdings, now)
+                if state is None:
+                    continue
+                self._update(order['client_order_id'], state, error="resolved by reconciliation")
+                print(f"🔎 Reconciled {order['side']} {order['amount']:.6f} {order['symbol']} "
+                      f"({order['client_order_id'][:8]}) → {state}")
+                resolved.append(dict(order, state=state))
+        return resolved
+
+    def _settle(self, order: Dict, holdings: Dict[str, float], now: float) -> Optional[str]:
+        """Final state for an unresolved order, or None to leave it."""
+        if order['state'] == PENDING:
+            if now - order['created_at'] >= ORDER_QUEUE_CONFIG["PENDING_TIMEOUT"]:
+                return FAILED
+            return None
+        if order['holding_before'] is None:
+            return None
+        delta = holdings.get(order['symbol'], 0) - order['holding_before']
+        moved = -delta if order['side'] == 'sell' else delta
+        if moved >= order['amount'] * ORDER_QUEUE_CONFIG["FILL_TOLERANCE"]:
+            return FILLED
+        if abs(delta) <= order['amount'] * ORDER_QUEUE_CONFIG["NOOP_TOLERANCE"]:
+            return FAILED
+        return None
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _claim(self, client_order_id: str, amount: float) -> bool:
+        """Move a pending order to submitted; False if it was not pending.
+
+        One conditional update, so concurrent submits of the same order can't
+        both see it pending.
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE orders SET state = ?, amount = ?, updated_at = ?"
+                " WHERE client_order_id = ? AND state = ?",
+                (SUBMITTED, amount, time.time(), client_order_id, PENDING),
+            )
+            self._db.commit()
+        return cursor.rowcount > 0
+
+    def _update(self, client_order_id: str, state: str, amount: Optional[float] = None,
+                result: Optional[Dict] = None, error: Optional[str] = None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE orders SET state = ?, amount = COALESCE(?, amount), updated_at = ?,"
+                " result = COALESCE(?, result), error = COALESCE(?, error)"
+                " WHERE client_order_id = ?",
+                (state, amount, time.time(),
+                 json.dumps(result, default=str) if result is not None else None,
+                 error, client_order_id),
+            )
+            self._db.commit()
+
+_queues: Dict[str, OrderQueue] = {}
+_queues_lock = threading.Lock()
+
+def open_order_queue(path: str = ORDER_QUEUE_CONFIG["PATH"]) -> OrderQueue:
+    """Process-wide order queue for a path, closed cleanly at exit."""
+    with _queues_lock:
+        queue = _queues.get(path)
+        if queue is None:
+            queue = OrderQueue(path)
+            _queues[path] = queue
+            atexit.register(queue.close)
+        return queue
@@ -0,0 +1,256 @@
+"""
+Parallel parameter sweep over the backtester.
+
+Draws configurations from a grid or at random over ``DRIFT_THRESHOLDS``,
+``ASSET_DRIFT_THRESHOLDS``, ``SLIPPAGE_CONFIG`` and ``STOP_LOSS_CONFIG``, runs
+one backtest per configuration across a process pool and ranks the results by
+return, drawdown and turnover. Configurations whose equity hits zero are left
+out of the ranking: once wiped out, their drawdown and turnover say nothing.
+
+The market history is loaded once and its arrays are placed in shared memory;
+workers map them instead of each receiving a pickled copy. Parameters are
+dotted ``"<CONFIG>.<KEY>"`` names patched into the live config dicts for the
+duration of one backtest (see ``patched_params``). Changing a
+``DRIFT_THRESHOLDS`` profile also moves every asset on that profile in
+``ASSET_DRIFT_THRESHOLDS``; ``ASSET_DRIFT_THRESHOLDS.<SYMBOL>`` overrides one
+asset.
+
+    python param_sweep.py [grid|random] [configs] [days]
+"""
+
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+import advanced_portfolio_manager as apm
+from backtester import MarketHistory, load_market_history, run_backtest
+
+load_dotenv()
+
+# ------------------------------------------------------------
+#  Configuration
+# ------------------------------------------------------------
+SWEEP_CONFIG = {
+    "WORKERS": int(os.getenv("SWEEP_WORKERS", "0")) or os.cpu_count() or 1,
+    "RESULTS_FILE": os.getenv("SWEEP_RESULTS_FILE", "sweep_results.json"),
+    "SEED": int(os.getenv("SWEEP_SEED", "42")),
+}
+
+# Default search space; every key is "<CONFIG>.<KEY>"
+SWEEP_SPACE = {
+    "DRIFT_THRESHOLDS.CONSERVATIVE": [0.01, 0.02, 0.03],
+    "DRIFT_THRESHOLDS.MODERATE": [0.03, 0.05, 0.08],
+    "DRIFT_THRESHOLDS.AGGRESSIVE": [0.05, 0.10, 0.15, 0.20],
+    "SLIPPAGE_CONFIG.MEME_COINS": [0.05, 0.10, 0.15],
+    "SLIPPAGE_CONFIG.HIGH_VOLATILITY": [0.10, 0.15],
+    "STOP_LOSS_CONFIG.DEFAULT_THRESHOLD": [0.10, 0.15, 0.20, 0.30],
+    "STOP_LOSS_CONFIG.TRAILING_STOP": [True, False],
+    "STOP_LOSS_CONFIG.TRAILING_PERCENTAGE": [0.05, 0.10, 0.15],
+    "STOP_LOSS_CONFIG.COOLDOWN_HOURS": [12, 24, 48],
+}
+
+# Lower is better for these; higher for everything else
+RANK_METRICS = {"total_return": False, "max_drawdown": True, "turnover": True}
+
+# The config dicts a sweep may patch
+CONFIGS = {
+    "DRIFT_THRESHOLDS": apm.DRIFT_THRESHOLDS,
+    "ASSET_DRIFT_THRESHOLDS": apm.ASSET_DRIFT_THRESHOLDS,
+    "SLIPPAGE_CONFIG": apm.SLIPPAGE_CONFIG,
+    "STOP_LOSS_CONFIG": apm.STOP_LOSS_CONFIG,
+}
+
+# Which drift profile each asset threshold was taken from
+ASSET_DRIFT_PROFILES = {
+    sym: name
+    for sym, threshold in apm.ASSET_DRIFT_THRESHOLDS.items()
+    for name, value in apm.DRIFT_THRESHOLDS.items()
+    if value == threshold
+}
+
+# ------------------------------------------------------------
+#  Configurations
+# ------------------------------------------------------------
+def grid_configs(space: Dict[str, Sequence[Any]]) -> Iterator[Dict[str, Any]]:
+    """Every combination in ``space``."""
+    keys = list(space)
+    for values in itertools.product(*(space[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+def random_configs(space: Dict[str, Sequence[Any]], n: int,
+                   seed: int = SWEEP_CONFIG["SEED"]) -> List[Dict[str, Any]]:
+    """``n`` distinct random draws from ``space`` (fewer if the grid is smaller)."""
+    rng = random.Random(seed)
+    grid_size = int(np.prod([len(v) for v in space.values()]))
+    seen, configs = set(), []
+    while len(configs) < min(n, grid_size):
+        config = {k: rng.choice(list(v)) for k, v in space.items()}
+        key = tuple(config.values())
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+@contextmanager
+def patched_params(params: Dict[str, Any]):
+    """Apply dotted config overrides in place, restoring the originals on exit."""
+    saved = {name: dict(config) for name, config in CONFIGS.items()}
+    try:
+        for key, value in params.items():
+            name, field = key.split(".", 1)
+            CONFIGS[name][field] = value
+            if name == "DRIFT_THRESHOLDS":
+                for sym, profile in ASSET_DRIFT_PROFILES.items():
+                    if profile == field and f"ASSET_DRIFT_THRESHOLDS.{sym}" not in params:
+                        apm.ASSET_DRIFT_THRESHOLDS[sym] = value
+        yield
+    finally:
+        for name, config in CONFIGS.items():
+            config.clear()
+            config.update(saved[name])
+
+# ------------------------------------------------------------
+#  Shared-memory history
+# ------------------------------------------------------------
+HISTORY_ARRAYS = ("times", "price", "volume", "market_cap", "change_24h", "atl", "ath")
+
+def share_history(history: MarketHistory) -> Tuple[List[shared_memory.SharedMemory], Dict]:
+    """Copy the history arrays into shared memory once.
+
+    Returns the blocks (the caller unlinks them) and a picklable spec that
+    ``attach_history`` turns back into a ``MarketHistory``.
+    """
+    blocks, arrays = [], {}
+    for name in HISTORY_ARRAYS:
+        array = getattr(history, name)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        arrays[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, {"symbols": history.symbols, "arrays": arrays}
+
+def attach_history(spec: Dict) -> Tuple[MarketHistory, List[shared_memory.SharedMemory]]:
+    """Zero-copy ``MarketHistory`` over the blocks described by ``spec``."""
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in spec["arrays"].items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+    return MarketHistory(symbols=spec["symbols"], **arrays), blocks
+
+# Per-worker state set by ``_init_worker``
+_worker: Dict[str, Any] = {}
+
+def _init_worker(spec: Dict, targets: Dict[str, float], initial_cash: Optional[float]):
+    history, blocks = attach_history(spec)
+    _worker.update(history=history, blocks=blocks, targets=targets, initial_cash=initial_cash)
+
+def _run_config(params: Dict[str, Any]) -> Dict:
+    """One backtest in a worker; summary metrics only."""
+    kwargs = {"initial_cash": _worker["initial_cash"]} if _worker["initial_cash"] else {}
+    try:
+        with patched_params(params):
+            result = run_backtest(_worker["targets"], _worker["history"], **kwargs)
+    except Exception as e:
+        return {"params": params, "error": str(e)}
+    return {
+        "params": params,
+        "total_return": result["total_return"],
+        "max_drawdown": result["max_drawdown"],
+        "turnover": result["turnover"],
+        "trades": result["trades"],
+        "stop_losses": result["stop_losses"],
+        "wiped_out": bool(np.min(result["equity"], initial=np.inf) <= 0),
+    }
+
+# ------------------------------------------------------------
+#  Sweep
+# ------------------------------------------------------------
+def rank_results(results: List[Dict], weights: Optional[Dict[str, float]] = None) -> List[Dict]:
+    """Order results by the weighted mean of their per-metric ranks (0 = best).
+
+    Failed and wiped-out configurations are not ranked.
+    """
+    weights = weights or {metric: 1.0 for metric in RANK_METRICS}
+    ok = [r for r in results if "error" not in r and not r.get("wiped_out")]
+    if not ok:
+        return []
+    score = np.zeros(len(ok))
+    for metric, lower_is_better in RANK_METRICS.items():
+        values = np.array([r[metric] for r in ok])
+        order = np.argsort(values if lower_is_better else -values, kind="stable")
+        ranks = np.empty(len(ok))
+        ranks[order] = np.arange(len(ok))
+        score += weights.get(metric, 0) * ranks
+    score /= sum(weights.values())
+    for r, s in zip(ok, score):
+        r["score"] = float(s)
+    return sorted(ok, key=lambda r: r["score"])
+
+def run_sweep(configs: Sequence[Dict[str, Any]], history: MarketHistory, targets: Dict[str, float],
+              workers: int = SWEEP_CONFIG["WORKERS"], initial_cash: Optional[float] = None) -> List[Dict]:
+    """Backtest every configuration across a process pool; returns ranked results."""
+    blocks, spec = share_history(history)
+    results = []
+    started = time.time()
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(spec, targets, initial_cash)) as pool:
+            chunksize = max(1, len(configs) // (workers * 8))
+            step = max(1, len(configs) // 20)
+            for i, result in enumerate(pool.map(_run_config, configs, chunksize=chunksize), 1):
+                results.append(result)
+                if i % step == 0 or i == len(configs):
+                    print(f"⏳ {i}/{len(configs)} configs ({time.time() - started:.0f}s)")
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    failed = [r for r in results if "error" in r]
+    if failed:
+        print(f"⚠️  {len(failed)} configs failed, e.g. {failed[0]['error']}")
+    wiped_out = [r for r in results if r.get("wiped_out")]
+    if wiped_out:
+        print(f"💀 {len(wiped_out)} configs lost all their equity and are not ranked")
+    return rank_results(results)
+
+def print_ranking(ranked: List[Dict], top: int = 10):
+    print(f"\n{'='*80}")
+    print(f"TOP {min(top, len(ranked))} OF {len(ranked)} CONFIGS")
+    print(f"{'='*80}")
+    print(f"{'#':<4} {'Return':>9} {'Drawdown':>9} {'Turnover':>9} {'Trades':>7}  Params")
+    for i, r in enumerate(ranked[:top], 1):
+        params = ", ".join(f"{k.split('.', 1)[1]}={v}" for k, v in r["params"].items())
+        print(f"{i:<4} {r['total_return']:>8.2%} {r['max_drawdown']:>8.2%} {r['turnover']:>8.2f}x "
+              f"{r['trades']:>7}  {params}")
+
+def main():
+    mode = sys.argv[1] if len(sys.argv) > 1 else "random"
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    days = float(sys.argv[3]) if len(sys.argv) > 3 else 365
+
+    configs = list(grid_configs(SWEEP_SPACE)) if mode == "grid" else random_configs(SWEEP_SPACE, n)
+    targets = apm.load_targets()
+    history = load_market_history(list(targets), days)
+    print(f"🧪 Sweeping {len(configs)} configs over {len(history.times)} cycles "
+          f"on {SWEEP_CONFIG['WORKERS']} workers...")
+
+    ranked = run_sweep(configs, history, targets)
+    print_ranking(ranked)
+    with open(SWEEP_CONFIG["RESULTS_FILE"], "w") as f:
+        json.dump(ranked, f, indent=2)
+    print(f"💾 Results saved to {SWEEP_CONFIG['RESULTS_FILE']}")
+
+if __name__ == "__main__":
+    main()
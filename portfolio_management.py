@@ -1,7 +1,17 @@
-import os, json, time, math, requests, schedule
+import os, json, time, math, schedule
 from decimal import Decimal, ROUND_DOWN
 from dotenv import load_dotenv
 from datetime import datetime
+from typing import Optional
+
+import http_client
+import market_cache
+from asset_registry import AssetRegistry
+from execution_engine import ExecutionEngine
+from order_queue import open_order_queue
+from rebalance_engine import RebalanceEngine
+from trade_journal import open_journal
+from http_client import COINGECKO_API, HTTP_CONFIG
 
 load_dotenv()                                     # read .env
 
@@ -10,7 +20,8 @@ load_dotenv()                                     # read .env
 # ------------------------------------------------------------
 RECALL_KEY  = os.getenv("RECALL_API_KEY")
 COINGECKO_KEY = os.getenv("PRODUCTION_API_KEY") or os.getenv("SANDBOX_API_KEY")
-SANDBOX_API = "https://api.sandbox.competitions.recall.network"
+# Point at mock_recall_server.py with RECALL_API_URL=http://127.0.0.1:8765
+SANDBOX_API = os.getenv("RECALL_API_URL") or "https://api.sandbox.competitions.recall.network"
 
 # Solana meme coin addresses (you'll need to update these with actual addresses)
 TOKEN_MAP = {
@@ -38,9 +49,13 @@ COINGECKO_IDS = {
     "USDC": "usd-coin",
 }
 
+# Forward/reverse indexes over the tables above
+ASSETS = AssetRegistry(TOKEN_MAP, DECIMALS, COINGECKO_IDS)
+
 DRIFT_THRESHOLD = 0.05    # rebalance if > 5% off target (higher for volatile meme coins)
 REB_TIME        = "09:00" # local server time
 MAX_SLIPPAGE    = 0.10    # 10% max slippage for meme coins
+TRADE_JOURNAL_FILE = "trade_log.jsonl"  # append-only trade journal
 
 # ------------------------------------------------------------
 #  Helper utilities
@@ -84,59 +99,23 @@ def log_trade(symbol: str, side: str, amount: float, price: float, status: str):
         "status": status
     }
     
-    try:
-        with open("trade_log.json", "r") as f:
-            logs = json.load(f)
-    except FileNotFoundError:
-        logs = []
-    
-    logs.append(trade_log)
-    
-    with open("trade_log.json", "w") as f:
-        json.dump(logs, f, indent=2)
+    open_journal(TRADE_JOURNAL_FILE).append(trade_log)
 
 # ------------------------------------------------------------
 #  Market data
 # ------------------------------------------------------------
-def fetch_prices(symbols: list[str]) -> dict[str, float]:
-    """Fetch current prices from CoinGecko."""
-    ids = ",".join(COINGECKO_IDS[sym] for sym in symbols if sym in COINGECKO_IDS)
-    
-    params = {"ids": ids, "vs_currencies": "usd"}
-    if COINGECKO_KEY:
-        params['x_cg_demo_api_key'] = COINGECKO_KEY
-    
-    r = requests.get(
-        "https://api.coingecko.com/api/v3/simple/price",
-        params=params,
-        timeout=10,
-    )
-    r.raise_for_status()
-    data = r.json()
-    
-    prices = {}
-    for sym in symbols:
-        if sym in COINGECKO_IDS and COINGECKO_IDS[sym] in data:
-            prices[sym] = data[COINGECKO_IDS[sym]]["usd"]
-        else:
-            print(f"⚠️  Warning: No price data for {sym}")
-            prices[sym] = 0.0
-    
-    return prices
-
 def fetch_holdings() -> dict[str, float]:
     """Return whole‑token balances from Recall's sandbox."""
-    r = requests.get(
+    r = http_client.get(
         f"{SANDBOX_API}/api/balance",
         headers={"Authorization": f"Bearer {RECALL_KEY}"},
-        timeout=10,
     )
     r.raise_for_status()
     return r.json()
 
 def get_meme_coin_metrics(symbols: list[str]) -> dict[str, dict]:
-    """Get additional metrics for meme coins (volume, market cap, etc.)."""
-    ids = ",".join(COINGECKO_IDS[sym] for sym in symbols if sym in COINGECKO_IDS)
+    """Get price plus metrics for meme coins (volume, market cap, etc.)."""
+    ids = ",".join(ASSETS.ids_for(symbols))
     
     params = {
         "ids": ids,
@@ -150,19 +129,14 @@ def get_meme_coin_metrics(symbols: list[str]) -> dict[str, dict]:
     if COINGECKO_KEY:
         params['x_cg_demo_api_key'] = COINGECKO_KEY
     
-    r = requests.get(
-        "https://api.coingecko.com/api/v3/coins/markets",
-        params=params,
-        timeout=10,
-    )
-    r.raise_for_status()
-    data = r.json()
+    data = market_cache.get_json("coins/markets", f"{COINGECKO_API}/coins/markets", params)
     
     metrics = {}
     for coin in data:
-        symbol = next((sym for sym, cg_id in COINGECKO_IDS.items() if cg_id == coin['id']), None)
+        symbol = ASSETS.symbol_for_id(coin['id'])
         if symbol:
             metrics[symbol] = {
+                "price": coin['current_price'],
                 "market_cap": coin['market_cap'],
                 "volume_24h": coin['total_volume'],
                 "price_change_24h": coin['price_change_percentage_24h'],
@@ -171,69 +145,67 @@ def get_meme_coin_metrics(symbols: list[str]) -> dict[str, dict]:
     
     return metrics
 
+def prices_from_metrics(metrics: dict[str, dict], symbols: list[str]) -> dict[str, float]:
+    """Read prices off combined price+metrics records."""
+    prices = {}
+    for sym in symbols:
+        if sym in metrics and metrics[sym]["price"]:
+            prices[sym] = metrics[sym]["price"]
+        else:
+            print(f"⚠️  Warning: No price data for {sym}")
+            prices[sym] = 0.0
+    
+    return prices
+
+def fetch_prices(symbols: list[str]) -> dict[str, float]:
+    """Fetch current prices as a view over the /coins/markets metrics."""
+    return prices_from_metrics(get_meme_coin_metrics(symbols), symbols)
+
 # ------------------------------------------------------------
 #  Trading logic
 # ------------------------------------------------------------
 def compute_orders(targets, prices, holdings):
     """Return a list of {'symbol','side','amount'} trades."""
-    total_value = sum(holdings.get(s, 0) * prices[s] for s in targets)
-    if total_value == 0:
-        raise ValueError("No balances found; fund your sandbox wallet first.")
+    engine = RebalanceEngine(targets, DRIFT_THRESHOLD)
+    # Buys carry slippage protection for meme coins; sells come first so we
+    # have USDC to fund buys
+    return engine.orders(prices, holdings, MAX_SLIPPAGE, reasons=False)
 
-    overweight, underweight = [], []
-    for sym, weight in targets.items():
-        if sym not in prices or prices[sym] == 0:
-            continue
-            
-        current_val = holdings.get(sym, 0) * prices[sym]
-        target_val  = total_value * weight
-        drift_pct   = (current_val - target_val) / total_value
-        
-        if abs(drift_pct) >= DRIFT_THRESHOLD:
-            delta_val = abs(target_val - current_val)
-            token_amt = delta_val / prices[sym]
-            side      = "sell" if drift_pct > 0 else "buy"
-            
-            # Add slippage protection for meme coins
-            if side == "buy":
-                token_amt *= (1 + MAX_SLIPPAGE)  # Account for potential slippage
-            
-            (overweight if side == "sell" else underweight).append(
-                {"symbol": sym, "side": side, "amount": token_amt}
-            )
-
-    # Execute sells first so we have USDC to fund buys
-    return overweight + underweight
-
-def execute_trade(symbol, side, amount_float):
-    """Execute a trade through Recall API."""
+def execute_trade(symbol, side, amount_float, client_order_id=None):
+    """Execute a trade through Recall API, idempotent per client order id."""
     if symbol not in TOKEN_MAP:
         raise ValueError(f"Unknown token symbol: {symbol}")
     
-    from_token, to_token = (
-        (TOKEN_MAP[symbol], TOKEN_MAP["USDC"]) if side == "sell"
-        else (TOKEN_MAP["USDC"], TOKEN_MAP[symbol])
-    )
-
     payload = {
-        "fromToken": from_token,
-        "toToken":   to_token,
+        **ASSETS.trade_tokens(symbol, side),
         "amount":    to_base_units(amount_float, DECIMALS[symbol]),
         "reason":    f"Automatic meme coin portfolio rebalance - {side} {symbol}",
     }
+    headers = {
+        "Authorization": f"Bearer {RECALL_KEY}",
+        "Content-Type":  "application/json",
+    }
+    if client_order_id:
+        headers["Idempotency-Key"] = client_order_id
     
-    r = requests.post(
+    r = http_client.post(
         f"{SANDBOX_API}/api/trade/execute",
         json=payload,
-        headers={
-            "Authorization": f"Bearer {RECALL_KEY}",
-            "Content-Type":  "application/json",
-        },
-        timeout=20,
+        headers=headers,
+        timeout=HTTP_CONFIG["TRADE_TIMEOUT"],
     )
     r.raise_for_status()
     return r.json()
 
+def execute_order(order: dict) -> dict:
+    """Submit one queued {'symbol','side','amount'} order through the order queue."""
+    return open_order_queue().submit(order, lambda o: execute_trade(
+        o['symbol'], o['side'], o['amount'], o['client_order_id']
+    ))
+
+# Sells run concurrently, then buys sized to the USDC they released
+EXECUTION_ENGINE = ExecutionEngine(execute_order)
+
 def analyze_portfolio_performance(holdings, prices, targets):
     """Analyze current portfolio performance."""
     total_value = sum(holdings.get(s, 0) * prices[s] for s in targets)
@@ -263,9 +235,10 @@ def analyze_portfolio_performance(holdings, prices, targets):
 # ------------------------------------------------------------
 #  Risk management
 # ------------------------------------------------------------
-def check_volatility_alerts(symbols: list[str]):
+def check_volatility_alerts(symbols: list[str], metrics: Optional[dict[str, dict]] = None):
     """Check for high volatility in meme coins and issue alerts."""
-    metrics = get_meme_coin_metrics(symbols)
+    if metrics is None:
+        metrics = get_meme_coin_metrics(symbols)
     
     print(f"\n{'='*50}")
     print("VOLATILITY ALERTS")
@@ -317,15 +290,15 @@ def rebalance():
     
     try:
         targets = load_targets()
-        prices = fetch_prices(list(targets.keys()))
+        metrics = get_meme_coin_metrics(list(targets.keys()))
+        prices = prices_from_metrics(metrics, list(targets.keys()))
         holdings = fetch_holdings()
         
         # Analyze current portfolio
         analyze_portfolio_performance(holdings, prices, targets)
         
         # Check volatility and adjust targets
-        metrics = get_meme_coin_metrics(list(targets.keys()))
-        check_volatility_alerts(list(targets.keys()))
+        check_volatility_alerts(list(targets.keys()), metrics)
         
         # Adjust targets based on market conditions
         adjusted_targets = adjust_targets_for_volatility(targets, metrics)
@@ -336,20 +309,22 @@ def rebalance():
         
         # Compute and execute orders
         orders = compute_orders(targets, prices, holdings)
+        orders = open_order_queue().enqueue_orders(orders, holdings)
 
         if not orders:
             print("✅ Portfolio already within ±5% of target.")
             return
 
         print(f"\n📈 Executing {len(orders)} trades...")
-        for order in orders:
-            try:
-                res = execute_trade(**order)
-                price = prices.get(order['symbol'], 0)
-                log_trade(order['symbol'], order['side'], order['amount'], price, res.get('status', 'unknown'))
-                print(f"✅ Executed {order['side']} {order['amount']:.6f} {order['symbol']} → {res.get('status', 'unknown')}")
-            except Exception as e:
-                print(f"❌ Failed to execute {order}: {e}")
+        for trade in EXECUTION_ENGINE.execute_orders(orders, prices, holdings):
+            order = trade['order']
+            if trade['status'] != 'success':
+                print(f"❌ Failed to execute {order}: {trade['error']}")
+                continue
+            res = trade['result']
+            price = prices.get(order['symbol'], 0)
+            log_trade(order['symbol'], order['side'], order['amount'], price, res.get('status', 'unknown'))
+            print(f"✅ Executed {order['side']} {order['amount']:.6f} {order['symbol']} → {res.get('status', 'unknown')}")
 
         print("🎯 Meme coin portfolio rebalance complete.")
         
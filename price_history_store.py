@@ -0,0 +1,239 @@
+"""
+Local columnar price-history store.
+
+History from CoinGecko's ``/market_chart/range`` is kept as one ``.npy`` file
+per coin per UTC day, each a structured array of ``(t, price, market_cap,
+volume)`` rows sorted by timestamp:
+
+    price_history/<coin_id>/<YYYY-MM-DD>.npy
+
+Partitions are opened memory-mapped, so volatility, backtests and charts read
+history without copying (a single-day read is a view of the mapped file).
+``sync`` only requests what the store has not covered yet: the range after
+the last fetch and, when a longer window is asked for, the range before the
+first. CoinGecko picks the granularity from the span of each request (5-minute
+under a day, hourly up to 90 days, daily beyond), so a backfilled year is
+daily while incremental updates are finer.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+import requests
+from dotenv import load_dotenv
+
+import market_cache
+from http_client import COINGECKO_API
+
+load_dotenv()
+
+# ------------------------------------------------------------
+#  Configuration
+# ------------------------------------------------------------
+PRICE_HISTORY_CONFIG = {
+    "DIR": os.getenv("PRICE_HISTORY_DIR", "price_history"),
+    # Don't ask CoinGecko for less than this much new history
+    "MIN_REFRESH_SECONDS": float(os.getenv("PRICE_HISTORY_MIN_REFRESH_SECONDS", "300")),
+}
+
+COINGECKO_KEY = os.getenv("PRODUCTION_API_KEY") or os.getenv("SANDBOX_API_KEY")
+
+ROW_DTYPE = np.dtype([("t", "<i8"), ("price", "<f8"), ("market_cap", "<f8"), ("volume", "<f8")])
+DAY_MS = 86_400_000
+META_FILE = "meta.json"
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+def day_name(day: int) -> str:
+    """Partition name for a day number (milliseconds // DAY_MS)."""
+    return datetime.fromtimestamp(day * 86_400, tz=timezone.utc).strftime("%Y-%m-%d")
+
+def rows_from_chart(chart: Dict) -> np.ndarray:
+    """Structured rows from a CoinGecko market_chart body, joined on timestamp."""
+    prices = chart.get("prices") or []
+    caps = dict((int(t), v) for t, v in chart.get("market_caps") or [])
+    volumes = dict((int(t), v) for t, v in chart.get("total_volumes") or [])
+    rows = np.empty(len(prices), dtype=ROW_DTYPE)
+    for i, (t, price) in enumerate(prices):
+        t = int(t)
+        rows[i] = (t, price, caps.get(t, np.nan), volumes.get(t, np.nan))
+    return rows
+
+def merge_rows(existing: np.ndarray, new: np.ndarray) -> np.ndarray:
+    """Sorted union by timestamp; stored rows win over refetched ones."""
+    combined = np.concatenate([existing, new])
+    _, first = np.unique(combined["t"], return_index=True)
+    return combined[first]
+
+# ------------------------------------------------------------
+#  Store
+# ------------------------------------------------------------
+class PriceHistoryStore:
+    """Per-coin, per-day partitions of price history under ``root``."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def _lock(self, coin_id: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(coin_id, threading.Lock())
+
+    def _dir(self, coin_id: str) -> str:
+        return os.path.join(self.root, coin_id)
+
+    def _path(self, coin_id: str, day: str) -> str:
+        return os.path.join(self._dir(coin_id), f"{day}.npy")
+
+    # --------------------------------------------------------
+    #  Reading
+    # --------------------------------------------------------
+    def days(self, coin_id: str) -> List[str]:
+        """Stored partition names, oldest first."""
+        if not os.path.isdir(self._dir(coin_id)):
+            return []
+        return sorted(name[:-4] for name in os.listdir(self._dir(coin_id)) if name.endswith(".npy"))
+
+    def partition(self, coin_id: str, day: str) -> np.ndarray:
+        """One day's rows, memory-mapped read-only."""
+        return np.load(self._path(coin_id, day), mmap_mode="r")
+
+    def read(self, coin_id: str, start_ms: Optional[int] = None,
+             end_ms: Optional[int] = None) -> np.ndarray:
+        """Rows with ``start_ms <= t <= end_ms``.
+
+        A range inside one partition is returned as a view of the mapped file;
+        longer ranges are concatenated.
+        """
+        first = day_name(start_ms // DAY_MS) if start_ms is not None else ""
+        last = day_name(end_ms // DAY_MS) if end_ms is not None else "9999"
+        parts = []
+        for day in self.days(coin_id):
+            if first <= day <= last:
+                rows = self.partition(coin_id, day)
+                lo = np.searchsorted(rows["t"], start_ms, "left") if start_ms is not None else 0
+                hi = np.searchsorted(rows["t"], end_ms, "right") if end_ms is not None else len(rows)
+                if hi > lo:
+                    parts.append(rows[lo:hi])
+        if not parts:
+            return np.empty(0, dtype=ROW_DTYPE)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def last_timestamp(self, coin_id: str) -> Optional[int]:
+        """Timestamp of the newest stored row, or None."""
+        days = self.days(coin_id)
+        if not days:
+            return None
+        return int(self.partition(coin_id, days[-1])["t"][-1])
+
+    def coverage(self, coin_id: str) -> Optional[Dict[str, int]]:
+        """``{"from", "to"}`` range already fetched from CoinGecko, or None."""
+        try:
+            with open(os.path.join(self._dir(coin_id), META_FILE)) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    # --------------------------------------------------------
+    #  Writing
+    # --------------------------------------------------------
+    def append(self, coin_id: str, rows: np.ndarray) -> int:
+        """Merge rows into their day partitions; returns the rows added."""
+        if not len(rows):
+            return 0
+        os.makedirs(self._dir(coin_id), exist_ok=True)
+        rows = np.sort(rows, order="t")
+        days = rows["t"] // DAY_MS
+        added = 0
+        for day in np.unique(days):
+            path = self._path(coin_id, day_name(int(day)))
+            new = rows[days == day]
+            existing = np.load(path) if os.path.exists(path) else np.empty(0, dtype=ROW_DTYPE)
+            merged = merge_rows(existing, new)
+            if len(merged) == len(existing):
+                continue
+            added += len(merged) - len(existing)
+            # Replace, never rewrite in place: readers may have the old file mapped
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, merged)
+            os.replace(tmp_path, path)
+        return added
+
+    def _set_coverage(self, coin_id: str, start_ms: int, end_ms: int):
+        os.makedirs(self._dir(coin_id), exist_ok=True)
+        path = os.path.join(self._dir(coin_id), META_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"from": start_ms, "to": end_ms}, f)
+        os.replace(tmp_path, path)
+
+    # --------------------------------------------------------
+    #  Fetching
+    # --------------------------------------------------------
+    def fetch_range(self, coin_id: str, start_ms: int, end_ms: int) -> np.ndarray:
+        """Uncached ``/market_chart/range`` request for ``[start_ms, end_ms]``."""
+        params = {"vs_currency": "usd", "from": start_ms // 1000, "to": end_ms // 1000}
+        if COINGECKO_KEY:
+            params['x_cg_demo_api_key'] = COINGECKO_KEY
+        chart = market_cache.fetch_json(f"{COINGECKO_API}/coins/{coin_id}/market_chart/range", params)
+        return rows_from_chart(chart)
+
+    def sync(self, coin_id: str, days: float = 30) -> int:
+        """Fetch whatever part of the last ``days`` isn't stored yet.
+
+        Returns the rows added. If CoinGecko is unreachable the stored history
+        is left as is; the error only propagates when nothing is stored.
+        """
+        with self._lock(coin_id):
+            end = now_ms()
+            start = end - int(days * DAY_MS)
+            covered = self.coverage(coin_id)
+            if covered is None:
+                ranges = [(start, end)]
+                covered = {"from": start, "to": end}
+            else:
+                ranges = []
+                if start < covered["from"]:
+                    ranges.append((start, covered["from"]))
+                if end - covered["to"] >= PRICE_HISTORY_CONFIG["MIN_REFRESH_SECONDS"] * 1000:
+                    # From the newest stored row, so a partial last fetch is completed
+                    ranges.append((max(start, self.last_timestamp(coin_id) or covered["to"]), end))
+
+            added = 0
+            for range_start, range_end in ranges:
+                try:
+                    added += self.append(coin_id, self.fetch_range(coin_id, range_start, range_end))
+                except requests.exceptions.RequestException as e:
+                    if not self.days(coin_id):
+                        raise
+                    print(f"⚠️  Using stored price history for {coin_id}: {e}")
+                    return added
+                covered = {"from": min(covered["from"], range_start), "to": max(covered["to"], range_end)}
+            if ranges:
+                self._set_coverage(coin_id, covered["from"], covered["to"])
+            return added
+
+    def history(self, coin_id: str, days: float = 30) -> np.ndarray:
+        """Sync, then return the rows for the last ``days``."""
+        self.sync(coin_id, days)
+        return self.read(coin_id, now_ms() - int(days * DAY_MS))
+
+    def market_chart(self, coin_id: str, days: float = 30) -> Dict[str, List[List[float]]]:
+        """The last ``days`` in CoinGecko's ``/market_chart`` shape."""
+        rows = self.history(coin_id, days)
+        t = rows["t"].tolist()
+        return {
+            "prices": [list(p) for p in zip(t, rows["price"].tolist())],
+            "market_caps": [list(p) for p in zip(t, rows["market_cap"].tolist())],
+            "total_volumes": [list(p) for p in zip(t, rows["volume"].tolist())],
+        }
+
+PRICE_HISTORY = PriceHistoryStore(PRICE_HISTORY_CONFIG["DIR"])
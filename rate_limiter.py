@@ -0,0 +1,202 @@
+"""
+Rate limiting primitives.
+
+``TokenBucket`` paces callers to a sustained rate with a bounded burst, from
+both threads and coroutines. ``HostRateLimiter`` keeps one bucket per host and
+API key tier, starts it at the tier's documented limit and then adapts it to
+what the server reports: ``x-ratelimit-*`` headers retune the rate and
+``Retry-After`` / 429 responses pause the bucket.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ------------------------------------------------------------
+#  Configuration
+# ------------------------------------------------------------
+# Requests per minute for each API key tier
+RATE_LIMIT_TIERS = {
+    "coingecko_public": float(os.getenv("RATE_LIMIT_COINGECKO_PUBLIC", "10")),
+    "coingecko_demo": float(os.getenv("RATE_LIMIT_COINGECKO_DEMO", "30")),
+    "coingecko_pro": float(os.getenv("RATE_LIMIT_COINGECKO_PRO", "500")),
+    "recall": float(os.getenv("RATE_LIMIT_RECALL", "60")),
+}
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "5"))
+RATE_LIMIT_DEFAULT_BACKOFF = 60.0  # seconds to pause on a 429 without Retry-After
+
+# A local stand-in for Recall (see mock_recall_server.py) is metered like Recall
+RECALL_API_NETLOC = urlsplit(os.getenv("RECALL_API_URL") or "").netloc
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens per second, up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Take tokens now and return how long the caller must wait first."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= tokens
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self, tokens: float = 1):
+        """Block until ``tokens`` are available."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1):
+        """Wait without blocking the event loop."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def set_rate(self, rate: float):
+        """Retune the sustained rate, keeping tokens already earned."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(rate, 1e-6)
+
+    def limit_tokens(self, available: float):
+        """Never hold more tokens than the server says remain."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, available)
+
+    def pause(self, seconds: float):
+        """Hold every caller back for at least ``seconds``."""
+        with self._lock:
+            self._refill(time.monotonic())
+            # One token short of the pause, so the next reserve() waits exactly `seconds`
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+# ------------------------------------------------------------
+#  Per-host adaptive limiter
+# ------------------------------------------------------------
+def api_tier(url: str, params: Optional[Mapping] = None,
+             headers: Optional[Mapping] = None) -> Optional[str]:
+    """API key tier a request is billed against, or None if unmetered."""
+    host = urlsplit(url).hostname or ""
+    params = params or {}
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    if "coingecko" in host:
+        if host.startswith("pro-api.") or "x_cg_pro_api_key" in params or "x-cg-pro-api-key" in headers:
+            return "coingecko_pro"
+        if "x_cg_demo_api_key" in params or "x-cg-demo-api-key" in headers:
+            return "coingecko_demo"
+        return "coingecko_public"
+    if "recall" in host or (RECALL_API_NETLOC and urlsplit(url).netloc == RECALL_API_NETLOC):
+        return "recall"
+    return None
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _header_float(headers: Mapping, *names: str) -> Optional[float]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
+
+class HostRateLimiter:
+    """One adaptive token bucket per (host, API key tier)."""
+
+    def __init__(self, tiers: Dict[str, float] = RATE_LIMIT_TIERS, burst: float = RATE_LIMIT_BURST):
+        self.tiers = tiers
+        self.burst = burst
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url: str, params: Optional[Mapping] = None,
+               headers: Optional[Mapping] = None) -> Optional[TokenBucket]:
+        """Bucket for a request, created at the tier's limit on first use."""
+        tier = api_tier(url, params, headers)
+        if tier is None:
+            return None
+        key = (urlsplit(url).hostname or "", tier)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    per_minute = self.tiers[tier]
+                    bucket = TokenBucket(per_minute / 60.0, min(self.burst, per_minute))
+                    self._buckets[key] = bucket
+        return bucket
+
+    def acquire(self, url: str, params: Optional[Mapping] = None,
+                headers: Optional[Mapping] = None):
+        """Block until the request's host/tier has capacity."""
+        bucket = self.bucket(url, params, headers)
+        if bucket is not None:
+            bucket.acquire()
+
+    async def acquire_async(self, url: str, params: Optional[Mapping] = None,
+                            headers: Optional[Mapping] = None):
+        bucket = self.bucket(url, params, headers)
+        if bucket is not None:
+            await bucket.acquire_async()
+
+    def observe(self, url: str, params: Optional[Mapping], headers: Optional[Mapping],
+                status: int, response_headers: Mapping) -> Optional[float]:
+        """Adapt the bucket to a response; returns the backoff applied on a 429."""
+        bucket = self.bucket(url, params, headers)
+        if bucket is None:
+            return None
+
+        response_headers = {k.lower(): v for k, v in response_headers.items()}
+        retry_after = retry_after_seconds(response_headers.get("retry-after"))
+        remaining = _header_float(response_headers, "x-ratelimit-remaining", "ratelimit-remaining")
+        reset = _header_float(response_headers, "x-ratelimit-reset", "ratelimit-reset")
+
+        if remaining is not None:
+            bucket.limit_tokens(remaining)
+            if reset is not None:
+                # Reset is either seconds-until-reset or an epoch timestamp
+                window = reset - time.time() if reset > 1e9 else reset
+                if window > 0:
+                    tier_rate = self.tiers[api_tier(url, params, headers)] / 60.0
+                    bucket.set_rate(min(tier_rate, max(remaining, 1) / window))
+
+        if status == 429 or retry_after is not None:
+            backoff = retry_after if retry_after is not None else RATE_LIMIT_DEFAULT_BACKOFF
+            bucket.pause(backoff)
+            return backoff
+        return None
+
+RATE_LIMITER = HostRateLimiter()
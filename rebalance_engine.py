@@ -0,0 +1,136 @@
+"""
+Vectorized rebalance engine.
+
+Targets, holdings, prices, drift thresholds and slippage are aligned into
+NumPy vectors once, and drift, target deltas, slippage-adjusted amounts and
+sides come out of a handful of array operations. Only the orders actually
+emitted are turned back into dicts, so the cost of a rebalance no longer
+scales with Python work per asset. Stop-loss and risk-reduction decisions are
+made by the caller and passed in as per-symbol reasons.
+
+Orders match the loop-based ``compute_orders`` functions: sells (stop-loss,
+risk reduction, overweight) in target order, then buys in target order.
+"""
+
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Fraction of a position sold when the risk manager flags it
+RISK_REDUCTION_FRACTION = 0.5
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
+def align(symbols: Sequence[str], values: Mapping[str, float], default: float = 0.0) -> np.ndarray:
+    """Vector of ``values`` in ``symbols`` order, ``default`` where missing."""
+    return np.fromiter((values.get(s, default) for s in symbols), dtype=float, count=len(symbols))
+
+class RebalanceEngine:
+    """Array-backed order computation for a fixed set of target weights."""
+
+    def __init__(self, targets: Dict[str, float], thresholds: ArrayLike):
+        self.symbols = list(targets)
+        self.index = {sym: i for i, sym in enumerate(self.symbols)}
+        self.weights = align(self.symbols, targets)
+        self.thresholds = np.broadcast_to(np.asarray(thresholds, dtype=float), self.weights.shape)
+
+    def _mask(self, symbols: Optional[Mapping[str, str]]) -> np.ndarray:
+        mask = np.zeros(len(self.symbols), dtype=bool)
+        if symbols:
+            mask[[self.index[s] for s in symbols if s in self.index]] = True
+        return mask
+
+    def vectors(self, prices: Mapping[str, float],
+                holdings: Mapping[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+        """Aligned ``(prices, holdings)`` vectors, validated for a rebalance.
+
+        A held asset without a price would silently shrink the total value and
+        skew every other target, so that raises instead of pricing it at zero.
+        """
+        p, h = align(self.symbols, prices), align(self.symbols, holdings)
+        unpriced = (h > 0) & ~(p > 0)
+        if unpriced.any():
+            missing = ", ".join(self.symbols[i] for i in np.flatnonzero(unpriced))
+            raise ValueError(f"Missing prices for held assets {missing}; skipping rebalance.")
+        if not (h * p).any():
+            raise ValueError("No balances found; fund your sandbox wallet first.")
+        return p, h
+
+    def held(self, prices: np.ndarray, holdings: np.ndarray) -> List[str]:
+        """Symbols with a priced, non-zero position (the ones risk checks apply to)."""
+        return [self.symbols[i] for i in np.flatnonzero((prices > 0) & (holdings > 0))]
+
+    def compute(self, prices: np.ndarray, holdings: np.ndarray, slippage: ArrayLike,
+                stop_loss: Optional[np.ndarray] = None,
+                reduce: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Core array pass over vectors from ``vectors``.
+
+        Returns ``(sides, amounts, drift, kind)`` where ``sides`` is +1 for a
+        buy, -1 for a sell and 0 for no order, and ``kind`` is 0 for
+        rebalancing, 1 for stop-loss and 2 for risk reduction.
+        """
+        priced = prices > 0
+        current = holdings * prices
+        # Sequential (not pairwise) sum, so totals match the loop-based code bit for bit
+        total_value = np.cumsum(current)[-1]
+
+        target = total_value * self.weights
+        drift = (current - target) / total_value
+
+        held = priced & (holdings > 0)
+        stop = held & stop_loss if stop_loss is not None else np.zeros_like(held)
+        reduce = held & ~stop & reduce if reduce is not None else np.zeros_like(held)
+        rebalance = priced & ~stop & ~reduce & (np.abs(drift) >= self.thresholds)
+
+        sides = np.zeros(len(self.symbols), dtype=np.int8)
+        sides[rebalance] = np.where(drift[rebalance] > 0, -1, 1)
+        sides[stop | reduce] = -1
+
+        amounts = np.zeros(len(self.symbols))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            amounts[rebalance] = np.abs(target - current)[rebalance] / prices[rebalance]
+        buys = sides == 1
+        amounts[buys] *= 1 + np.broadcast_to(np.asarray(slippage, dtype=float), amounts.shape)[buys]
+        amounts[stop] = holdings[stop]
+        amounts[reduce] = holdings[reduce] * RISK_REDUCTION_FRACTION
+
+        kind = np.zeros(len(self.symbols), dtype=np.int8)
+        kind[stop] = 1
+        kind[reduce] = 2
+        return sides, amounts, drift, kind
+
+    def orders(self, prices: Mapping[str, float], holdings: Mapping[str, float],
+               slippage: ArrayLike, stop_loss: Optional[Mapping[str, str]] = None,
+               reduce: Optional[Mapping[str, str]] = None, reasons: bool = True) -> List[Dict]:
+        """Order dicts from price and holding dicts; see ``orders_from_vectors``."""
+        p, h = self.vectors(prices, holdings)
+        return self.orders_from_vectors(p, h, slippage, stop_loss, reduce, reasons)
+
+    def orders_from_vectors(self, prices: np.ndarray, holdings: np.ndarray, slippage: ArrayLike,
+                            stop_loss: Optional[Mapping[str, str]] = None,
+                            reduce: Optional[Mapping[str, str]] = None,
+                            reasons: bool = True) -> List[Dict]:
+        """Order dicts, sells before buys, each in target order.
+
+        ``stop_loss`` and ``reduce`` map flagged symbols to the message used in
+        the order's reason. With ``reasons=False`` orders carry only
+        symbol/side/amount.
+        """
+        sides, amounts, drift, kind = self.compute(
+            prices, holdings, slippage, self._mask(stop_loss), self._mask(reduce),
+        )
+
+        orders = []
+        for side, label in ((-1, "sell"), (1, "buy")):
+            for i in np.flatnonzero(sides == side):
+                sym = self.symbols[i]
+                order = {"symbol": sym, "side": label, "amount": float(amounts[i])}
+                if reasons:
+                    if kind[i] == 1:
+                        order["reason"] = f"Stop-loss: {stop_loss[sym]}"
+                    elif kind[i] == 2:
+                        order["reason"] = f"Risk reduction: {reduce[sym]}"
+                    else:
+                        order["reason"] = f"Rebalancing: {drift[i]:.2%} drift"
+                orders.append(order)
+        return orders
@@ -0,0 +1,172 @@
+"""
+Retries and circuit breakers for outbound API calls.
+
+``call_with_retries`` retries a call a bounded number of times with
+decorrelated-jitter backoff, so clients recovering from the same blip don't
+retry in lockstep. Each endpoint has a ``CircuitBreaker``: after
+``BREAKER_FAILURES`` consecutive failures it opens and fails fast for
+``BREAKER_RESET_SECONDS``, then lets a single probe through before closing.
+Callers fall back to the market cache's last known good value when a call
+still fails.
+"""
+
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+from urllib.parse import urlsplit
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ------------------------------------------------------------
+#  Configuration
+# ------------------------------------------------------------
+RESILIENCE_CONFIG = {
+    "MAX_ATTEMPTS": int(os.getenv("RETRY_MAX_ATTEMPTS", "3")),
+    "BASE_DELAY": float(os.getenv("RETRY_BASE_DELAY", "0.5")),       # seconds
+    "MAX_DELAY": float(os.getenv("RETRY_MAX_DELAY", "8")),           # seconds
+    "BREAKER_FAILURES": int(os.getenv("BREAKER_FAILURES", "5")),
+    "BREAKER_RESET_SECONDS": float(os.getenv("BREAKER_RESET_SECONDS", "30")),
+}
+
+# Breaker states
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling an endpoint whose breaker is open.
+
+    A ``RequestException``, so callers that already handle a failed request
+    degrade the same way when the breaker is open.
+    """
+
+class RetryableHTTPError(Exception):
+    """A 5xx response worth retrying."""
+
+    def __init__(self, status: int, url: str):
+        super().__init__(f"HTTP {status} from {url}")
+        self.status = status
+
+def decorrelated_jitter(previous: float, base: float, cap: float) -> float:
+    """Next backoff delay: uniform between ``base`` and three times the last one."""
+    return min(cap, random.uniform(base, previous * 3))
+
+# ------------------------------------------------------------
+#  Circuit breaker
+# ------------------------------------------------------------
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe."""
+
+    def __init__(self, name: str, failure_threshold: int = RESILIENCE_CONFIG["BREAKER_FAILURES"],
+                 reset_timeout: float = RESILIENCE_CONFIG["BREAKER_RESET_SECONDS"]):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise ``CircuitOpenError`` unless a call may go through now."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Let one probe through per reset window
+                self.state = HALF_OPEN
+                self.opened_at = time.monotonic()
+                return
+            raise CircuitOpenError(f"Circuit open for {self.name}")
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"🔌 Circuit opened for {self.name} after {self.failures} failures")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+# Path segments that name a specific coin rather than an endpoint
+_ID_SEGMENT = re.compile(r"(?<=/coins/)(?!markets$|markets/|list$|list/|categories)[^/]+")
+
+def endpoint_name(method: str, url: str) -> str:
+    """Breaker key for a request, e.g. ``GET api.coingecko.com/api/v3/coins/{id}``."""
+    parts = urlsplit(url)
+    return f"{method} {parts.hostname}{_ID_SEGMENT.sub('{id}', parts.path)}"
+
+def breaker_for(name: str) -> CircuitBreaker:
+    """Process-wide breaker for an endpoint name."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+# ------------------------------------------------------------
+#  Retries
+# ------------------------------------------------------------
+def call_with_retries(call: Callable[[], Any], breaker: CircuitBreaker,
+                      retry_on: Tuple[Type[BaseException], ...],
+                      retry_result: Optional[Callable[[Any], bool]] = None,
+                      max_attempts: int = RESILIENCE_CONFIG["MAX_ATTEMPTS"]) -> Any:
+    """Run ``call`` through ``breaker``, retrying ``retry_on`` errors with backoff.
+
+    ``retry_result`` flags results that count as failures (e.g. a 503
+    response); the last such result is returned once attempts run out. Only
+    retryable errors count against the breaker; others propagate untouched.
+    """
+    delay = RESILIENCE_CONFIG["BASE_DELAY"]
+    for attempt in range(1, max_attempts + 1):
+        breaker.before_call()
+        try:
+            result = call()
+        except retry_on as e:
+            breaker.record_failure()
+            if attempt == max_attempts:
+                raise
+            print(f"🔁 {breaker.name} failed ({e}), retry {attempt}/{max_attempts - 1}")
+        else:
+            if retry_result is None or not retry_result(result):
+                breaker.record_success()
+                return result
+            breaker.record_failure()
+            if attempt == max_attempts:
+                return result
+            print(f"🔁 {breaker.name} returned a retryable result, retry {attempt}/{max_attempts - 1}")
+        delay = decorrelated_jitter(delay, RESILIENCE_CONFIG["BASE_DELAY"], RESILIENCE_CONFIG["MAX_DELAY"])
+        time.sleep(delay)
+
+async def call_with_retries_async(call: Callable[[], Awaitable[Any]], breaker: CircuitBreaker,
+                                  retry_on: Tuple[Type[BaseException], ...],
+                                  max_attempts: int = RESILIENCE_CONFIG["MAX_ATTEMPTS"]) -> Any:
+    """Coroutine variant of ``call_with_retries`` for aiohttp calls."""
+    delay = RESILIENCE_CONFIG["BASE_DELAY"]
+    for attempt in range(1, max_attempts + 1):
+        breaker.before_call()
+        try:
+            result = await call()
+        except retry_on as e:
+            breaker.record_failure()
+            if attempt == max_attempts:
+                raise
+            print(f"🔁 {breaker.name} failed ({e}), retry {attempt}/{max_attempts - 1}")
+        else:
+            breaker.record_success()
+            return result
+        delay = decorrelated_jitter(delay, RESILIENCE_CONFIG["BASE_DELAY"], RESILIENCE_CONFIG["MAX_DELAY"])
+        await asyncio.sleep(delay)
@@ -1,73 +1,139 @@
 import requests
 import os
+import sys
 from dotenv import load_dotenv
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import market_cache
+from http_client import COINGECKO_API
+from meme_classifier import MEME_CLASSIFIER
+from price_history_store import PRICE_HISTORY
+
 # Load environment variables
 load_dotenv()
 
+# /coins/markets ignores `platform`; the category is what scopes it to Solana
+SOLANA_MEME_CATEGORY = "solana-meme-coins"
+SOLANA_ECOSYSTEM_CATEGORY = "solana-ecosystem"
+# `python solana_meme_fetcher.py [meme|ecosystem]`: the ecosystem scan runs the
+# meme classifier over every Solana token, not just CoinGecko's meme category
+SCAN_CATEGORIES = {"meme": SOLANA_MEME_CATEGORY, "ecosystem": SOLANA_ECOSYSTEM_CATEGORY}
+SCAN_PAGE_SIZE = 250  # CoinGecko's per_page maximum
+
 class SolanaMemeFetcher:
     def __init__(self):
-        self.base_url = "https://api.coingecko.com/api/v3"
+        self.base_url = COINGECKO_API
         self.api_key = os.getenv('PRODUCTION_API_KEY') or os.getenv('SANDBOX_API_KEY')
         
-    def get_solana_meme_coins(self, limit=50):
+    def get_markets_page(self, page, per_page=SCAN_PAGE_SIZE, category=SOLANA_MEME_CATEGORY):
         """
-        Fetch Solana meme coins from CoinGecko
+        Fetch one page of /coins/markets rows for a category
+        
+        Uncached: a scan reads each page once, and caching hundreds of pages
+        would only evict the entries other callers reuse. Request errors
+        propagate to the scan.
         """
-        try:
-            # Search for Solana meme coins
-            url = f"{self.base_url}/coins/markets"
-            params = {
-                'vs_currency': 'usd',
-                'order': 'market_cap_desc',
-                'per_page': limit,
-                'page': 1,
-                'sparkline': False,
-                'platform': 'solana'  # Filter for Solana platform
-            }
-            
-            if self.api_key:
-                params['x_cg_demo_api_key'] = self.api_key
-            
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            
-            coins = response.json()
+        url = f"{self.base_url}/coins/markets"
+        params = {
+            'vs_currency': 'usd',
+            'category': category,
+            'order': 'market_cap_desc',
+            'per_page': per_page,
+            'page': page,
+            'sparkline': False
+        }
+        
+        if self.api_key:
+            params['x_cg_demo_api_key'] = self.api_key
+        
+        return market_cache.fetch_json(url, params)
+    
+    def iter_market_coins(self, max_coins=None, category=SOLANA_MEME_CATEGORY, per_page=SCAN_PAGE_SIZE):
+        """
+        Stream /coins/markets rows page by page, market cap descending
+        
+        The next page is fetched in the background while the caller consumes
+        the current one, and only one page is held in memory at a time. A
+        failed page ends the scan with a warning saying how far it got.
+        """
+        if max_coins is not None:
+            per_page = max(1, min(per_page, max_coins))
+        
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            page = 1
+            next_page = pool.submit(self.get_markets_page, page, per_page, category)
+            yielded = 0
             
-            # Filter for meme coins (you can customize this filter)
-            meme_coins = []
-            for coin in coins:
-                # Check if it's likely a meme coin based on name/keywords
-                name_lower = coin['name'].lower()
-                symbol_lower = coin['symbol'].lower()
+            while next_page is not None:
+                try:
+                    coins = next_page.result()
+                except requests.exceptions.RequestException as e:
+                    if page == 1:
+                        print(f"Error fetching data: {e}")
+                    else:
+                        print(f"⚠️  Market scan truncated at page {page} after {yielded} coins: {e}")
+                    return
+                next_page = None
                 
-                meme_keywords = ['moon', 'doge', 'shib', 'inu', 'cat', 'dog', 'pepe', 'wojak', 'meme', 'floki', 'elon']
-                is_meme = any(keyword in name_lower or keyword in symbol_lower for keyword in meme_keywords)
+                # A full page means there may be more; start fetching it now
+                if len(coins) == per_page and (max_coins is None or yielded + len(coins) < max_coins):
+                    page += 1
+                    next_page = pool.submit(self.get_markets_page, page, per_page, category)
                 
-                if is_meme:
-                    meme_coins.append({
-                        'id': coin['id'],
-                        'name': coin['name'],
-                        'symbol': coin['symbol'].upper(),
-                        'current_price': coin['current_price'],
-                        'market_cap': coin['market_cap'],
-                        'market_cap_rank': coin['market_cap_rank'],
-                        'total_volume': coin['total_volume'],
-                        'price_change_24h': coin['price_change_24h'],
-                        'price_change_percentage_24h': coin['price_change_percentage_24h'],
-                        'circulating_supply': coin['circulating_supply'],
-                        'total_supply': coin['total_supply'],
-                        'max_supply': coin['max_supply'],
-                        'last_updated': coin['last_updated']
-                    })
-            
-            return meme_coins
-            
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching data: {e}")
-            return []
+                for coin in coins:
+                    if max_coins is not None and yielded >= max_coins:
+                        return
+                    yield coin
+                    yielded += 1
+    
+    def get_market_coins(self, limit=50, category=SOLANA_MEME_CATEGORY):
+        """
+        Fetch the raw /coins/markets rows the meme filters run over
+        """
+        return list(self.iter_market_coins(max_coins=limit, category=category))
+    
+    def get_solana_meme_coins(self, limit=50, category=SOLANA_MEME_CATEGORY):
+        """
+        Fetch Solana meme coins from CoinGecko
+        """
+        return self.filter_meme_coins(self.iter_market_coins(max_coins=limit, category=category))
+    
+    def iter_solana_meme_coins(self, max_coins=None, category=SOLANA_MEME_CATEGORY):
+        """
+        Stream Solana meme coins as the scan progresses
+        """
+        return self.iter_meme_coins(self.iter_market_coins(max_coins=max_coins, category=category))
+    
+    def filter_meme_coins(self, coins):
+        """
+        Keep the meme coins from a list of /coins/markets rows
+        """
+        return list(self.iter_meme_coins(coins))
+    
+    def iter_meme_coins(self, coins):
+        """
+        Lazily yield meme coin records from any iterable of /coins/markets rows
+        """
+        for coin in coins:
+            # Check if it's likely a meme coin based on name/keywords
+            if MEME_CLASSIFIER.is_meme(coin):
+                yield {
+                    'id': coin['id'],
+                    'name': coin['name'],
+                    'symbol': coin['symbol'].upper(),
+                    'current_price': coin['current_price'],
+                    'market_cap': coin['market_cap'],
+                    'market_cap_rank': coin['market_cap_rank'],
+                    'total_volume': coin['total_volume'],
+                    'price_change_24h': coin['price_change_24h'],
+                    'price_change_percentage_24h': coin['price_change_percentage_24h'],
+                    'circulating_supply': coin['circulating_supply'],
+                    'total_supply': coin['total_supply'],
+                    'max_supply': coin['max_supply'],
+                    'last_updated': coin['last_updated']
+                }
     
     def get_coin_details(self, coin_id):
         """
@@ -80,10 +146,7 @@ class SolanaMemeFetcher:
             if self.api_key:
                 params['x_cg_demo_api_key'] = self.api_key
             
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            
-            return response.json()
+            return market_cache.get_json("coins/detail", url, params)
             
         except requests.exceptions.RequestException as e:
             print(f"Error fetching coin details: {e}")
@@ -91,22 +154,11 @@ class SolanaMemeFetcher:
     
     def get_coin_price_history(self, coin_id, days=30):
         """
-        Get price history for a specific coin
+        Get price history for a specific coin from the local store,
+        fetching only the part it doesn't have yet
         """
         try:
-            url = f"{self.base_url}/coins/{coin_id}/market_chart"
-            params = {
-                'vs_currency': 'usd',
-                'days': days
-            }
-            
-            if self.api_key:
-                params['x_cg_demo_api_key'] = self.api_key
-            
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            
-            return response.json()
+            return PRICE_HISTORY.market_chart(coin_id, days)
             
         except requests.exceptions.RequestException as e:
             print(f"Error fetching price history: {e}")
@@ -145,9 +197,13 @@ class SolanaMemeFetcher:
 
 def main():
     fetcher = SolanaMemeFetcher()
+    scan = sys.argv[1] if len(sys.argv) > 1 else "meme"
+    if scan not in SCAN_CATEGORIES:
+        print(f"Usage: python solana_meme_fetcher.py [{'|'.join(SCAN_CATEGORIES)}]")
+        return
     
-    print("Fetching Solana meme coins...")
-    meme_coins = fetcher.get_solana_meme_coins(limit=20)
+    print(f"Fetching Solana meme coins ({SCAN_CATEGORIES[scan]} category)...")
+    meme_coins = fetcher.get_solana_meme_coins(limit=20, category=SCAN_CATEGORIES[scan])
     
     if meme_coins:
         fetcher.print_meme_coins(meme_coins)
@@ -5,37 +5,51 @@ import json
 from datetime import datetime
 import pandas as pd
 
+import market_cache
+from coin_universe import CoinUniverse
+from http_client import COINGECKO_API
+from meme_classifier import MEME_CLASSIFIER
+from solana_meme_fetcher import SOLANA_MEME_CATEGORY
+
 # Load environment variables
 load_dotenv()
 
+# /coins/markets accepts many ids per call; keep each URL well under proxy limits
+MARKETS_CHUNK_SIZE = 100
+
+# Fields only /coins/{id} provides; markets rows leave them as None
+DETAIL_ONLY_FIELDS = ['volume_change_24h']
+
 class SolanaMemeLossTracker:
     def __init__(self):
-        self.base_url = "https://api.coingecko.com/api/v3"
+        self.base_url = COINGECKO_API
         self.api_key = os.getenv('PRODUCTION_API_KEY') or os.getenv('SANDBOX_API_KEY')
         
-        # Popular Solana meme coins to track
-        self.target_coins = [
-            'dogwifhat', 'bonk', 'book-of-meme', 'popcat', 'myro', 'catwifhat',
-            'dogwifhat', 'bonk', 'book-of-meme', 'popcat', 'myro', 'catwifhat',
-            'jupiter', 'raydium', 'orca', 'serum', 'samoyedcoin', 'solana',
-            'pepe', 'wojak', 'floki', 'shiba-inu', 'doge', 'moon'
-        ]
-        
+        # Popular Solana meme coins to track, deduped and validated once
+        self.universe = CoinUniverse()
+    
+    @property
+    def target_coins(self):
+        return self.universe.tracked_ids()
+    
     def get_coin_data(self, coin_id):
         """
         Get current data for a specific coin
         """
         try:
             url = f"{self.base_url}/coins/{coin_id}"
-            params = {}
+            # Skip the heavy sections we never parse
+            params = {
+                'localization': 'false',
+                'tickers': 'false',
+                'community_data': 'false',
+                'developer_data': 'false'
+            }
             
             if self.api_key:
                 params['x_cg_demo_api_key'] = self.api_key
             
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = market_cache.get_json("coins/detail", url, params)
             
             return {
                 'id': data['id'],
@@ -60,12 +74,65 @@ class SolanaMemeLossTracker:
             }
             
         except requests.exceptions.RequestException as e:
+            if getattr(e.response, 'status_code', None) == 404:
+                self.universe.mark_invalid(coin_id)
             print(f"Error fetching data for {coin_id}: {e}")
             return None
         except KeyError as e:
             print(f"Error parsing data for {coin_id}: {e}")
             return None
     
+    def get_markets_data(self, coin_ids):
+        """
+        Get current data for many coins via chunked /coins/markets calls
+        """
+        markets_data = {}
+        
+        for start in range(0, len(coin_ids), MARKETS_CHUNK_SIZE):
+            chunk = coin_ids[start:start + MARKETS_CHUNK_SIZE]
+            try:
+                url = f"{self.base_url}/coins/markets"
+                params = {
+                    'vs_currency': 'usd',
+                    'ids': ','.join(chunk),
+                    'per_page': len(chunk),
+                    'page': 1,
+                    'sparkline': False
+                }
+                
+                if self.api_key:
+                    params['x_cg_demo_api_key'] = self.api_key
+                
+                for coin in market_cache.get_json("coins/markets", url, params):
+                    markets_data[coin['id']] = {
+                        'id': coin['id'],
+                        'name': coin['name'],
+                        'symbol': coin['symbol'].upper(),
+                        'current_price': coin['current_price'],
+                        'price_change_24h': coin['price_change_24h'],
+                        'price_change_percentage_24h': coin['price_change_percentage_24h'],
+                        'market_cap': coin['market_cap'],
+                        'market_cap_change_24h': coin['market_cap_change_24h'],
+                        'market_cap_change_percentage_24h': coin['market_cap_change_percentage_24h'],
+                        'total_volume': coin['total_volume'],
+                        'volume_change_24h': None,
+                        'circulating_supply': coin['circulating_supply'],
+                        'total_supply': coin['total_supply'],
+                        'max_supply': coin['max_supply'],
+                        'ath': coin['ath'],
+                        'ath_change_percentage': coin['ath_change_percentage'],
+                        'atl': coin['atl'],
+                        'atl_change_percentage': coin['atl_change_percentage'],
+                        'last_updated': coin['last_updated']
+                    }
+                    
+            except requests.exceptions.RequestException as e:
+                print(f"Error fetching markets data for {len(chunk)} coins: {e}")
+            except KeyError as e:
+                print(f"Error parsing markets data: {e}")
+        
+        return markets_data
+    
     def get_solana_meme_coins(self, limit=100):
         """
         Get all Solana meme coins and filter for losses
@@ -78,64 +145,73 @@ class SolanaMemeLossTracker:
                 'per_page': limit,
                 'page': 1,
                 'sparkline': False,
-                'platform': 'solana'
+                'category': SOLANA_MEME_CATEGORY
             }
             
             if self.api_key:
                 params['x_cg_demo_api_key'] = self.api_key
             
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            
-            coins = response.json()
-            
-            # Filter for meme coins with losses
-            meme_coins_with_losses = []
-            for coin in coins:
-                name_lower = coin['name'].lower()
-                symbol_lower = coin['symbol'].lower()
-                
-                # Meme coin keywords
-                meme_keywords = ['moon', 'doge', 'shib', 'inu', 'cat', 'dog', 'pepe', 'wojak', 
-                               'meme', 'floki', 'elon', 'wif', 'bonk', 'book', 'pop', 'myro']
-                
-                is_meme = any(keyword in name_lower or keyword in symbol_lower for keyword in meme_keywords)
-                has_loss = coin['price_change_percentage_24h'] < 0
-                
-                if is_meme and has_loss:
-                    meme_coins_with_losses.append({
-                        'id': coin['id'],
-                        'name': coin['name'],
-                        'symbol': coin['symbol'].upper(),
-                        'current_price': coin['current_price'],
-                        'price_change_24h': coin['price_change_24h'],
-                        'price_change_percentage_24h': coin['price_change_percentage_24h'],
-                        'market_cap': coin['market_cap'],
-                        'market_cap_change_24h': coin['market_cap_change_24h'],
-                        'market_cap_change_percentage_24h': coin['market_cap_change_percentage_24h'],
-                        'total_volume': coin['total_volume'],
-                        'circulating_supply': coin['circulating_supply'],
-                        'last_updated': coin['last_updated']
-                    })
+            coins = market_cache.get_json("coins/markets", url, params)
             
-            return meme_coins_with_losses
+            return self.filter_meme_losses(coins)
             
         except requests.exceptions.RequestException as e:
             print(f"Error fetching Solana meme coins: {e}")
             return []
     
-    def track_specific_coins(self):
+    def filter_meme_losses(self, coins):
+        """
+        Keep meme coins with a 24h loss from a list of /coins/markets rows
+        """
+        meme_coins_with_losses = []
+        for coin in coins:
+            is_meme = MEME_CLASSIFIER.is_meme(coin)
+            has_loss = (coin['price_change_percentage_24h'] or 0) < 0
+            
+            if is_meme and has_loss:
+                meme_coins_with_losses.append({
+                    'id': coin['id'],
+                    'name': coin['name'],
+                    'symbol': coin['symbol'].upper(),
+                    'current_price': coin['current_price'],
+                    'price_change_24h': coin['price_change_24h'],
+                    'price_change_percentage_24h': coin['price_change_percentage_24h'],
+                    'market_cap': coin['market_cap'],
+                    'market_cap_change_24h': coin['market_cap_change_24h'],
+                    'market_cap_change_percentage_24h': coin['market_cap_change_percentage_24h'],
+                    'total_volume': coin['total_volume'],
+                    'circulating_supply': coin['circulating_supply'],
+                    'last_updated': coin['last_updated']
+                })
+        
+        return meme_coins_with_losses
+    
+    def track_specific_coins(self, detailed=False):
         """
         Track specific popular Solana meme coins
+        
+        Uses one batched /coins/markets pass and only falls back to per-coin
+        /coins/{id} calls for ids markets did not return, or for
+        DETAIL_ONLY_FIELDS when detailed=True.
         """
         print("Tracking specific Solana meme coins...")
         print("=" * 80)
         
+        target_coins = list(self.target_coins)
+        markets_data = self.get_markets_data(target_coins)
         tracked_coins = []
         
-        for coin_id in self.target_coins:
-            print(f"Fetching data for {coin_id}...")
-            coin_data = self.get_coin_data(coin_id)
+        for coin_id in target_coins:
+            coin_data = markets_data.get(coin_id)
+            
+            if coin_data is None or detailed:
+                print(f"Fetching data for {coin_id}...")
+                details = self.get_coin_data(coin_id)
+                if coin_data is None:
+                    coin_data = details
+                elif details:
+                    for field in DETAIL_ONLY_FIELDS:
+                        coin_data[field] = details[field]
             
             if coin_data:
                 tracked_coins.append(coin_data)
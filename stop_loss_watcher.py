@@ -0,0 +1,191 @@
+"""
+Intra-cycle stop-loss watcher.
+
+Rebalancing runs every few hours, which is far too slow to catch a meme coin
+dumping 40%. ``StopLossWatcher`` runs its own asyncio loop on a background
+thread: every ``STOP_WATCH_INTERVAL`` seconds it prices held positions only
+through a ``PriceOracle`` (one batched ``/simple/price`` request raced against
+the other sources, which also feeds the trailing stops), runs the risk
+manager's stop-loss check against the cost-basis entry price, and sends any
+stop-loss sells straight through the order queue and execution engine.
+Holdings are refreshed on a slower cadence and right after a stop fires.
+
+The watcher shares the CoinGecko rate limit with the rebalance cycle, so
+unless ``STOP_WATCH_INTERVAL`` is set the interval is derived from the API
+key tier: the watcher may spend ``STOP_WATCH_BUDGET_SHARE`` of the tier's
+requests per minute (30s on the public tier, 10s on demo).
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+import http_client
+from advanced_portfolio_manager import (
+    COINGECKO_API, COINGECKO_KEY, COINGECKO_IDS, COST_BASIS_FILE, EXECUTION_ENGINE,
+    STOP_LOSS_CONFIG, PriceOracle, RiskManager, default_risk_manager, fetch_holdings, log_trade,
+    open_ledger,
+)
+from cost_basis import CostBasisLedger
+from market_cache import MarketCache
+from order_queue import open_order_queue
+from rate_limiter import RATE_LIMIT_TIERS, api_tier
+
+load_dotenv()
+
+# ------------------------------------------------------------
+#  Configuration
+# ------------------------------------------------------------
+WATCHER_CONFIG = {
+    "INTERVAL": float(os.getenv("STOP_WATCH_INTERVAL") or "0"),                 # seconds; 0 = from tier
+    "BUDGET_SHARE": float(os.getenv("STOP_WATCH_BUDGET_SHARE", "0.2")),         # of the tier's requests/min
+    "MIN_INTERVAL": float(os.getenv("STOP_WATCH_MIN_INTERVAL", "5")),           # seconds
+    "HOLDINGS_REFRESH": float(os.getenv("STOP_WATCH_HOLDINGS_REFRESH", "60")),  # seconds
+}
+
+# Never stop out of the quote currency
+QUOTE_SYMBOL = "USDC"
+
+def budget_interval(share: float = WATCHER_CONFIG["BUDGET_SHARE"],
+                    min_interval: float = WATCHER_CONFIG["MIN_INTERVAL"]) -> float:
+    """Poll interval that keeps the watcher within ``share`` of the CoinGecko tier."""
+    params = {'x_cg_demo_api_key': COINGECKO_KEY} if COINGECKO_KEY else {}
+    # An unmetered host (e.g. the replay server) gets the public budget
+    tier = api_tier(f"{COINGECKO_API}/simple/price", params) or "coingecko_public"
+    per_minute = RATE_LIMIT_TIERS[tier] * share
+    return max(min_interval, 60.0 / per_minute)
+
+class StopLossWatcher:
+    """Fast polling loop that fires stop-loss sells between rebalances."""
+
+    def __init__(self, risk_manager: Optional[RiskManager] = None,
+                 ledger: Optional[CostBasisLedger] = None,
+                 interval: Optional[float] = None,
+                 holdings_refresh: float = WATCHER_CONFIG["HOLDINGS_REFRESH"],
+                 oracle: Optional[PriceOracle] = None):
+        self.risk_manager = risk_manager or default_risk_manager()
+        self.ledger = ledger or open_ledger(COST_BASIS_FILE)
+        self.interval = interval or WATCHER_CONFIG["INTERVAL"] or budget_interval()
+        self.holdings_refresh = holdings_refresh
+        # A cache with no freshness window: every poll asks for current
+        # prices, and the previous answer is only the fallback on errors
+        self.oracle = oracle or PriceOracle(cache=MarketCache(ttls={"simple/price": 0}, stale_seconds=0))
+        self.holdings: Dict[str, float] = {}
+        self.holdings_at = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def watched_symbols(self) -> List[str]:
+        """Held positions we can price."""
+        return [
+            sym for sym, amount in self.holdings.items()
+            if amount > 0 and sym != QUOTE_SYMBOL and sym in COINGECKO_IDS
+        ]
+
+    async def refresh_holdings(self, force: bool = False):
+        if force or time.monotonic() - self.holdings_at >= self.holdings_refresh:
+            self.holdings = await asyncio.to_thread(fetch_holdings)
+            self.holdings_at = time.monotonic()
+
+    async def poll_prices(self, session, symbols: List[str]) -> Dict[str, float]:
+        """Current prices for every watched symbol; also feeds the trailing stops."""
+        return await self.oracle.get_prices(symbols, session)
+
+    def stop_orders(self, prices: Dict[str, float]) -> List[Dict]:
+        """Stop-loss sells for every watched position whose stop is hit."""
+        orders = []
+        for sym, price in prices.items():
+            self.ledger.seed(sym, self.holdings[sym], price)
+            entry_price = self.ledger.entry_price(sym, STOP_LOSS_CONFIG["ENTRY_PRICE_METHOD"])
+            triggered, msg = self.risk_manager.check_stop_loss(sym, price, entry_price, self.holdings)
+            if triggered:
+                orders.append({
+                    "symbol": sym,
+                    "side": "sell",
+                    "amount": self.holdings[sym],
+                    "reason": f"Stop-loss: {msg}",
+                })
+        return orders
+
+    async def fire(self, orders: List[Dict], prices: Dict[str, float]):
+        """Send stop-loss sells through the order queue and execution engine.
+
+        Holdings are refreshed first, so sells are sized to what is held now
+        and queued with the right starting balance. The queue is not
+        reconciled here: that would settle the running cycle's own orders.
+        """
+        await self.refresh_holdings(force=True)
+        orders = [
+            dict(order, amount=min(order['amount'], self.holdings.get(order['symbol'], 0)))
+            for order in orders
+            if self.holdings.get(order['symbol'], 0) > 0
+        ]
+        orders = await asyncio.to_thread(open_order_queue().enqueue_orders, orders, self.holdings,
+                                         reconcile=False)
+        for trade in await EXECUTION_ENGINE.run(orders, prices, self.holdings):
+            order = trade['order']
+            if trade['status'] != 'success':
+                print(f"❌ Stop-loss sell failed for {order['symbol']}: {trade['error']}")
+                continue
+            status = trade['result'].get('status', 'unknown')
+            log_trade(order['symbol'], 'sell', order['amount'], prices.get(order['symbol'], 0),
+                      status, order['reason'])
+            print(f"🛑 {order['reason']} → sold {order['amount']:.6f} {order['symbol']} ({status})")
+
+    async def tick(self, session):
+        """One poll: refresh holdings if due, price held positions, fire stops."""
+        await self.refresh_holdings()
+        symbols = self.watched_symbols()
+        if not symbols:
+            return
+        prices = await self.poll_prices(session, symbols)
+        orders = self.stop_orders(prices)
+        if orders:
+            await self.fire(orders, prices)
+            await self.refresh_holdings(force=True)
+
+    async def run(self):
+        """Poll until ``stop`` is called."""
+        self._loop, self._task = asyncio.get_running_loop(), asyncio.current_task()
+        print(f"👀 Stop-loss watcher polling every {self.interval:.0f}s")
+        async with http_client.async_session() as session:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                try:
+                    await self.tick(session)
+                except Exception as e:
+                    print(f"⚠️  Stop-loss watcher error: {e}")
+                await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self) -> Optional[threading.Thread]:
+        """Run the watcher loop on a daemon thread."""
+        if not STOP_LOSS_CONFIG["ENABLED"]:
+            print("ℹ️  Stop-loss disabled; watcher not started")
+            return None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_thread, name="stop-loss-watcher", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def _run_thread(self):
+        try:
+            asyncio.run(self.run())
+        except asyncio.CancelledError:
+            pass
+
+    def stop(self):
+        """Stop polling, interrupting any sleep or rate-limit wait."""
+        self._stop.set()
+        if self._loop is not None and self._task is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._task.cancel)
+            except RuntimeError:
+                pass  # loop already closed
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
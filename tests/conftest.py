@@ -0,0 +1,186 @@
+"""
+Shared fixtures: an in-process stand-in for CoinGecko and the Recall API.
+
+``fake_api`` swaps ``http_client``'s pooled sessions for fakes that answer
+from fixed market data, lifts the rate limits, resets the process-wide
+breakers, queues, ledgers and caches, and runs the test in a scratch
+directory so state files (order queue, risk state, journal) don't touch the
+working tree.
+"""
+
+import json
+import os
+import re
+import sys
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("RECALL_API_KEY", "test")
+
+import advanced_portfolio_manager  # noqa: E402
+import cost_basis  # noqa: E402
+import http_client  # noqa: E402
+import order_queue  # noqa: E402
+import resilience  # noqa: E402
+import trailing_stop  # noqa: E402
+from market_cache import MARKET_CACHE  # noqa: E402
+from rate_limiter import RATE_LIMIT_TIERS, HostRateLimiter  # noqa: E402
+
+COIN_IDS = ["dogwifhat", "bonk", "book-of-meme", "popcat", "myro", "solana", "pepe",
+            "usd-coin", "weth", "wrapped-bitcoin", "chainlink", "uniswap", "aave"]
+
+def coin_row(coin_id: str, price: float) -> Dict:
+    return {
+        "id": coin_id, "symbol": coin_id[:4], "name": coin_id.replace("-", " ").title(),
+        "current_price": price, "price_change_24h": 0.1, "price_change_percentage_24h": -3.0,
+        "price_change_percentage_7d_in_currency": 2.0, "market_cap": 1e9, "market_cap_rank": 1,
+        "total_volume": 5e6, "circulating_supply": 1e6, "total_supply": 1e6, "max_supply": None,
+        "ath": 100.0, "ath_change_percentage": -50.0, "atl": 0.01, "atl_change_percentage": 500.0,
+        "last_updated": "2024-01-01T00:00:00Z",
+    }
+
+class FakeAPI:
+    """Answers CoinGecko and Recall requests; records every call."""
+
+    def __init__(self):
+        self.prices = {coin_id: 1.0 + i for i, coin_id in enumerate(COIN_IDS)}
+        self.holdings = {"USDC": 5000.0, "WIF": 100.0, "WETH": 1.0, "BONK": 1000.0}
+        self.calls: List[Tuple[str, str]] = []
+        self.trades: List[Dict] = []  # bodies posted to /api/trade/execute
+        self.reject_trades = False
+        self.failing_pages = set()
+        self.forced_status: Dict[str, int] = {}  # path suffix -> status to answer with
+
+    def respond(self, method: str, url: str, params=None, body=None) -> Tuple[int, object]:
+        path = urlsplit(url).path
+        params = params or {}
+        self.calls.append((method, path))
+        for suffix, status in self.forced_status.items():
+            if path.endswith(suffix):
+                return status, {"error": f"HTTP {status}"}
+        if path.endswith("/simple/price"):
+            ids = params["ids"].split(",")
+            return 200, {i: {"usd": self.prices[i]} for i in ids if i in self.prices}
+        if path.endswith("/coins/markets"):
+            if "ids" in params:
+                ids = [i for i in params["ids"].split(",") if i in self.prices]
+            else:
+                page, per_page = int(params.get("page", 1)), int(params.get("per_page", 100))
+                if page in self.failing_pages:
+                    return 400, {"error": "page unavailable"}
+                ids = COIN_IDS[(page - 1) * per_page:page * per_page]
+            return 200, [coin_row(i, self.prices[i]) for i in ids]
+        if path.endswith("/coins/list"):
+            return 200, [{"id": i} for i in COIN_IDS]
+        m = re.search(r"/coins/([^/]+)/market_chart(/range)?$", path)
+        if m:
+            ts = [1_700_000_000_000 + k * 3_600_000 for k in range(48)]
+            price = self.prices.get(m.group(1), 1.0)
+            return 200, {"prices": [[t, price] for t in ts],
+                         "market_caps": [[t, 1e9] for t in ts],
+                         "total_volumes": [[t, 5e6] for t in ts]}
+        m = re.search(r"/coins/([^/]+)$", path)
+        if m:
+            if m.group(1) not in self.prices:
+                return 404, {"error": "coin not found"}
+            return 200, {"id": m.group(1), "name": m.group(1), "symbol": m.group(1)[:4],
+                         "last_updated": "2024-01-01T00:00:00Z", "market_data": {}}
+        if path.endswith("/api/balance"):
+            return 200, dict(self.holdings)
+        if path.endswith("/api/trade/execute"):
+            self.trades.append(body)
+            if self.reject_trades:
+                return 400, {"success": False, "error": "Trade rejected"}
+            return 200, {"success": True, "status": "filled",
+                         "transaction": {"fromAmount": 1, "toAmount": 1, "price": 1}}
+        return 404, {}
+
+    def coingecko_calls(self) -> List[Tuple[str, str]]:
+        return [c for c in self.calls if "/api/v3/" in c[1]]
+
+class FakeResponse(requests.Response):
+    def __init__(self, status: int, body, url: str):
+        super().__init__()
+        self.status_code = status
+        self._content = json.dumps(body).encode()
+        self.url = url
+        if status == 429:
+            self.headers["Retry-After"] = "0"
+
+class FakeSession:
+    def __init__(self, api: FakeAPI):
+        self.api = api
+
+    def request(self, method, url, params=None, json=None, **kwargs):
+        status, body = self.api.respond(method, url, params, json)
+        return FakeResponse(status, body, url)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+class FakeAioResponse:
+    def __init__(self, status: int, body):
+        self.status = status
+        self.headers = {"Retry-After": "0"} if status == 429 else {}
+        self._body = body
+
+    async def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise RuntimeError(f"HTTP {self.status}")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+class FakeAioSession:
+    def __init__(self, api: FakeAPI):
+        self.api = api
+
+    def get(self, url, params=None, **kwargs):
+        return FakeAioResponse(*self.api.respond("GET", url, params))
+
+    def post(self, url, json=None, **kwargs):
+        return FakeAioResponse(*self.api.respond("POST", url, None, json))
+
+    async def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+@pytest.fixture
+def fake_api(monkeypatch, tmp_path) -> FakeAPI:
+    api = FakeAPI()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(http_client, "_session", FakeSession(api))
+    monkeypatch.setattr(http_client, "async_session", lambda *a, **k: FakeAioSession(api))
+    # The fake API answers instantly; don't pace it at the real tiers' limits
+    monkeypatch.setattr(http_client, "RATE_LIMITER",
+                        HostRateLimiter({tier: 1e6 for tier in RATE_LIMIT_TIERS}, burst=1e6))
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(order_queue, "_queues", {})
+    monkeypatch.setattr(cost_basis, "_ledgers", {})
+    monkeypatch.setattr(trailing_stop, "_trackers", {})
+    monkeypatch.setattr(advanced_portfolio_manager, "_risk_manager", None)
+    MARKET_CACHE.clear()
+    yield api
+    for queue in order_queue._queues.values():
+        queue.close()
+    for tracker in trailing_stop._trackers.values():
+        tracker.path = None  # its exit-time save would land in the repo
+    MARKET_CACHE.clear()
@@ -0,0 +1,75 @@
+import pytest
+
+import cost_basis
+from cost_basis import AVERAGE, FIFO, CostBasisLedger, Position, fill_from_result, open_ledger
+
+
+def test_fifo_and_average_entry_prices_after_buys():
+    position = Position()
+    position.buy(10, 1.0)
+    position.buy(10, 3.0)
+    assert position.entry_price(FIFO) == pytest.approx(2.0)
+    assert position.entry_price(AVERAGE) == pytest.approx(2.0)
+
+def test_partial_sell_consumes_oldest_lots_first():
+    position = Position()
+    position.buy(10, 1.0)
+    position.buy(10, 3.0)
+    position.sell(15, 4.0)
+
+    assert position.quantity == pytest.approx(5)
+    assert position.entry_price(FIFO) == pytest.approx(3.0)      # only the newer lot is left
+    assert position.entry_price(AVERAGE) == pytest.approx(2.0)   # average is unchanged by sells
+    assert position.realized_pnl == pytest.approx(10 * 3.0 + 5 * 1.0)
+
+def test_selling_everything_closes_the_position():
+    position = Position()
+    position.buy(10, 1.0)
+    position.sell(25, 2.0)  # more than held: clamped
+    assert position.quantity == 0
+    assert position.entry_price(FIFO) is None
+    assert position.realized_pnl == pytest.approx(10.0)
+
+def test_fill_from_result_reads_quantity_from_the_token_side():
+    result = {"transaction": {"fromAmount": 50.0, "toAmount": 100.0}}
+    assert fill_from_result({"side": "buy"}, result) == (100.0, 0.5)   # USDC -> token
+    assert fill_from_result({"side": "sell"}, result) == (50.0, 2.0)   # token -> USDC
+    assert fill_from_result({"side": "buy"}, {"success": False}) is None
+    assert fill_from_result({"side": "buy"}, {"transaction": {"fromAmount": 1, "toAmount": 0}}) is None
+
+def test_ledger_records_fills_and_persists(tmp_path):
+    path = str(tmp_path / "cost_basis.json")
+    ledger = CostBasisLedger(path)
+    assert ledger.record_fill({"symbol": "WIF", "side": "buy"},
+                              {"transaction": {"fromAmount": 10.0, "toAmount": 10.0}})
+    assert ledger.record_fill({"symbol": "WIF", "side": "buy"},
+                              {"transaction": {"fromAmount": 30.0, "toAmount": 10.0}})
+    assert ledger.record_fill({"symbol": "WIF", "side": "sell"},
+                              {"transaction": {"fromAmount": 5.0, "toAmount": 20.0}})
+    assert not ledger.record_fill({"symbol": "WIF", "side": "sell"}, {"success": False})
+
+    reloaded = CostBasisLedger(path)
+    assert reloaded.quantity("WIF") == pytest.approx(15)
+    assert reloaded.entry_price("WIF", FIFO) == pytest.approx((5 * 1.0 + 10 * 3.0) / 15)
+    assert reloaded.entry_price("WIF", AVERAGE) == pytest.approx(2.0)
+    assert reloaded.realized_pnl("WIF") == pytest.approx(5 * (4.0 - 1.0))
+
+def test_seed_only_opens_untracked_positions(tmp_path):
+    ledger = CostBasisLedger(str(tmp_path / "cost_basis.json"))
+    ledger.seed("BONK", 100, 0.5)
+    ledger.seed("BONK", 100, 9.0)  # already tracked: ignored
+    ledger.seed("WIF", 0, 1.0)
+    assert ledger.entry_price("BONK") == pytest.approx(0.5)
+    assert ledger.quantity("BONK") == 100
+    assert ledger.entry_price("WIF") is None
+
+def test_unreadable_file_starts_empty(tmp_path):
+    path = tmp_path / "cost_basis.json"
+    path.write_text("{not json")
+    assert CostBasisLedger(str(path)).positions == {}
+
+def test_open_ledger_is_shared_per_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(cost_basis, "_ledgers", {})
+    path = str(tmp_path / "cost_basis.json")
+    assert open_ledger(path) is open_ledger(path)
+    assert open_ledger(str(tmp_path / "other.json")) is not open_ledger(path)
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+import http_client
+from http_client import HTTP_CONFIG
+from resilience import RESILIENCE_CONFIG
+
+URL = "https://api.coingecko.com/api/v3/simple/price"
+
+def attempts(fake_api, suffix="/simple/price"):
+    return sum(path.endswith(suffix) for _, path in fake_api.calls)
+
+def test_get_429_is_retried_in_one_layer(fake_api):
+    fake_api.forced_status["/simple/price"] = 429
+    response = http_client.get(URL, params={"ids": "bonk", "vs_currencies": "usd"})
+
+    assert response.status_code == 429
+    assert attempts(fake_api) == HTTP_CONFIG["MAX_429_RETRIES"] + 1
+
+def test_post_429_is_retried_in_one_layer(fake_api):
+    fake_api.forced_status["/api/trade/execute"] = 429
+    response = http_client.post("http://127.0.0.1:8765/api/trade/execute", json={})
+
+    assert response.status_code == 429
+    assert attempts(fake_api, "/api/trade/execute") == HTTP_CONFIG["MAX_429_RETRIES"] + 1
+
+def test_async_429_is_retried_in_one_layer(fake_api):
+    fake_api.forced_status["/simple/price"] = 429
+
+    async def get():
+        async with http_client.async_session() as session:
+            return await http_client.get_json_async(session, URL, {"ids": "bonk", "vs_currencies": "usd"})
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(get())
+    assert attempts(fake_api) == HTTP_CONFIG["MAX_429_RETRIES"] + 1
+
+def test_get_5xx_is_still_retried(fake_api, monkeypatch):
+    monkeypatch.setitem(RESILIENCE_CONFIG, "BASE_DELAY", 0.0)
+    monkeypatch.setitem(RESILIENCE_CONFIG, "MAX_DELAY", 0.0)
+    fake_api.forced_status["/simple/price"] = 503
+    response = http_client.get(URL, params={"ids": "bonk", "vs_currencies": "usd"})
+
+    assert response.status_code == 503
+    assert attempts(fake_api) == RESILIENCE_CONFIG["MAX_ATTEMPTS"]
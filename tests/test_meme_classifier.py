@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from meme_classifier import MEME_KEYWORDS, MemeClassifier
+
+COINS = [
+    {"id": "dogwifhat", "name": "dogwifhat", "symbol": "WIF"},
+    {"id": "bonk", "name": "Bonk", "symbol": "BONK"},
+    {"id": "mystery", "name": None, "symbol": "PePe"},
+    {"id": "nameless", "name": None, "symbol": "XYZ"},
+    {"id": "solana", "name": "Solana", "symbol": "SOL"},
+    {"id": "usd-coin", "name": "USD Coin", "symbol": "usdc"},
+    {"id": "catcoin", "name": "The CAT Coin", "symbol": None},
+]
+
+@pytest.fixture
+def classifier():
+    return MemeClassifier()
+
+def test_series_matches_is_meme_row_by_row(classifier):
+    names = pd.Series([c["name"] for c in COINS])
+    symbols = pd.Series([c["symbol"] for c in COINS])
+    expected = [classifier.is_meme(c) for c in COINS]
+
+    mask = classifier.classify_series(names) | classifier.classify_series(symbols)
+    assert mask.dtype == bool
+    assert mask.tolist() == expected
+    assert expected == [True, True, True, False, False, False, True]
+
+def test_frame_matches_on_name_or_symbol(classifier):
+    df = pd.DataFrame(COINS)
+    mask = classifier.classify_frame(df)
+    assert mask.tolist() == [classifier.is_meme(c) for c in COINS]
+    assert df[mask]["id"].tolist() == ["dogwifhat", "bonk", "mystery", "catcoin"]
+
+def test_frame_with_custom_columns(classifier):
+    df = pd.DataFrame({"coin": ["Floki Inu", "Chainlink"], "ticker": ["FLOKI", "LINK"]})
+    assert classifier.classify_frame(df, name_col="coin", symbol_col="ticker").tolist() == [True, False]
+
+def test_every_keyword_is_matched_case_insensitively(classifier):
+    names = pd.Series([k.upper() for k in MEME_KEYWORDS])
+    assert classifier.classify_series(names).all()
@@ -0,0 +1,31 @@
+from advanced_portfolio_manager import ASSETS, DECIMALS, TOKEN_MAP, to_base_units
+from mock_recall_server import MockExchange
+
+def trade(symbol, side, amount):
+    return dict(ASSETS.trade_tokens(symbol, side), amount=to_base_units(amount, DECIMALS[symbol]))
+
+def test_placeholder_tokens_carry_symbols():
+    assert TOKEN_MAP["WIF"] == TOKEN_MAP["BONK"]
+    assert trade("WIF", "buy", 1)["toSymbol"] == "WIF"
+    assert "toSymbol" not in trade("WETH", "buy", 1)
+
+def test_meme_trades_resolve_by_symbol():
+    exchange = MockExchange(prices={"WIF": 2.0, "BONK": 0.5})
+
+    status, body = exchange.execute(trade("WIF", "buy", 100), None)
+    assert status == 200, body
+    status, body = exchange.execute(trade("BONK", "buy", 100), None)
+    assert status == 200, body
+
+    balances = exchange.balance_snapshot()
+    assert balances["WIF"] == 100 and balances["BONK"] == 100
+    assert balances["USDC"] == 10000 - 200 - 50
+
+    status, _ = exchange.execute(trade("WIF", "sell", 40), None)
+    assert status == 200
+    assert exchange.balance_snapshot()["WIF"] == 60
+
+def test_symbol_hint_must_match_the_address():
+    payload = dict(trade("WIF", "buy", 1), toSymbol="WETH")
+    status, body = MockExchange().execute(payload, None)
+    assert status == 400
@@ -0,0 +1,165 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from order_queue import (
+    FAILED, FILLED, ORDER_QUEUE_CONFIG, PENDING, SUBMITTED, UNKNOWN, OrderBlockedError, OrderQueue,
+)
+from resilience import CircuitOpenError
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = OrderQueue(str(tmp_path / "orders.db"))
+    yield queue
+    queue.close()
+
+def sell(symbol="WIF", amount=10.0):
+    return {"symbol": symbol, "side": "sell", "amount": amount, "reason": "test"}
+
+def age(queue, client_order_id, seconds):
+    with queue._lock:
+        queue._db.execute("UPDATE orders SET created_at = created_at - ? WHERE client_order_id = ?",
+                          (seconds, client_order_id))
+        queue._db.commit()
+
+def test_stop_loss_enqueue_keeps_cycle_pending_orders(queue):
+    [buy] = queue.enqueue_orders([{"symbol": "BONK", "side": "buy", "amount": 5.0}], {"BONK": 0})
+
+    # A mid-cycle stop-loss must not fail the cycle's queued buy
+    queue.enqueue_orders([sell()], {"WIF": 10.0}, reconcile=False)
+    assert queue.state(buy["client_order_id"]) == PENDING
+
+    # Nor may a fresh reconcile: the buy is younger than the pending timeout
+    assert queue.reconcile({"BONK": 0}) == []
+    result = queue.submit(buy, lambda order: {"success": True})
+    assert result == {"success": True}
+    assert queue.state(buy["client_order_id"]) == FILLED
+
+def test_reconcile_fails_abandoned_pending_orders(queue):
+    [order] = queue.enqueue_orders([sell()], {"WIF": 10.0})
+    age(queue, order["client_order_id"], ORDER_QUEUE_CONFIG["PENDING_TIMEOUT"] + 1)
+
+    [resolved] = queue.reconcile({"WIF": 10.0})
+    assert resolved["state"] == FAILED
+    assert queue.blocked_symbols() == set()
+
+def test_pending_order_blocks_symbol(queue):
+    queue.enqueue_orders([sell()], {"WIF": 10.0})
+    assert queue.enqueue_orders([sell(amount=1.0)], {"WIF": 10.0}) == []
+    with pytest.raises(OrderBlockedError):
+        queue.submit(sell(amount=1.0), lambda order: {"success": True})
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"HTTP {status}", response=response)
+
+def test_submit_success_goes_pending_submitted_filled(queue):
+    [order] = queue.enqueue_orders([sell()], {"WIF": 10.0})
+    seen = []
+
+    def send(o):
+        seen.append(queue.state(o["client_order_id"]))
+        return {"success": True}
+
+    queue.submit(order, send)
+    assert seen == [SUBMITTED]
+    assert queue.state(order["client_order_id"]) == FILLED
+    assert queue.blocked_symbols() == set()
+
+def test_unsuccessful_result_fails_the_order(queue):
+    [order] = queue.enqueue_orders([sell()], {"WIF": 10.0})
+    queue.submit(order, lambda o: {"success": False, "error": "Insufficient balance"})
+    assert queue.state(order["client_order_id"]) == FAILED
+
+@pytest.mark.parametrize("error, state", [
+    (ValueError("bad order"), FAILED),
+    (CircuitOpenError("open"), FAILED),
+    (requests.exceptions.ConnectTimeout("no connection"), FAILED),
+    (http_error(400), FAILED),
+    (http_error(502), UNKNOWN),
+    (requests.exceptions.ReadTimeout("no answer"), UNKNOWN),
+])
+def test_submit_error_is_failed_only_when_provably_not_executed(queue, error, state):
+    [order] = queue.enqueue_orders([sell()], {"WIF": 10.0})
+
+    def send(o):
+        raise error
+
+    with pytest.raises(type(error)):
+        queue.submit(order, send)
+    assert queue.state(order["client_order_id"]) == state
+    assert queue.blocked_symbols() == ({"WIF"} if state == UNKNOWN else set())
+
+def test_order_is_submitted_at_most_once(queue):
+    [order] = queue.enqueue_orders([sell()], {"WIF": 10.0})
+    sent = []
+
+    def send(o):
+        sent.append(o["client_order_id"])
+        return {"success": True}
+
+    queue.submit(order, send)
+    with pytest.raises(OrderBlockedError):
+        queue.submit(order, send)
+    assert sent == [order["client_order_id"]]
+
+def test_concurrent_submits_send_once(queue):
+    [order] = queue.enqueue_orders([sell()], {"WIF": 10.0})
+    sent, blocked = [], []
+    barrier = threading.Barrier(8)
+
+    def send(o):
+        sent.append(o["client_order_id"])
+        time.sleep(0.01)
+        return {"success": True}
+
+    def submit():
+        barrier.wait()
+        try:
+            queue.submit(dict(order), send)
+        except OrderBlockedError:
+            blocked.append(True)
+
+    threads = [threading.Thread(target=submit) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(sent) == 1
+    assert len(blocked) == 7
+
+@pytest.mark.parametrize("holding_after, state", [
+    (4.0, FILLED),      # sold 6 of 10: past the fill tolerance
+    (10.0, FAILED),     # balance unchanged: never executed
+    (8.0, UNKNOWN),     # in between: left for manual review
+])
+def test_reconcile_settles_unknown_sells_from_balances(queue, holding_after, state):
+    [order] = queue.enqueue_orders([sell()], {"WIF": 10.0})
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        queue.submit(order, lambda o: (_ for _ in ()).throw(requests.exceptions.ReadTimeout()))
+
+    resolved = queue.reconcile({"WIF": holding_after})
+    assert queue.state(order["client_order_id"]) == state
+    assert [r["state"] for r in resolved] == ([] if state == UNKNOWN else [state])
+
+def test_reconcile_settles_submitted_buys_left_by_a_crash(queue):
+    [order] = queue.enqueue_orders([{"symbol": "BONK", "side": "buy", "amount": 100.0}], {"BONK": 50.0})
+    queue._update(order["client_order_id"], SUBMITTED)  # crashed mid-request
+
+    [resolved] = queue.reconcile({"BONK": 150.0})
+    assert resolved["state"] == FILLED
+    assert queue.enqueue_orders([{"symbol": "BONK", "side": "buy", "amount": 1.0}], {"BONK": 150.0})
+
+def test_queue_survives_reopen(tmp_path):
+    path = str(tmp_path / "orders.db")
+    first = OrderQueue(path)
+    [order] = first.enqueue_orders([sell()], {"WIF": 10.0})
+    first.close()
+
+    reopened = OrderQueue(path)
+    assert reopened.state(order["client_order_id"]) == PENDING
+    assert reopened.blocked_symbols() == {"WIF"}
+    reopened.close()
@@ -0,0 +1,21 @@
+from param_sweep import rank_results
+
+def result(total_return, max_drawdown, turnover, **extra):
+    return dict(params={}, total_return=total_return, max_drawdown=max_drawdown,
+                turnover=turnover, **extra)
+
+def test_rank_orders_by_mean_metric_rank():
+    best = result(0.30, 0.10, 1.0)
+    middle = result(0.20, 0.20, 2.0)
+    worst = result(0.10, 0.30, 3.0)
+
+    assert rank_results([worst, best, middle]) == [best, middle, worst]
+    assert best["score"] == 0.0
+
+def test_wiped_out_and_failed_configs_are_not_ranked():
+    wiped = result(-1.0, 1.0, 0.0, wiped_out=True)  # no turnover once the money is gone
+    survivor = result(-0.5, 0.6, 4.0, wiped_out=False)
+    failed = {"params": {}, "error": "boom"}
+
+    assert rank_results([wiped, survivor, failed]) == [survivor]
+    assert rank_results([wiped]) == []
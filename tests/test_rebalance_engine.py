@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from rebalance_engine import RISK_REDUCTION_FRACTION, RebalanceEngine
+
+SYMBOLS = ["USDC", "WIF", "BONK", "BOME", "WETH", "WBTC", "LINK", "UNI", "AAVE", "SOL"]
+
+def baseline_orders(targets, prices, holdings, thresholds, slippage, stop_loss, reduce):
+    """The per-asset loop the engine replaced (compute_orders_with_risk_management)."""
+    total_value = sum(holdings.get(s, 0) * prices[s] for s in targets)
+    overweight, underweight = [], []
+    for sym, weight in targets.items():
+        if sym not in prices or prices[sym] == 0:
+            continue
+        current_val = holdings.get(sym, 0) * prices[sym]
+        target_val = total_value * weight
+        drift_pct = (current_val - target_val) / total_value
+        if holdings.get(sym, 0) > 0 and sym in stop_loss:
+            overweight.append({"symbol": sym, "side": "sell", "amount": holdings[sym],
+                               "reason": f"Stop-loss: {stop_loss[sym]}"})
+            continue
+        if holdings.get(sym, 0) > 0 and sym in reduce:
+            overweight.append({"symbol": sym, "side": "sell",
+                               "amount": holdings[sym] * RISK_REDUCTION_FRACTION,
+                               "reason": f"Risk reduction: {reduce[sym]}"})
+            continue
+        if abs(drift_pct) >= thresholds[sym]:
+            token_amt = abs(target_val - current_val) / prices[sym]
+            side = "sell" if drift_pct > 0 else "buy"
+            if side == "buy":
+                token_amt *= (1 + slippage[sym])
+            (overweight if side == "sell" else underweight).append({
+                "symbol": sym, "side": side, "amount": token_amt,
+                "reason": f"Rebalancing: {drift_pct:.2%} drift",
+            })
+    return overweight + underweight
+
+def random_portfolio(rng):
+    n = int(rng.integers(2, len(SYMBOLS) + 1))
+    symbols = list(rng.permutation(SYMBOLS)[:n])
+    weights = rng.dirichlet(np.ones(n))
+    targets = {s: float(w) for s, w in zip(symbols, weights)}
+    holdings = {s: float(rng.choice([0.0, rng.lognormal(3, 3)])) for s in symbols}
+    holdings[symbols[0]] = float(rng.lognormal(5, 2))  # never an empty wallet
+    # Unheld assets may be unpriced; held ones never are
+    prices = {s: float(rng.lognormal(0, 4)) if holdings[s] > 0 or rng.random() < 0.7 else 0.0
+              for s in symbols}
+    thresholds = {s: float(rng.choice([0.02, 0.05, 0.10, 0.15])) for s in symbols}
+    slippage = {s: float(rng.choice([0.005, 0.05, 0.10])) for s in symbols}
+    held = [s for s in symbols if holdings[s] > 0 and prices[s] > 0]
+    stop_loss = {s: "15% loss" for s in held if rng.random() < 0.15}
+    reduce = {s: "High volatility" for s in held if rng.random() < 0.15 and s not in stop_loss}
+    return targets, prices, holdings, thresholds, slippage, stop_loss, reduce
+
+@pytest.mark.parametrize("seed", range(200))
+def test_engine_matches_baseline_loop(seed):
+    targets, prices, holdings, thresholds, slippage, stop_loss, reduce = random_portfolio(
+        np.random.default_rng(seed)
+    )
+    engine = RebalanceEngine(targets, [thresholds[s] for s in targets])
+    orders = engine.orders(prices, holdings, [slippage[s] for s in targets], stop_loss, reduce)
+
+    # Bit-for-bit: same amounts, same order, same reasons
+    assert orders == baseline_orders(targets, prices, holdings, thresholds, slippage, stop_loss, reduce)
+
+def test_missing_price_for_held_asset_raises():
+    engine = RebalanceEngine({"WIF": 0.5, "USDC": 0.5}, 0.05)
+    with pytest.raises(ValueError, match="Missing prices"):
+        engine.orders({"USDC": 1.0}, {"WIF": 10.0, "USDC": 100.0}, 0.0)
+
+def test_empty_wallet_raises():
+    engine = RebalanceEngine({"WIF": 0.5, "USDC": 0.5}, 0.05)
+    with pytest.raises(ValueError, match="No balances"):
+        engine.orders({"WIF": 2.0, "USDC": 1.0}, {}, 0.0)
@@ -0,0 +1,46 @@
+import pytest
+import requests
+
+from http_client import COINGECKO_API
+from resilience import CircuitOpenError, breaker_for, endpoint_name
+
+# Every CoinGecko endpoint a trading cycle touches
+COINGECKO_ENDPOINTS = [
+    "/coins/markets", "/coins/list", "/coins/x", "/simple/price",
+    "/coins/x/market_chart", "/coins/x/market_chart/range",
+]
+
+def open_breakers():
+    for path in COINGECKO_ENDPOINTS:
+        breaker = breaker_for(endpoint_name("GET", f"{COINGECKO_API}{path}"))
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+
+def test_open_breaker_raises_request_exception(fake_api):
+    open_breakers()
+    breaker = breaker_for(endpoint_name("GET", f"{COINGECKO_API}/coins/markets"))
+    with pytest.raises(requests.exceptions.RequestException):
+        breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+def test_cycle_survives_open_coingecko_breakers(fake_api):
+    from trading_agent import SolanaMemeTradingAgent
+
+    open_breakers()
+    agent = SolanaMemeTradingAgent()
+    agent.run_full_cycle()
+
+    assert fake_api.coingecko_calls() == []
+    assert any(path.endswith("/api/balance") for _, path in fake_api.calls)
+
+def test_snapshot_with_open_breakers_is_empty_not_fatal(fake_api):
+    from market_snapshot import MarketSnapshot
+    from solana_meme_fetcher import SolanaMemeFetcher
+    from solana_meme_loss_tracker import SolanaMemeLossTracker
+
+    open_breakers()
+    snapshot = MarketSnapshot.capture(SolanaMemeFetcher(), SolanaMemeLossTracker())
+
+    assert snapshot.market_coins == []
+    assert snapshot.holdings
@@ -0,0 +1,88 @@
+import pytest
+
+import advanced_portfolio_manager as apm
+from advanced_portfolio_manager import (
+    RiskManager, compute_orders_with_risk_management, default_risk_manager, execute_order,
+)
+from cost_basis import CostBasisLedger
+from order_queue import open_order_queue
+
+TARGETS = {"WIF": 0.5, "USDC": 0.5}
+HOLDINGS = {"WIF": 100.0, "USDC": 1000.0}
+
+def metrics(price=10.0, reduce=False, atl_change=500.0, volume=5e6):
+    return {"WIF": {"price": price, "price_change_24h": 60.0 if reduce else 1.0,
+                    "volume_24h": volume, "atl_change_percentage": atl_change}}
+
+def stopped_out(risk_manager, ledger):
+    """Orders for a cycle where WIF is 40% below its entry price."""
+    ledger.record("WIF", "buy", 100.0, 10.0)
+    return compute_orders_with_risk_management(
+        TARGETS, {"WIF": 6.0, "USDC": 1.0}, HOLDINGS, metrics(6.0), risk_manager, ledger
+    )
+
+def test_stop_loss_cooldown_starts_on_fill_not_on_compute():
+    risk_manager, ledger = RiskManager(state_file=None), CostBasisLedger()
+    [order] = [o for o in stopped_out(risk_manager, ledger) if o['symbol'] == "WIF"]
+
+    assert order['reason'].startswith("Stop-loss")
+    assert risk_manager.stop_loss_history == {}
+
+    # Unfilled: the next check fires again
+    triggered, _ = risk_manager.check_stop_loss("WIF", 6.0, 10.0, HOLDINGS)
+    assert triggered
+
+    risk_manager.record_fill(order)
+    assert "WIF" in risk_manager.stop_loss_history
+    assert risk_manager.daily_losses[risk_manager.today().isoformat()]["WIF"] == pytest.approx(0.4)
+    assert risk_manager.check_stop_loss("WIF", 6.0, 10.0, HOLDINGS) == (False, "")
+
+def test_risk_reduction_cooldown_starts_on_fill():
+    risk_manager = RiskManager(state_file=None)
+    order = {"symbol": "WIF", "side": "sell", "amount": 50.0, "reason": "Risk reduction: test"}
+
+    assert risk_manager.can_reduce("WIF")
+    risk_manager.record_fill(order)
+    assert not risk_manager.can_reduce("WIF")
+
+@pytest.mark.parametrize("snapshot, flagged", [
+    (metrics(), False),
+    (metrics(atl_change=500.0), False),
+    (metrics(atl_change=5.0), True),     # within 10% of the all-time low
+    (metrics(reduce=True), True),        # 60% 24h move
+    (metrics(volume=2e5), True),         # under $500K volume
+])
+def test_assess_flags_assets_for_reduction(snapshot, flagged):
+    risk = RiskManager(state_file=None).assess(snapshot)
+    assert risk["WIF"]["reduce"] is flagged
+    assert (risk["WIF"]["status"] == "🔴 HIGH") is flagged
+
+def test_flagged_asset_gets_a_risk_reduction_sell():
+    risk_manager, ledger = RiskManager(state_file=None), CostBasisLedger()
+    ledger.record("WIF", "buy", 100.0, 10.0)
+    orders = compute_orders_with_risk_management(
+        TARGETS, {"WIF": 10.0, "USDC": 1.0}, HOLDINGS, metrics(atl_change=5.0), risk_manager, ledger
+    )
+    [order] = [o for o in orders if o['symbol'] == "WIF"]
+    assert order['side'] == "sell"
+    assert order['reason'].startswith("Risk reduction")
+
+def test_failed_stop_loss_sell_leaves_no_cooldown(fake_api):
+    risk_manager = default_risk_manager()
+    [order] = open_order_queue().enqueue_orders(
+        [o for o in stopped_out(risk_manager, apm.open_ledger(apm.COST_BASIS_FILE)) if o['symbol'] == "WIF"],
+        HOLDINGS,
+    )
+    fake_api.reject_trades = True
+    with pytest.raises(Exception):
+        execute_order(order)
+    assert risk_manager.stop_loss_history == {}
+
+def test_filled_stop_loss_sell_starts_cooldown(fake_api):
+    risk_manager = default_risk_manager()
+    [order] = open_order_queue().enqueue_orders(
+        [o for o in stopped_out(risk_manager, apm.open_ledger(apm.COST_BASIS_FILE)) if o['symbol'] == "WIF"],
+        HOLDINGS,
+    )
+    execute_order(order)
+    assert "WIF" in risk_manager.stop_loss_history
@@ -0,0 +1,38 @@
+import sys
+
+import solana_meme_fetcher
+from conftest import COIN_IDS
+from market_cache import MARKET_CACHE
+from solana_meme_fetcher import SOLANA_ECOSYSTEM_CATEGORY, SolanaMemeFetcher
+
+def test_scan_pages_stream_in_order_uncached(fake_api):
+    coins = list(SolanaMemeFetcher().iter_market_coins(per_page=5))
+
+    assert [c["id"] for c in coins] == COIN_IDS
+    assert MARKET_CACHE._entries == {}
+
+def test_failed_page_truncates_scan_with_warning(fake_api, capsys):
+    fake_api.failing_pages = {2}
+    coins = list(SolanaMemeFetcher().iter_market_coins(per_page=5))
+
+    assert [c["id"] for c in coins] == COIN_IDS[:5]
+    assert "Market scan truncated at page 2 after 5 coins" in capsys.readouterr().out
+
+def test_failed_first_page_is_an_empty_scan(fake_api):
+    fake_api.failing_pages = {1}
+    assert SolanaMemeFetcher().get_market_coins(limit=10) == []
+
+def test_ecosystem_scan_from_the_command_line(fake_api, monkeypatch):
+    categories = []
+    fetcher = SolanaMemeFetcher()
+    get_markets_page = fetcher.get_markets_page
+
+    def spy(page, per_page, category):
+        categories.append(category)
+        return get_markets_page(page, per_page, category)
+
+    monkeypatch.setattr(fetcher, "get_markets_page", spy)
+    monkeypatch.setattr(solana_meme_fetcher, "SolanaMemeFetcher", lambda: fetcher)
+    monkeypatch.setattr(sys, "argv", ["solana_meme_fetcher.py", "ecosystem"])
+    solana_meme_fetcher.main()
+    assert set(categories) == {SOLANA_ECOSYSTEM_CATEGORY}
@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import pytest
+
+import http_client
+import stop_loss_watcher
+from advanced_portfolio_manager import ASSETS, COST_BASIS_FILE, default_risk_manager, open_ledger
+from order_queue import PENDING, open_order_queue
+from rate_limiter import RATE_LIMIT_TIERS
+from stop_loss_watcher import StopLossWatcher, budget_interval
+
+def test_default_interval_fits_public_tier(monkeypatch):
+    monkeypatch.setattr(stop_loss_watcher, "COINGECKO_KEY", None)
+    interval = budget_interval()
+    assert interval >= 30
+    assert 60 / interval <= RATE_LIMIT_TIERS["coingecko_public"] * stop_loss_watcher.WATCHER_CONFIG["BUDGET_SHARE"]
+
+def test_demo_key_polls_faster_within_budget(monkeypatch):
+    monkeypatch.setattr(stop_loss_watcher, "COINGECKO_KEY", "demo")
+    assert budget_interval(share=0.2) == 10
+    assert budget_interval(share=1.0, min_interval=5) == 5
+
+def test_explicit_interval_wins(monkeypatch, fake_api):
+    monkeypatch.setattr(stop_loss_watcher, "COINGECKO_KEY", None)
+    assert StopLossWatcher(interval=45).interval == 45
+    assert StopLossWatcher().interval == budget_interval()
+
+def test_poll_prices_goes_through_the_oracle_uncached(fake_api):
+    watcher = StopLossWatcher(interval=30)
+
+    async def poll():
+        async with http_client.async_session() as session:
+            first = await watcher.poll_prices(session, ["WIF", "BONK"])
+            fake_api.prices["dogwifhat"] = 0.5
+            return first, await watcher.poll_prices(session, ["WIF", "BONK"])
+
+    first, second = asyncio.run(poll())
+    assert set(first) == {"WIF", "BONK"}
+    assert second["WIF"] == 0.5
+    assert sum(path.endswith("/simple/price") for _, path in fake_api.calls) == 2
+
+def run_tick(watcher):
+    async def tick():
+        async with http_client.async_session() as session:
+            await watcher.tick(session)
+    asyncio.run(tick())
+
+def traded_amount(trade):
+    return int(trade["amount"]) / 10 ** ASSETS.decimals_for("WIF")
+
+@pytest.fixture
+def watcher(fake_api):
+    """A watcher holding WIF bought at $10 while CoinGecko quotes it at $1."""
+    fake_api.holdings = {"USDC": 5000.0, "WIF": 100.0, "BONK": 1000.0, "NOTACOIN": 5.0}
+    open_ledger(COST_BASIS_FILE).record("WIF", "buy", 100.0, 10.0)
+    return StopLossWatcher(interval=30)
+
+def test_tick_prices_only_held_coingecko_symbols(watcher, monkeypatch):
+    polled = []
+    poll_prices = watcher.poll_prices
+
+    async def spy(session, symbols):
+        polled.append(sorted(symbols))
+        return await poll_prices(session, symbols)
+
+    monkeypatch.setattr(watcher, "poll_prices", spy)
+    run_tick(watcher)
+    assert polled == [["BONK", "WIF"]]  # no USDC, nothing without a CoinGecko id
+
+def test_stop_orders_trigger_against_the_ledger_entry_price(watcher):
+    watcher.holdings = {"WIF": 100.0, "BONK": 1000.0}
+    [order] = watcher.stop_orders({"WIF": 1.0, "BONK": 2.0})  # BONK is seeded at today's price
+    assert order["symbol"] == "WIF"
+    assert order["amount"] == 100.0
+    assert order["reason"].startswith("Stop-loss")
+
+def test_tick_sells_once_then_respects_the_cooldown(watcher, fake_api):
+    run_tick(watcher)
+    [trade] = fake_api.trades
+    assert "Stop-loss" in trade["reason"]
+    assert traded_amount(trade) == pytest.approx(100.0)
+    assert "WIF" in default_risk_manager().stop_loss_history
+
+    run_tick(watcher)
+    assert len(fake_api.trades) == 1
+
+def test_fire_sizes_sells_to_fresh_holdings(watcher, fake_api):
+    watcher.holdings = {"WIF": 100.0, "BONK": 1000.0}
+    watcher.holdings_at = time.monotonic()
+    fake_api.holdings["WIF"] = 40.0  # sold elsewhere since the last refresh
+
+    run_tick(watcher)
+    [trade] = fake_api.trades
+    assert traded_amount(trade) == pytest.approx(40.0)
+
+def test_fire_queues_without_reconciling_the_cycle_orders(watcher, fake_api, monkeypatch):
+    queue = open_order_queue()
+    [pending] = queue.enqueue_orders([{"symbol": "BONK", "side": "buy", "amount": 10.0}],
+                                     fake_api.holdings)
+    reconciled = []
+    enqueue_orders = queue.enqueue_orders
+
+    def spy(orders, holdings, reconcile=True):
+        reconciled.append(reconcile)
+        return enqueue_orders(orders, holdings, reconcile=reconcile)
+
+    monkeypatch.setattr(queue, "enqueue_orders", spy)
+    run_tick(watcher)
+    assert reconciled == [False]
+    assert len(fake_api.trades) == 1
+    assert queue.state(pending["client_order_id"]) == PENDING
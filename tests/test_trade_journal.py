@@ -0,0 +1,44 @@
+import os
+
+from trade_journal import TradeJournal
+
+def trade(i, symbol="WIF"):
+    return {"timestamp": f"2024-01-01T00:00:{i:02d}", "symbol": symbol, "amount": i}
+
+def test_read_filters_by_symbol_and_time(tmp_path):
+    journal = TradeJournal(str(tmp_path / "trades.jsonl"))
+    for i in range(6):
+        journal.append(trade(i, "WIF" if i % 2 else "BONK"))
+
+    assert [t["amount"] for t in journal.read(symbol="WIF")] == [1, 3, 5]
+    assert [t["amount"] for t in journal.read(since="2024-01-01T00:00:04")] == [4, 5]
+    journal.close()
+
+def test_rebuild_skips_corrupt_lines(tmp_path, capsys):
+    path = str(tmp_path / "trades.jsonl")
+    journal = TradeJournal(path)
+    journal.append(trade(1))
+    journal.close()
+    with open(path, "ab") as log:
+        log.write(b"{not json\n")
+        log.write(b'"a string"\n')
+    with open(path, "ab") as log:
+        log.write(b'{"timestamp": "2024-01-01T00:00:09", "symbol": "WIF", "amount": 9}\n')
+    os.remove(f"{path}.idx")
+
+    journal = TradeJournal(path)
+    assert [t["amount"] for t in journal.read()] == [1, 9]
+    assert "without 2 undecodable lines" in capsys.readouterr().out
+    journal.close()
+
+def test_torn_index_tail_triggers_rebuild(tmp_path):
+    path = str(tmp_path / "trades.jsonl")
+    journal = TradeJournal(path)
+    journal.append(trade(1))
+    journal.close()
+    with open(f"{path}.idx", "ab") as idx:
+        idx.write(b"garbage\n")
+
+    journal = TradeJournal(path)
+    assert [t["amount"] for t in journal.read()] == [1]
+    journal.close()
@@ -0,0 +1,35 @@
+import threading
+
+from trailing_stop import TrailingStopTracker
+
+def test_stop_arms_above_entry_and_fires_below_high():
+    tracker = TrailingStopTracker(0.10)
+    tracker.track("WIF", 1.0, 1.0)
+
+    assert tracker.observe({"WIF": 0.8}) == {}  # below entry: left to the fixed stop-loss
+    assert tracker.observe({"WIF": 2.0}) == {}
+    assert tracker.stop_price("WIF") == 1.8
+    assert tracker.observe({"WIF": 1.85}) == {}
+    assert tracker.check("WIF", 1.75) == (True, "Trailing stop triggered: 12.50% below high of $2")
+
+def test_observe_saves_while_holding_the_lock(tmp_path):
+    tracker = TrailingStopTracker(0.10, str(tmp_path / "stops.json"), save_interval=0)
+    tracker.track("WIF", 1.0)
+    tracker.observe({"WIF": 1.5})  # would deadlock with a non-reentrant lock
+    assert TrailingStopTracker(0.10, str(tmp_path / "stops.json")).positions["WIF"]["high"] == 1.5
+
+def test_concurrent_ticks_keep_the_highest_price():
+    tracker = TrailingStopTracker(0.10)
+    tracker.track("WIF", 1.0)
+    ticks = [1.0 + i / 1000 for i in range(4000)]
+
+    def feed(offset):
+        for price in ticks[offset::4]:
+            tracker.update("WIF", price)
+
+    threads = [threading.Thread(target=feed, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert tracker.positions["WIF"]["high"] == max(ticks)
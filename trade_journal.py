@@ -0,0 +1,219 @@
+"""
+Append-only JSONL trade journal.
+
+Each trade is one JSON line appended to the current segment, so logging is
+O(1) per trade instead of rewriting the whole history. Writes are fsynced in
+batches, segments rotate once they reach ``MAX_BYTES``, and a sidecar
+``.idx`` file per segment maps timestamp and symbol to byte offsets so
+lookups don't rescan the log. A torn last line from a crash is trimmed on open.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from glob import glob
+from typing import Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ------------------------------------------------------------
+#  Configuration
+# ------------------------------------------------------------
+JOURNAL_CONFIG = {
+    "FSYNC_EVERY": int(os.getenv("TRADE_JOURNAL_FSYNC_EVERY", "16")),          # records
+    "FSYNC_INTERVAL": float(os.getenv("TRADE_JOURNAL_FSYNC_INTERVAL", "1.0")),  # seconds
+    "MAX_BYTES": int(os.getenv("TRADE_JOURNAL_MAX_BYTES", str(16 * 1024 * 1024))),
+}
+
+def _trim_torn_tail(path: str):
+    """Drop a partially written last line left behind by a crash."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Walk back to the last complete line
+        pos = size - 1
+        while pos > 0:
+            step = min(4096, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                f.truncate(pos - step + newline + 1)
+                return
+            pos -= step
+        f.truncate(0)
+
+# ------------------------------------------------------------
+#  Journal
+# ------------------------------------------------------------
+class TradeJournal:
+    """Append-only JSONL trade log with batched fsync, rotation and an index."""
+
+    def __init__(self, path: str, fsync_every: int = JOURNAL_CONFIG["FSYNC_EVERY"],
+                 fsync_interval: float = JOURNAL_CONFIG["FSYNC_INTERVAL"],
+                 max_bytes: int = JOURNAL_CONFIG["MAX_BYTES"]):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = time.time()
+        self._open()
+
+    def _open(self):
+        _trim_torn_tail(self.path)
+        _trim_torn_tail(self._index_path(self.path))
+        self._log = open(self.path, "ab")
+        self._index = open(self._index_path(self.path), "ab")
+        if self._index_is_stale():
+            self._rebuild_index()
+
+    @staticmethod
+    def _index_path(segment: str) -> str:
+        return f"{segment}.idx"
+
+    def append(self, record: Dict):
+        """Append one trade record."""
+        line = (json.dumps(record, separators=(",", ":"), default=str) + "\n").encode()
+        with self._lock:
+            offset = self._log.tell()
+            self._log.write(line)
+            self._index.write(self._index_line(record, offset))
+            self._unsynced += 1
+
+            if (self._unsynced >= self.fsync_every
+                    or time.time() - self._last_sync >= self.fsync_interval):
+                self._sync()
+            if self._log.tell() >= self.max_bytes:
+                self._rotate()
+
+    def flush(self):
+        """Force pending records to disk."""
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            if self._log.closed:
+                return
+            self._sync()
+            self._log.close()
+            self._index.close()
+
+    def segments(self) -> List[str]:
+        """Rotated segments oldest first, then the live one."""
+        rotated = sorted(p for p in glob(f"{self.path}.*") if not p.endswith(".idx"))
+        return rotated + [self.path]
+
+    def read(self, symbol: Optional[str] = None, since: Optional[str] = None,
+             until: Optional[str] = None) -> Iterator[Dict]:
+        """Yield trades, optionally filtered by symbol and ISO timestamp range.
+
+        Filtering runs on the sidecar index; only matching records are read.
+        """
+        self.flush()
+        for segment in self.segments():
+            index_path = self._index_path(segment)
+            if not os.path.exists(index_path):
+                continue
+            with open(index_path, "rb") as idx, open(segment, "rb") as log:
+                for raw in idx:
+                    entry = json.loads(raw)
+                    if symbol is not None and entry["s"] != symbol:
+                        continue
+                    if since is not None and entry["t"] < since:
+                        continue
+                    if until is not None and entry["t"] > until:
+                        continue
+                    log.seek(entry["o"])
+                    yield json.loads(log.readline())
+
+    def _sync(self):
+        self._log.flush()
+        self._index.flush()
+        os.fsync(self._log.fileno())
+        os.fsync(self._index.fileno())
+        self._unsynced = 0
+        self._last_sync = time.time()
+
+    def _rotate(self):
+        self._sync()
+        self._log.close()
+        self._index.close()
+        segment = f"{self.path}.{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+        os.replace(self.path, segment)
+        os.replace(self._index_path(self.path), self._index_path(segment))
+        self._log = open(self.path, "ab")
+        self._index = open(self._index_path(self.path), "ab")
+
+    @staticmethod
+    def _index_line(record: Dict, offset: int) -> bytes:
+        entry = {"t": record.get("timestamp", ""), "s": record.get("symbol", ""), "o": offset}
+        return (json.dumps(entry, separators=(",", ":")) + "\n").encode()
+
+    def _index_is_stale(self) -> bool:
+        """The index lags the log if the last fsync batch was lost mid-write."""
+        log_size = os.path.getsize(self.path)
+        if log_size == 0:
+            return False
+        index_path = self._index_path(self.path)
+        if os.path.getsize(index_path) == 0:
+            return True
+        with open(index_path, "rb") as idx:
+            idx.seek(max(0, os.path.getsize(index_path) - 4096))
+            try:
+                last_offset = int(json.loads(idx.read().splitlines()[-1])["o"])
+            except (ValueError, KeyError, TypeError):
+                return True  # a corrupt index is rebuilt like a lagging one
+        with open(self.path, "rb") as log:
+            log.seek(last_offset)
+            return log_size != last_offset + len(log.readline())
+
+    def _rebuild_index(self):
+        """Re-index the live segment, skipping lines that aren't valid JSON."""
+        self._index.truncate(0)
+        skipped = 0
+        with open(self.path, "rb") as log:
+            offset = 0
+            for raw in log:
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    record = None
+                if isinstance(record, dict):
+                    self._index.write(self._index_line(record, offset))
+                else:
+                    skipped += 1
+                    print(f"⚠️  Skipping undecodable trade journal line at byte {offset} of {self.path}")
+                offset += len(raw)
+        if skipped:
+            print(f"⚠️  Rebuilt {self.path} index without {skipped} undecodable lines")
+        self._index.flush()
+        os.fsync(self._index.fileno())
+
+_journals: Dict[str, TradeJournal] = {}
+_journals_lock = threading.Lock()
+
+def open_journal(path: str) -> TradeJournal:
+    """Process-wide journal for a path, closed cleanly at exit."""
+    with _journals_lock:
+        journal = _journals.get(path)
+        if journal is None:
+            journal = TradeJournal(path)
+            _journals[path] = journal
+            atexit.register(journal.close)
+        return journal
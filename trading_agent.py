@@ -25,11 +25,14 @@ from typing import Dict, List, Optional, Tuple
 # Import our custom modules
 from solana_meme_fetcher import SolanaMemeFetcher
 from solana_meme_loss_tracker import SolanaMemeLossTracker
+from market_snapshot import MarketSnapshot
+from order_queue import open_order_queue
+from stop_loss_watcher import StopLossWatcher
 from advanced_portfolio_manager import (
-    load_targets, fetch_prices, fetch_holdings, get_market_metrics,
+    load_targets, fetch_prices, fetch_holdings, get_market_metrics, prices_from_metrics,
     analyze_portfolio_performance, compute_orders_with_risk_management,
-    RiskManager, DRIFT_THRESHOLDS, STOP_LOSS_CONFIG, execute_trade,
-    TOKEN_MAP, DECIMALS, COINGECKO_IDS, ASSET_DRIFT_THRESHOLDS
+    default_risk_manager, DRIFT_THRESHOLDS, STOP_LOSS_CONFIG, execute_trade,
+    TOKEN_MAP, DECIMALS, COINGECKO_IDS, ASSET_DRIFT_THRESHOLDS, EXECUTION_ENGINE
 )
 
 load_dotenv()
@@ -39,7 +42,8 @@ load_dotenv()
 # ------------------------------------------------------------
 RECALL_KEY = os.getenv("RECALL_API_KEY")
 COINGECKO_KEY = os.getenv("PRODUCTION_API_KEY") or os.getenv("SANDBOX_API_KEY")
-SANDBOX_API = "https://api.sandbox.competitions.recall.network"
+# Point at mock_recall_server.py with RECALL_API_URL=http://127.0.0.1:8765
+SANDBOX_API = os.getenv("RECALL_API_URL") or "https://api.sandbox.competitions.recall.network"
 
 # Trading configuration
 TRADING_MODE = os.getenv("TRADING_MODE", "aggressive")  # conservative, moderate, aggressive, passive
@@ -55,7 +59,9 @@ class SolanaMemeTradingAgent:
     def __init__(self):
         self.fetcher = SolanaMemeFetcher()
         self.loss_tracker = SolanaMemeLossTracker()
-        self.risk_manager = RiskManager()
+        # Long-lived so cooldowns and daily loss caps carry across cycles; the
+        # process-wide instance is the one execute_order records fills on
+        self.risk_manager = default_risk_manager()
         self.trade_count = 0
         self.total_value = 0
         self.last_rebalance = None
@@ -66,10 +72,18 @@ class SolanaMemeTradingAgent:
         print(f"   Stop-Loss Enabled: {STOP_LOSS_ENABLED}")
         print()
     
-    def discover_meme_tokens(self, limit: int = 20) -> List[Dict]:
+    def capture_snapshot(self, scan_limit: int = 50) -> MarketSnapshot:
+        """Capture the market once for a whole trading cycle."""
+        print("📸 Capturing market snapshot...")
+        return MarketSnapshot.capture(self.fetcher, self.loss_tracker, scan_limit=scan_limit)
+    
+    def discover_meme_tokens(self, limit: int = 20, snapshot: Optional[MarketSnapshot] = None) -> List[Dict]:
         """Discover trending Solana meme tokens."""
         print("🔍 Discovering trending Solana meme tokens...")
-        meme_coins = self.fetcher.get_solana_meme_coins(limit=limit)
+        if snapshot:
+            meme_coins = self.fetcher.filter_meme_coins(snapshot.market_coins[:limit])
+        else:
+            meme_coins = self.fetcher.get_solana_meme_coins(limit=limit)
         
         if meme_coins:
             print(f"✅ Found {len(meme_coins)} trending meme coins")
@@ -78,13 +92,17 @@ class SolanaMemeTradingAgent:
             print("❌ No meme coins found")
             return []
     
-    def analyze_market_performance(self) -> Dict:
+    def analyze_market_performance(self, snapshot: Optional[MarketSnapshot] = None) -> Dict:
         """Analyze 24-hour market performance."""
         print("📊 Analyzing 24-hour market performance...")
         
         # Get specific coin performance
-        specific_coins = self.loss_tracker.track_specific_coins()
-        all_meme_coins = self.loss_tracker.get_solana_meme_coins(limit=50)
+        if snapshot:
+            specific_coins = snapshot.tracked_coins
+            all_meme_coins = self.loss_tracker.filter_meme_losses(snapshot.market_coins)
+        else:
+            specific_coins = self.loss_tracker.track_specific_coins()
+            all_meme_coins = self.loss_tracker.get_solana_meme_coins(limit=50)
         
         # Combine and remove duplicates
         all_coins = specific_coins + all_meme_coins
@@ -113,20 +131,28 @@ class SolanaMemeTradingAgent:
         
         return analysis
     
-    def get_portfolio_status(self) -> Dict:
+    def get_portfolio_status(self, snapshot: Optional[MarketSnapshot] = None) -> Dict:
         """Get current portfolio status and analysis."""
         try:
-            targets = load_targets()
-            prices = fetch_prices(list(targets.keys()))
-            holdings = fetch_holdings()
-            metrics = get_market_metrics(list(targets.keys()))
+            if snapshot:
+                if snapshot.holdings is None:
+                    raise RuntimeError(snapshot.holdings_error or "holdings unavailable")
+                targets = snapshot.targets
+                prices = snapshot.prices
+                holdings = snapshot.holdings
+                metrics = snapshot.metrics
+            else:
+                targets = load_targets()
+                metrics = get_market_metrics(list(targets.keys()))
+                prices = prices_from_metrics(metrics, list(targets.keys()))
+                holdings = fetch_holdings()
             
             # Calculate total portfolio value
             total_value = sum(holdings.get(s, 0) * prices[s] for s in targets)
             self.total_value = total_value
             
             # Analyze portfolio performance
-            analyze_portfolio_performance(holdings, prices, targets, metrics)
+            analyze_portfolio_performance(holdings, prices, targets, metrics, self.risk_manager)
             
             return {
                 'targets': targets,
@@ -152,57 +178,37 @@ class SolanaMemeTradingAgent:
         print("🧮 Computing trading orders...")
         
         try:
-            orders = compute_orders_with_risk_management(targets, prices, holdings, metrics)
+            orders = compute_orders_with_risk_management(
+                targets, prices, holdings, metrics, self.risk_manager
+            )
+            # Assign client order ids; symbols with unresolved orders are held back
+            orders = open_order_queue().enqueue_orders(orders, holdings)
             print(f"📋 Generated {len(orders)} trading orders")
             return orders
         except Exception as e:
             print(f"❌ Failed to compute orders: {e}")
             return []
     
-    def execute_trades(self, orders: List[Dict]) -> List[Dict]:
-        """Execute trading orders."""
+    def execute_trades(self, orders: List[Dict], portfolio_data: Optional[Dict] = None) -> List[Dict]:
+        """Execute trading orders: sells concurrently, then buys funded by them."""
         if not orders:
             print("✅ No trades to execute")
             return []
         
+        portfolio_data = portfolio_data or {}
+        prices = portfolio_data.get('prices', {})
+        holdings = portfolio_data.get('holdings', {})
+        
         print(f"⚡ Executing {len(orders)} trades...")
-        executed_trades = []
+        executed_trades = EXECUTION_ENGINE.execute_orders(orders, prices, holdings)
         
-        for i, order in enumerate(orders, 1):
-            try:
-                print(f"   {i}/{len(orders)}: {order['side'].upper()} {order['amount']:.6f} {order['symbol']}")
-                
-                # Execute trade through Recall API
-                result = execute_trade(
-                    order['symbol'],
-                    order['side'],
-                    order['amount'],
-                    order.get('reason', 'Portfolio rebalancing')
-                )
-                
-                # Log trade
-                trade_log = {
-                    'timestamp': datetime.now().isoformat(),
-                    'order': order,
-                    'result': result,
-                    'status': 'success'
-                }
-                executed_trades.append(trade_log)
-                
-                print(f"      ✅ Success: {result.get('status', 'unknown')}")
-                
-                # Rate limiting
-                time.sleep(1)
-                
-            except Exception as e:
-                print(f"      ❌ Failed: {e}")
-                trade_log = {
-                    'timestamp': datetime.now().isoformat(),
-                    'order': order,
-                    'error': str(e),
-                    'status': 'failed'
-                }
-                executed_trades.append(trade_log)
+        for i, trade in enumerate(executed_trades, 1):
+            order = trade['order']
+            print(f"   {i}/{len(executed_trades)}: {order['side'].upper()} {order['amount']:.6f} {order['symbol']}")
+            if trade['status'] == 'success':
+                print(f"      ✅ Success: {trade['result'].get('status', 'unknown')}")
+            else:
+                print(f"      ❌ Failed: {trade['error']}")
         
         self.trade_count += len(executed_trades)
         return executed_trades
@@ -221,17 +227,17 @@ class SolanaMemeTradingAgent:
         except Exception as e:
             print(f"❌ Failed to save trade log: {e}")
     
-    def run_market_analysis(self):
+    def run_market_analysis(self, snapshot: Optional[MarketSnapshot] = None):
         """Run comprehensive market analysis."""
         print("\n" + "="*60)
         print("📊 MARKET ANALYSIS")
         print("="*60)
         
         # Discover meme tokens
-        meme_tokens = self.discover_meme_tokens(limit=15)
+        meme_tokens = self.discover_meme_tokens(limit=15, snapshot=snapshot)
         
         # Analyze market performance
-        market_analysis = self.analyze_market_performance()
+        market_analysis = self.analyze_market_performance(snapshot=snapshot)
         
         # Show top performers
         if market_analysis['biggest_gainers']:
@@ -247,26 +253,26 @@ class SolanaMemeTradingAgent:
         print("="*60)
         return market_analysis
     
-    def run_portfolio_rebalance(self):
+    def run_portfolio_rebalance(self, snapshot: Optional[MarketSnapshot] = None):
         """Run portfolio rebalancing."""
         print("\n" + "="*60)
         print("🔄 PORTFOLIO REBALANCING")
         print("="*60)
         
         # Get portfolio status
-        portfolio_data = self.get_portfolio_status()
+        portfolio_data = self.get_portfolio_status(snapshot=snapshot)
         if not portfolio_data:
             print("❌ Failed to get portfolio data")
-            return
+            return []
         
         # Compute trading orders
         orders = self.compute_trading_orders(portfolio_data)
         if not orders:
             print("✅ Portfolio already balanced")
-            return
+            return []
         
         # Execute trades
-        executed_trades = self.execute_trades(orders)
+        executed_trades = self.execute_trades(orders, portfolio_data)
         
         # Save trade log
         self.save_trade_log(executed_trades)
@@ -277,28 +283,33 @@ class SolanaMemeTradingAgent:
         print("="*60)
         return executed_trades
     
-    def run_risk_assessment(self):
+    def run_risk_assessment(self, snapshot: Optional[MarketSnapshot] = None):
         """Run risk assessment and monitoring."""
         print("\n" + "="*60)
         print("🛡️  RISK ASSESSMENT")
         print("="*60)
         
         try:
-            targets = load_targets()
-            metrics = get_market_metrics(list(targets.keys()))
+            if snapshot:
+                targets = snapshot.targets
+                metrics = snapshot.metrics
+            else:
+                targets = load_targets()
+                metrics = get_market_metrics(list(targets.keys()))
             
             high_risk_assets = []
             low_volume_assets = []
             
-            for symbol, data in metrics.items():
+            # Shared with analysis and order computation for this snapshot
+            risk = self.risk_manager.assess(metrics)
+            for symbol, assessment in risk.items():
                 if symbol in targets:
                     # Check volatility risk
-                    volatility_risk, risk_msg = self.risk_manager.check_volatility_risk(symbol, metrics)
-                    if volatility_risk:
-                        high_risk_assets.append((symbol, risk_msg))
+                    if assessment['volatile']:
+                        high_risk_assets.append((symbol, assessment['volatility_reason']))
                     
                     # Check volume
-                    if data['volume_24h'] < 1000000:
+                    if assessment['low_volume']:
                         low_volume_assets.append(symbol)
             
             if high_risk_assets:
@@ -321,14 +332,17 @@ class SolanaMemeTradingAgent:
         print(f"\n🔄 TRADING CYCLE - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("="*80)
         
+        # 0. One market snapshot shared by every stage
+        snapshot = self.capture_snapshot()
+        
         # 1. Market Analysis
-        market_analysis = self.run_market_analysis()
+        market_analysis = self.run_market_analysis(snapshot)
         
         # 2. Risk Assessment
-        self.run_risk_assessment()
+        self.run_risk_assessment(snapshot)
         
         # 3. Portfolio Rebalancing
-        trades = self.run_portfolio_rebalance()
+        trades = self.run_portfolio_rebalance(snapshot)
         
         # 4. Summary
         print("\n📊 CYCLE SUMMARY:")
@@ -357,12 +371,17 @@ class SolanaMemeTradingAgent:
         # Run initial cycle
         self.run_full_cycle()
         
+        # Stop-losses are checked on a fast loop between cycles
+        watcher = StopLossWatcher(self.risk_manager)
+        watcher.start()
+        
         # Continuous loop
         while True:
             try:
                 schedule.run_pending()
                 time.sleep(60)  # Check every minute
             except KeyboardInterrupt:
+                watcher.stop()
                 print("\n👋 Trading agent stopped by user")
                 break
             except Exception as e:
@@ -409,8 +428,9 @@ def main():
         elif command == "demo":
             # Run demo mode
             print("🎮 Running demo mode...")
-            agent.run_market_analysis()
-            agent.run_risk_assessment()
+            snapshot = agent.capture_snapshot()
+            agent.run_market_analysis(snapshot)
+            agent.run_risk_assessment(snapshot)
             print("\n✅ Demo completed")
         else:
             print(f"❌ Unknown command: {command}")
@@ -0,0 +1,130 @@
+"""
+Trailing stops driven by every price tick.
+
+``TrailingStopTracker`` keeps a running high-water mark per open position.
+Every price source (market metrics, the price oracle, the stop-loss watcher)
+feeds ticks through ``observe``, which is O(1) per symbol, so stops can be
+checked every few seconds rather than only at rebalance time. A trailing stop
+arms once the position has traded above its entry price and fires when the
+price falls ``TRAILING_PERCENTAGE`` below the high-water mark; losses below
+entry are left to the fixed stop-loss.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+TRAILING_STATE_FILE = "trailing_stops.json"
+SAVE_INTERVAL_SECONDS = 30
+
+class TrailingStopTracker:
+    """Per-position entry price and high-water mark."""
+
+    def __init__(self, trailing_pct: float, path: Optional[str] = None,
+                 save_interval: float = SAVE_INTERVAL_SECONDS):
+        self.trailing_pct = trailing_pct
+        self.path = path
+        self.save_interval = save_interval
+        self.positions: Dict[str, Dict[str, float]] = {}  # symbol -> {"entry", "high"}
+        # Reentrant: observe and check hold it across update and save
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._saved_at = 0.0
+        self.load()
+
+    def track(self, symbol: str, entry_price: float, price: Optional[float] = None):
+        """Start (or keep) tracking a held position."""
+        with self._lock:
+            position = self.positions.get(symbol)
+            if position is None:
+                self.positions[symbol] = {"entry": entry_price, "high": max(entry_price, price or 0)}
+                self._dirty = True
+            elif position["entry"] != entry_price:
+                position["entry"] = entry_price
+                self._dirty = True
+
+    def untrack(self, symbol: str):
+        """Forget a closed position."""
+        with self._lock:
+            if self.positions.pop(symbol, None) is not None:
+                self._dirty = True
+
+    def update(self, symbol: str, price: float) -> bool:
+        """Apply one tick; True if it hits the trailing stop."""
+        with self._lock:
+            position = self.positions.get(symbol)
+            if position is None or price <= 0:
+                return False
+            if price > position["high"]:
+                position["high"] = price
+                self._dirty = True
+                return False
+            return position["high"] > position["entry"] and price <= self.stop_price(symbol)
+
+    def observe(self, prices: Dict[str, float]) -> Dict[str, float]:
+        """Feed a batch of ticks; returns the symbols whose stop was hit."""
+        with self._lock:
+            hit = {sym: price for sym, price in prices.items() if self.update(sym, price)}
+            self.save_if_due()
+        return hit
+
+    def stop_price(self, symbol: str) -> Optional[float]:
+        with self._lock:
+            position = self.positions.get(symbol)
+            if position is None:
+                return None
+            return position["high"] * (1 - self.trailing_pct)
+
+    def check(self, symbol: str, price: float) -> Tuple[bool, str]:
+        """Stop-loss style check for a held, tracked position."""
+        with self._lock:
+            if not self.update(symbol, price):
+                return False, ""
+            high = self.positions[symbol]["high"]
+        drop = (high - price) / high
+        return True, f"Trailing stop triggered: {drop:.2%} below high of ${high:,.6g}"
+
+    # --------------------------------------------------------
+    #  Persistence
+    # --------------------------------------------------------
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self.positions = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️  Ignoring unreadable trailing stops {self.path}: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.positions, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            self._saved_at = time.monotonic()
+
+    def save_if_due(self):
+        """Persist new highs at most every ``save_interval`` seconds."""
+        with self._lock:
+            if self._dirty and time.monotonic() - self._saved_at >= self.save_interval:
+                self.save()
+
+_trackers: Dict[str, TrailingStopTracker] = {}
+_trackers_lock = threading.Lock()
+
+def open_tracker(trailing_pct: float, path: str = TRAILING_STATE_FILE) -> TrailingStopTracker:
+    """Process-wide tracker for a path, saved at exit."""
+    with _trackers_lock:
+        tracker = _trackers.get(path)
+        if tracker is None:
+            tracker = TrailingStopTracker(trailing_pct, path)
+            _trackers[path] = tracker
+            atexit.register(tracker.save)
+        return tracker